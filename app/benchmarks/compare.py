@@ -0,0 +1,96 @@
+"""
+Compare two result files of the benchmark suite.
+
+Usage (from the app folder):
+    python -m benchmarks.compare benchmarks/results/before.json benchmarks/results/after.json
+
+Exits with status 1 if a step is slower than the threshold, so it can gate
+a change.
+"""
+# Library imports
+import argparse
+import json
+
+# Constants
+DEFAULT_THRESHOLD = 1.2
+
+
+def load_results(filename):
+    """
+    Load a result file.
+
+    Args:
+        filename (str): The file path.
+
+    Returns:
+        dict: The results.
+    """
+    with open(filename) as file:
+        return json.load(file)
+
+
+def compare_steps(before, after):
+    """
+    Compare the timings of the steps of two runs.
+
+    Args:
+        before (dict): The results of the baseline run.
+        after (dict): The results of the new run.
+
+    Returns:
+        list: (step, seconds before, seconds after, ratio) tuples, with
+        None for steps that failed or are missing in a run.
+    """
+    steps = list(before["steps"]) + \
+        [step for step in after["steps"] if step not in before["steps"]]
+
+    rows = []
+    for step in steps:
+        old = before["steps"].get(step, {}).get("seconds")
+        new = after["steps"].get(step, {}).get("seconds")
+        ratio = new / old if old and new is not None else None
+        rows.append((step, old, new, ratio))
+    return rows
+
+
+def format_seconds(value):
+    """
+    Format a timing for the comparison table.
+
+    Args:
+        value (float): The seconds, or None.
+
+    Returns:
+        str: The formatted seconds.
+    """
+    return "-" if value is None else f"{value:.4f}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare two benchmark result files")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="slowdown ratio reported as a regression")
+    args = parser.parse_args()
+
+    before, after = load_results(args.before), load_results(args.after)
+    for results in (before, after):
+        print(f"{(results['commit'] or 'nogit')[:12]}{' (dirty)' if results['dirty'] else ''}: "
+              f"{results['dialect']}, {results['rows']} rows, seed {results['seed']}")
+    if (before["dialect"], before["rows"], before["seed"]) != (after["dialect"], after["rows"], after["seed"]):
+        print("Warning: the runs used different databases or data")
+
+    regressions = []
+    print(f"{'step':<50} {'before':>10} {'after':>10} {'ratio':>7}")
+    for step, old, new, ratio in compare_steps(before, after):
+        flag = ""
+        if ratio is not None and ratio > args.threshold:
+            flag = " slower"
+            regressions.append(step)
+        ratio = "-" if ratio is None else f"{ratio:.2f}"
+        print(f"{step:<50} {format_seconds(old):>10} {format_seconds(new):>10} {ratio:>7}{flag}")
+
+    print(f"{len(regressions)} step(s) slower than {args.threshold}x")
+    raise SystemExit(1 if regressions else 0)
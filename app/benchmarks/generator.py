@@ -0,0 +1,185 @@
+"""
+Deterministic generator of synthetic hires for the benchmarks.
+
+Departments and jobs are the ones of the sample data in
+data_migration/data/raw. Hires are skewed like real hiring: a few
+departments and jobs get most of them (Zipf-like weights) and hiring peaks
+in the first and third quarters. The same seed always gives the same
+records, and a larger row count only appends records to a smaller one.
+
+Usage (from the app folder), to write CSV files for the migration:
+    python -m benchmarks.generator --rows 1000000 --output ../data_migration/data/synthetic
+"""
+# Library imports
+import argparse
+import csv
+import numpy as np
+import os
+
+# Constants
+RAW_DATA_DIR = os.path.join(os.path.dirname(
+    __file__), "..", "..", "data_migration", "data", "raw")
+DEFAULT_SEED = 2021
+CHUNK_SIZE = 100000
+DEPARTMENT_SKEW = 1.1
+JOB_SKEW = 0.8
+# Share of hires per month, busier at the start of the first and third quarters
+MONTH_WEIGHTS = np.array([12, 9, 8, 7, 7, 6, 11, 10, 8, 8, 7, 7], dtype=float)
+FIRST_YEAR = 2020
+YEARS = 3
+
+
+def read_names(filename):
+    """
+    Read the (id, name) rows of a sample CSV file.
+
+    Args:
+        filename (str): The file name in the raw data folder.
+
+    Returns:
+        list: The (id, name) tuples.
+    """
+    with open(os.path.join(RAW_DATA_DIR, filename), newline="") as file:
+        return [(int(row[0]), row[1]) for row in csv.reader(file) if row]
+
+
+def departments():
+    """
+    Get the departments of the sample data.
+
+    Returns:
+        list: The (id, department) tuples.
+    """
+    return read_names("departments.csv")
+
+
+def jobs():
+    """
+    Get the jobs of the sample data.
+
+    Returns:
+        list: The (id, job) tuples.
+    """
+    return read_names("jobs.csv")
+
+
+def zipf_weights(count, skew, rng):
+    """
+    Get skewed weights for a number of categories, in a random rank order.
+
+    Args:
+        count (int): The number of categories.
+        skew (float): The Zipf exponent, higher is more skewed.
+        rng: The random generator.
+
+    Returns:
+        ndarray: The probabilities of the categories.
+    """
+    weights = 1 / np.arange(1, count + 1) ** skew
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def generate_hires(rows, seed=DEFAULT_SEED):
+    """
+    Generate hires in chunks of CHUNK_SIZE columns.
+
+    Every chunk has its own random generator derived from the seed, so
+    chunks can be generated and consumed one at a time.
+
+    Args:
+        rows (int): The number of hires.
+        seed (int): The random seed.
+
+    Yields:
+        dict: Arrays of id, department_id, job_id and datetime (as
+        datetime64[s]) for a chunk of hires.
+    """
+    department_ids = np.array([row[0] for row in departments()])
+    job_ids = np.array([row[0] for row in jobs()])
+
+    # The skew depends only on the seed
+    setup = np.random.default_rng([seed, 0])
+    department_weights = zipf_weights(
+        len(department_ids), DEPARTMENT_SKEW, setup)
+    job_weights = zipf_weights(len(job_ids), JOB_SKEW, setup)
+    month_weights = MONTH_WEIGHTS / MONTH_WEIGHTS.sum()
+
+    for chunk, start in enumerate(range(0, rows, CHUNK_SIZE)):
+        # Full chunks are always drawn, so the records don't depend on rows
+        rng = np.random.default_rng([seed, chunk + 1])
+        years = FIRST_YEAR + rng.integers(0, YEARS, CHUNK_SIZE)
+        months = rng.choice(12, CHUNK_SIZE, p=month_weights)
+        month_starts = ((years - 1970) * 12 + months).astype("datetime64[M]")
+        month_days = ((month_starts + 1).astype("datetime64[D]")
+                      - month_starts.astype("datetime64[D]")).astype(int)
+        seconds = (rng.random(CHUNK_SIZE) * month_days * 86400).astype(int)
+        department_id = rng.choice(department_ids, CHUNK_SIZE, p=department_weights)
+        job_id = rng.choice(job_ids, CHUNK_SIZE, p=job_weights)
+
+        count = min(CHUNK_SIZE, rows - start)
+        yield {
+            "id": np.arange(start + 1, start + count + 1),
+            "department_id": department_id[:count],
+            "job_id": job_id[:count],
+            "datetime": (month_starts.astype("datetime64[s]") + seconds)[:count],
+        }
+
+
+def hire_records(chunk):
+    """
+    Convert a chunk of hires into records for the ingest path.
+
+    Args:
+        chunk (dict): The arrays of a chunk.
+
+    Returns:
+        list: The records, with datetimes in the format of the API.
+    """
+    hired_at = np.char.replace(
+        np.datetime_as_string(chunk["datetime"]), "T", " ").tolist()
+    return [
+        {"id": id, "name": f"Employee {id}", "datetime": when,
+         "department_id": department_id, "job_id": job_id}
+        for id, when, department_id, job_id in zip(
+            chunk["id"].tolist(), hired_at,
+            chunk["department_id"].tolist(), chunk["job_id"].tolist())
+    ]
+
+
+def write_csv(output, rows, seed=DEFAULT_SEED):
+    """
+    Write departments, jobs and hires in the format of the migration files.
+
+    Args:
+        output (str): The output folder.
+        rows (int): The number of hires.
+        seed (int): The random seed.
+    """
+    os.makedirs(output, exist_ok=True)
+
+    for filename, values in (("departments.csv", departments()), ("jobs.csv", jobs())):
+        with open(os.path.join(output, filename), "w", newline="") as file:
+            csv.writer(file).writerows(values)
+
+    with open(os.path.join(output, "hired_employees.csv"), "w", newline="") as file:
+        writer = csv.writer(file)
+        for chunk in generate_hires(rows, seed):
+            hired_at = np.datetime_as_string(chunk["datetime"]).tolist()
+            writer.writerows(
+                (id, f"Employee {id}", f"{when}Z", department_id, job_id)
+                for id, when, department_id, job_id in zip(
+                    chunk["id"].tolist(), hired_at,
+                    chunk["department_id"].tolist(), chunk["job_id"].tolist()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write synthetic hires as migration CSV files")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    write_csv(args.output, args.rows, args.seed)
+    print(f"{args.rows} hires written to {args.output}")
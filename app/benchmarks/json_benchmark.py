@@ -0,0 +1,85 @@
+"""
+Benchmark of the request parse and response encode cost for 1000-row payloads.
+
+Compares the default FastAPI path (json + pydantic validation of PostRequest
+for requests, jsonable_encoder + json for responses) against the orjson path
+used by the ingest and report endpoints.
+
+Usage (from the app folder):
+    python -m benchmarks.json_benchmark
+"""
+# Library imports
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+import json
+import orjson
+import timeit
+
+# Local imports
+from src.schemas import PostRequest
+from benchmarks.validation_benchmark import build_payload
+
+# Constants
+ROWS = 1000
+REPEAT = 5
+NUMBER = 20
+
+
+def build_report(rows=ROWS):
+    """
+    Build a quarterly hires report like the one returned by /report/quarterly_hires.
+
+    Args:
+        rows (int): The number of rows.
+
+    Returns:
+        dict: The report response.
+    """
+    return {
+        "message": "Quarterly hires grouped by department and job",
+        "data": [
+            {"department": f"Department {i % 12}", "job": f"Job {i}",
+             "Q1": i % 7, "Q2": i % 5, "Q3": i % 3, "Q4": i % 11}
+            for i in range(rows)
+        ]
+    }
+
+
+def best_ms(func):
+    """
+    Measure the best cost of a function call.
+
+    Args:
+        func: The function to be measured.
+
+    Returns:
+        float: The cost per call in milliseconds.
+    """
+    return min(timeit.repeat(func, repeat=REPEAT, number=NUMBER)) / NUMBER * 1e3
+
+
+if __name__ == "__main__":
+    adapter = TypeAdapter(PostRequest)
+    body = json.dumps(build_payload()).encode("utf-8")
+    ingest_response = {
+        "message": f"{ROWS} employee(s) created successfully",
+        "success": build_payload(),
+        "failed": None
+    }
+    report = build_report()
+
+    results = {
+        "parse 1000 employees (json + pydantic)": best_ms(
+            lambda: adapter.validate_python(json.loads(body))),
+        "parse 1000 employees (orjson)": best_ms(lambda: orjson.loads(body)),
+        "encode ingest response (jsonable_encoder + json)": best_ms(
+            lambda: json.dumps(jsonable_encoder(ingest_response)).encode("utf-8")),
+        "encode ingest response (orjson)": best_ms(
+            lambda: orjson.dumps(ingest_response)),
+        "encode 1000-row report (jsonable_encoder + json)": best_ms(
+            lambda: json.dumps(jsonable_encoder(report)).encode("utf-8")),
+        "encode 1000-row report (orjson)": best_ms(lambda: orjson.dumps(report)),
+    }
+
+    for name, cost in results.items():
+        print(f"{name:<52} {cost:8.3f} ms")
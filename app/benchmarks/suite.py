@@ -0,0 +1,410 @@
+"""
+Benchmark suite for the migration, the ingest path, the reports and the
+AVRO backup and restore, on synthetic hires.
+
+The database is taken from DATABASE_URL and ASYNC_DATABASE_URL, like the
+API, so it runs against the MySQL container or a SQLite file. The tables
+are dropped and created again, so the suite refuses to run on a database
+with data unless --reset is given.
+
+Usage (from the app folder):
+    DATABASE_URL=sqlite:///bench.db ASYNC_DATABASE_URL=sqlite+aiosqlite:///bench.db \\
+        python -m benchmarks.suite --rows 1000000
+
+The timings are written as JSON to benchmarks/results, tagged with the
+commit, to be compared with benchmarks.compare.
+"""
+# Library imports
+from datetime import date, datetime
+from sqlalchemy import func, select
+from statistics import median
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+# Local imports
+from src.database import Base, SessionLocal, async_engine, engine, DATABASE_URL
+from src.models import Department, Job, HiredEmployee
+from src.api.api_utils import batch_create, MAX_RECORDS_PER_REQUEST
+from src.avro.avro_utils import backup_options, stream_avro_backup, stream_avro_full_backup, restore_table_from_avro, AVRO_CODECS
+from src.reports import columnar, reports_utils
+from src.reports.hires_summary import rebuild_hires_summary
+from src.reports.reports_utils import get_report_period
+from .generator import DEFAULT_SEED, departments, jobs, generate_hires, hire_records, write_csv
+
+# Constants
+ROOT_DIR = os.path.join(os.path.dirname(__file__), "..", "..")
+MIGRATION_DIR = os.path.join(ROOT_DIR, "data_migration")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+REPORT_REPEATS = 5
+UPSERT_ROWS = 100000
+# Periods of the reports: a whole year and a period inside quarters
+REPORT_PERIODS = {
+    "year": get_report_period(2021),
+    "range": get_report_period(start=date(2021, 2, 15), end=date(2021, 11, 15)),
+}
+REPORT_BACKENDS = {"sql": reports_utils, "columnar": columnar}
+
+
+def git_revision():
+    """
+    Get the commit of the working tree.
+
+    Returns:
+        dict: The commit and whether the tree has uncommitted changes, or
+        None values outside of a git checkout.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT_DIR,
+            capture_output=True, text=True, check=True).stdout
+        return {"commit": commit, "dirty": bool(status.strip())}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def reset_tables(force):
+    """
+    Drop and create the tables of the API.
+
+    Args:
+        force (bool): Whether to drop tables that have data.
+
+    Raises:
+        SystemExit: If the tables have data and force is False.
+    """
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        has_data = any(
+            db.execute(select(func.count()).select_from(model)).scalar()
+            for model in (Department, Job, HiredEmployee))
+    if has_data and not force:
+        raise SystemExit(
+            "The database has data, run with --reset to drop it")
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+
+class Benchmark:
+    """
+    Runner of timed steps, collecting the results of the run.
+
+    A failing step is recorded with its error and the run goes on, so one
+    broken step doesn't lose the timings of the others.
+    """
+
+    def __init__(self, rows, seed):
+        self.results = {
+            **git_revision(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "dialect": engine.dialect.name,
+            "python": platform.python_version(),
+            "rows": rows,
+            "seed": seed,
+            "steps": {},
+        }
+
+    def run(self, name, step, rows=None, repeat=1):
+        """
+        Time a step, keeping the median of the repeats.
+
+        Args:
+            name (str): The step name.
+            step: The function running the step, returning extra results
+                as a dictionary, if any.
+            rows (int): The rows processed by the step, for the throughput.
+            repeat (int): The number of runs.
+
+        Returns:
+            dict: The results of the step.
+        """
+        runs = []
+        extra = {}
+        try:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                extra = step() or {}
+                runs.append(time.perf_counter() - started)
+        except Exception as e:
+            result = {"error": f"{type(e).__name__}: {e}"}
+        else:
+            result = {"seconds": median(runs), **extra}
+            if repeat > 1:
+                result["runs"] = runs
+            if rows:
+                result["rows"] = rows
+                result["rows_per_second"] = rows / result["seconds"] if result["seconds"] else None
+
+        self.results["steps"][name] = result
+        print(f"{name}: {result.get('seconds', result.get('error'))}")
+        return result
+
+    def write(self, output):
+        """
+        Write the results as JSON.
+
+        Args:
+            output (str): The file path, or a folder for a file named after
+                the timestamp and the commit.
+
+        Returns:
+            str: The file path.
+        """
+        if os.path.isdir(output) or not output.endswith(".json"):
+            os.makedirs(output, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            commit = (self.results["commit"] or "nogit")[:12]
+            output = os.path.join(output, f"{stamp}_{commit}.json")
+
+        with open(output, "w") as file:
+            json.dump(self.results, file, indent=2)
+        return output
+
+
+def migrate(rows, seed, folder):
+    """
+    Run the data migration on synthetic CSV files.
+
+    Args:
+        rows (int): The number of hires.
+        seed (int): The random seed.
+        folder (str): The folder for the CSV files.
+    """
+    write_csv(folder, rows, seed)
+    process = subprocess.run(
+        [sys.executable, os.path.join("src", "main.py")], cwd=MIGRATION_DIR,
+        env={**os.environ, "DATABASE_URL": DATABASE_URL, "DATA_PATH": folder},
+        capture_output=True, text=True)
+    if process.returncode:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+
+
+def ingest(model_class, records, mode="insert"):
+    """
+    Ingest records through batch_create in batches of the API size.
+
+    Args:
+        model_class: The model class.
+        records: The records.
+        mode (str): "insert" or "upsert".
+
+    Returns:
+        dict: The number of failed records.
+    """
+    failed = 0
+    with SessionLocal() as db:
+        for start in range(0, len(records), MAX_RECORDS_PER_REQUEST):
+            _, failed_records = batch_create(
+                db, model_class, records[start:start + MAX_RECORDS_PER_REQUEST], mode=mode)
+            failed += len(failed_records)
+    return {"failed": failed}
+
+
+def ingest_hires(rows, seed):
+    """
+    Ingest the synthetic hires chunk by chunk.
+
+    Args:
+        rows (int): The number of hires.
+        seed (int): The random seed.
+
+    Returns:
+        dict: The number of failed records.
+    """
+    failed = 0
+    for chunk in generate_hires(rows, seed):
+        failed += ingest(HiredEmployee, hire_records(chunk))["failed"]
+    return {"failed": failed}
+
+
+def run_report(report, period):
+    """
+    Run a report on its own session, bypassing the report cache.
+
+    Args:
+        report: The report function.
+        period (tuple): The start and end of the period.
+
+    Returns:
+        dict: The number of report rows.
+    """
+    with SessionLocal() as db:
+        return {"result_rows": len(report(db, *period))}
+
+
+async def write_backup(filename, options):
+    """
+    Drain the streamed backup of hired_employees into a file, like the
+    backup endpoint streams it to a client.
+
+    Args:
+        filename (str): The backup file.
+        options (dict): The writer options.
+    """
+    try:
+        content = await stream_avro_backup(
+            HiredEmployee, HiredEmployee.__tablename__, options)
+        with open(filename, "wb") as file:
+            async for data in content:
+                file.write(data)
+    finally:
+        # Every step runs its own event loop, the pool can't outlive it
+        await async_engine.dispose()
+
+
+def backup(folder, codec, sync_interval=None):
+    """
+    Back up hired_employees to an AVRO file, through the streamed backup
+    of the API.
+
+    Args:
+        folder (str): The backup folder.
+        codec (str): The compression codec.
+        sync_interval (int): The bytes of records per block, the default if None.
+
+    Returns:
+        dict: The file, its size and the sync interval.
+    """
+    options = backup_options(codec, sync_interval=sync_interval)
+    filename = os.path.join(folder, f"{HiredEmployee.__tablename__}_{codec}.avro")
+    asyncio.run(write_backup(filename, options))
+    return {"file": filename, "bytes": os.path.getsize(filename),
+            "sync_interval": options["sync_interval"]}
+
+
+def full_backup():
+    """
+    Stream the ZIP file of AVRO files of every table, discarding it.
+
+    Returns:
+        dict: The size of the file.
+    """
+    content = stream_avro_full_backup([Department, Job, HiredEmployee])
+    return {"bytes": sum(len(data) for data in content)}
+
+
+def restore(filename):
+    """
+    Restore hired_employees from an AVRO file.
+
+    Args:
+        filename (str): The backup file.
+
+    Returns:
+        dict: The number of failed records.
+    """
+    with SessionLocal() as db, open(filename, "rb") as file:
+        result = restore_table_from_avro(
+            SimpleNamespace(file=file), db, HiredEmployee, HiredEmployee.__tablename__)
+    return {"failed": len(result["failed"] or [])}
+
+
+def run_suite(args):
+    """
+    Run every step of the suite.
+
+    Args:
+        args: The command line arguments.
+
+    Returns:
+        Benchmark: The benchmark with the results.
+    """
+    benchmark = Benchmark(args.rows, args.seed)
+    reset_tables(args.reset)
+
+    with TemporaryDirectory(prefix="benchmark") as folder:
+        if args.migration_rows:
+            benchmark.run("migration", lambda: migrate(
+                args.migration_rows, args.seed, os.path.join(folder, "csv")),
+                rows=args.migration_rows)
+            reset_tables(True)
+
+        references = [{"id": id, "department": name} for id, name in departments()]
+        benchmark.run("ingest_departments", lambda: ingest(Department, references),
+                      rows=len(references))
+        references = [{"id": id, "job": name} for id, name in jobs()]
+        benchmark.run("ingest_jobs", lambda: ingest(Job, references),
+                      rows=len(references))
+        benchmark.run("ingest_hires", lambda: ingest_hires(args.rows, args.seed),
+                      rows=args.rows)
+
+        upsert_rows = min(args.rows, UPSERT_ROWS)
+        records = hire_records(next(generate_hires(upsert_rows, args.seed)))
+        benchmark.run("upsert_unchanged_hires", lambda: ingest(HiredEmployee, records, "upsert"),
+                      rows=upsert_rows)
+
+        def summary_rebuild():
+            with SessionLocal() as db:
+                rebuild_hires_summary(db)
+        benchmark.run("rebuild_summary", summary_rebuild, rows=args.rows)
+
+        # The first columnar report loads the snapshot
+        def snapshot_load():
+            with SessionLocal() as db:
+                columnar.hires_snapshot.get(db)
+        benchmark.run("columnar_snapshot_load", snapshot_load, rows=args.rows)
+
+        for backend, reports in REPORT_BACKENDS.items():
+            for report in (reports.get_quarterly_hires, reports.get_departments_above_average):
+                for period_name, period in REPORT_PERIODS.items():
+                    benchmark.run(
+                        f"report_{report.__name__[4:]}_{period_name}_{backend}",
+                        lambda: run_report(report, period), repeat=args.repeat)
+            for granularity in ("quarter", "week"):
+                benchmark.run(
+                    f"report_hires_cube_{granularity}_{backend}",
+                    lambda: run_report(reports.get_hires_cube, (*REPORT_PERIODS["year"], granularity)),
+                    repeat=args.repeat)
+
+        # The compression ratio is relative to the uncompressed backup
+        uncompressed = None
+        for codec in sorted(set(args.codecs), key=AVRO_CODECS.index):
+            backup_result = benchmark.run(
+                f"avro_backup_{codec}", lambda: backup(folder, codec, args.sync_interval),
+                rows=args.rows)
+            if "file" not in backup_result:
+                continue
+            if codec == "null":
+                uncompressed = backup_result["bytes"]
+            if uncompressed:
+                backup_result["compression_ratio"] = uncompressed / backup_result["bytes"]
+            filename = backup_result.pop("file")
+            benchmark.run(f"avro_restore_{codec}", lambda: restore(filename), rows=args.rows)
+        benchmark.run("avro_full_backup", full_backup, rows=args.rows)
+
+    return benchmark
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the migration, ingest, reports and backups")
+    parser.add_argument("--rows", type=int, default=1000000,
+                        help="synthetic hires to ingest")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--migration-rows", type=int, default=10000,
+                        help="hires for the migration, which commits row by row (0 to skip)")
+    parser.add_argument("--repeat", type=int, default=REPORT_REPEATS,
+                        help="runs of every report")
+    parser.add_argument("--codecs", nargs="+", choices=AVRO_CODECS, default=list(AVRO_CODECS),
+                        help="codecs of the AVRO backup and restore steps")
+    parser.add_argument("--sync-interval", type=int,
+                        help="bytes of records per AVRO block (default AVRO_SYNC_INTERVAL)")
+    parser.add_argument("--reset", action="store_true",
+                        help="drop the tables even if they have data")
+    parser.add_argument("--output", default=RESULTS_DIR,
+                        help="results file or folder")
+    args = parser.parse_args()
+
+    benchmark = run_suite(args)
+    print(f"Results written to {benchmark.write(args.output)}")
@@ -0,0 +1,129 @@
+"""
+Micro-benchmark of the per-row validation cost of the ingest path.
+
+Compares the per-row column introspection that batch_create used to do
+against the compiled validators from src.api.validators on a 1000-row
+employees payload, both row by row and with the columnar batch path.
+
+Usage (from the app folder):
+    python -m benchmarks.validation_benchmark
+"""
+# Library imports
+from datetime import datetime
+import timeit
+
+# Local imports
+from src.models import HiredEmployee
+from src.api.validators import get_validator
+
+# Constants
+ROWS = 1000
+REPEAT = 5
+NUMBER = 20
+
+
+def build_payload(rows=ROWS):
+    """
+    Build an employees payload like the ones sent to /employees/.
+
+    Args:
+        rows (int): The number of records.
+
+    Returns:
+        list: The list of records.
+    """
+    return [
+        {
+            "name": f"Employee {i}",
+            "datetime": f"2021-{i % 12 + 1:02d}-{i % 28 + 1:02d} 10:{i % 60:02d}:00",
+            "department_id": str(i % 12 + 1),
+            "job_id": i % 180 + 1,
+        }
+        for i in range(rows)
+    ]
+
+
+def legacy_validate(model_class, raw_data):
+    """
+    Validation as it was done inside the batch_create loop, resolving the
+    model columns for every record.
+    """
+    model_columns = model_class.__table__.columns.keys()
+    filtered_data = {
+        key: value for key, value in raw_data.items() if key in model_columns
+    }
+
+    missing_fields = []
+    type_errors = []
+
+    for col_name, column in model_class.__table__.columns.items():
+        if col_name not in filtered_data:
+            if not column.nullable and col_name != "id":
+                missing_fields.append(col_name)
+            continue
+
+        value = filtered_data[col_name]
+        expected_type = column.type.python_type
+
+        if not isinstance(value, expected_type):
+            try:
+                if expected_type == int and isinstance(value, str) and value.isdigit():
+                    filtered_data[col_name] = int(value)
+                elif expected_type == float and isinstance(value, (int, str)) and str(value).replace('.', '', 1).isdigit():
+                    filtered_data[col_name] = float(value)
+                elif expected_type == datetime:
+                    filtered_data[col_name] = datetime.strptime(
+                        value, "%Y-%m-%d %H:%M:%S")
+                else:
+                    raise TypeError(
+                        f"Value '{value}' is not of type {expected_type.__name__}")
+            except Exception as te:
+                type_errors.append(f"{col_name}: {te}")
+
+    if missing_fields:
+        type_errors.insert(
+            0, f"Missing required fields: {', '.join(missing_fields)}")
+
+    if type_errors:
+        raise ValueError("; ".join(type_errors))
+
+    return filtered_data
+
+
+def per_row_cost(func, payload):
+    """
+    Measure the best per-row cost of a validation function.
+
+    Args:
+        func: The function validating a single record.
+        payload (list): The records to be validated.
+
+    Returns:
+        float: The cost per row in microseconds.
+    """
+    def run():
+        for record in payload:
+            func(record)
+
+    best = min(timeit.repeat(run, repeat=REPEAT, number=NUMBER))
+    return best / (NUMBER * len(payload)) * 1e6
+
+
+if __name__ == "__main__":
+    payload = build_payload()
+    validator = get_validator(HiredEmployee)
+
+    before = per_row_cost(
+        lambda record: legacy_validate(HiredEmployee, record), payload)
+    after = per_row_cost(validator, payload)
+
+    # The columnar path validates the whole payload in one call
+    columnar = min(timeit.repeat(
+        lambda: validator.validate_batch(payload), repeat=REPEAT, number=NUMBER))
+    columnar = columnar / (NUMBER * len(payload)) * 1e6
+
+    print(f"Rows per payload: {len(payload)}")
+    print(f"Before (per-row introspection): {before:.2f} us/row")
+    print(f"After (compiled validator):     {after:.2f} us/row")
+    print(f"Columnar (validate_batch):      {columnar:.2f} us/row")
+    print(f"Speedup: {before / after:.2f}x compiled, {before / columnar:.2f}x columnar")
@@ -1,10 +1,83 @@
 # Library imports
 from fastapi import HTTPException
-from datetime import datetime
+from fastapi.exceptions import RequestValidationError
+from functools import lru_cache
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import insert, select, text
+from sqlalchemy.dialects import mysql, sqlite
+from starlette.concurrency import run_in_threadpool
+from uuid import uuid4
+import csv
+import json
+import orjson
+import os
+import time
+
+# Shared imports
+from error_log import get_error_log
+
+# Local imports
+from ..database import checkout, checkout_async, engine
+from ..schemas import PostRequest
+from .validators import get_validator, DATETIME_FORMAT
+from .reference_cache import check_references, invalidate_references
+from ..reports.hires_summary import update_hires_summary
+from ..reports.report_cache import invalidate_reports
+from ..reports.columnar import invalidate_snapshot
 
 # Constants
 MAX_RECORDS_PER_REQUEST = 1000
+BULK_INSERT_BATCH_SIZE = 1000
+STREAM_CHUNK_SIZE = 1000
+MAX_STREAM_CHUNK_SIZE = 10000
+REJECTS_DIR = "./.data/rejects"
+# Seconds a reject file is kept if it is never downloaded
+REJECTS_RETENTION = int(os.getenv("REJECTS_RETENTION", "86400"))
+PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
 error_log_file = "./.data/api_errors.txt"
+error_log = get_error_log(error_log_file)
+post_request_adapter = TypeAdapter(PostRequest)
+
+# Function for parsing the request body
+
+
+async def parse_post_body(request):
+    """
+    Parse a JSON request body with orjson.
+
+    The body is decoded straight into Python objects and only its shape is
+    checked. Pydantic only validates bodies of the wrong shape, to report
+    the same errors as a PostRequest parameter would.
+
+    Args:
+        request (Request): The request.
+
+    Returns:
+        dict | list: The parsed body, a register or a list of registers.
+
+    Raises:
+        RequestValidationError: If the body is not valid JSON or not a
+        register or a list of registers.
+    """
+    try:
+        body = orjson.loads(await request.body())
+    except orjson.JSONDecodeError as e:
+        raise RequestValidationError([{
+            "loc": ("body",),
+            "msg": f"Invalid JSON: {e}",
+            "type": "json_invalid",
+        }])
+
+    if isinstance(body, dict) or (isinstance(body, list) and all(isinstance(item, dict) for item in body)):
+        return body
+
+    try:
+        post_request_adapter.validate_python(body)
+    except ValidationError as e:
+        raise RequestValidationError([
+            {**error, "loc": ("body", *error["loc"])} for error in e.errors()])
+    return body
 
 # Function for validating record limit
 
@@ -20,9 +93,8 @@ def validate_record_limit(data):
         HTTPException: If the record limit is exceeded.
     """
     if len(data) > MAX_RECORDS_PER_REQUEST:
-        with open(error_log_file, "a") as error_log:
-            error_log.write(
-                f"You can only send {MAX_RECORDS_PER_REQUEST} records at a time\n")
+        error_log.write(
+            f"You can only send {MAX_RECORDS_PER_REQUEST} records at a time", total_records=len(data))
         raise HTTPException(
             status_code=422,
             detail={
@@ -31,97 +103,739 @@ def validate_record_limit(data):
             }
         )
 
-# Function for batch creating records
+# Function for bulk inserting records
 
 
-def batch_create(db, model_class, model_list):
+def insert_records(db, model_class, rows, ids=None):
     """
-    Batch create records.
+    Insert records using one multi-row INSERT per batch.
+
+    Each batch is committed as a single transaction. If a batch fails it is
+    rolled back and bisected until the offending records are isolated, so
+    a bad record only costs the statements needed to find it.
+
+    Args:
+        db: The database connection.
+        model_class: The model class.
+        rows: A list of (index, data) tuples with validated data.
+        ids (dict): Optional dictionary collecting the primary key of every
+            inserted record, keyed by its index.
+
+    Returns:
+        dict: The error message of every failed record, keyed by its index.
+    """
+    errors = {}
+
+    for start in range(0, len(rows), BULK_INSERT_BATCH_SIZE):
+        _insert_batch(db, model_class.__table__,
+                      rows[start:start + BULK_INSERT_BATCH_SIZE], errors, ids)
+
+    return errors
+
+
+@lru_cache(maxsize=None)
+def consecutive_ids():
+    """
+    Check whether the ids generated by a multi-row INSERT are consecutive.
+
+    They are with innodb_autoinc_lock_mode 0 or 1, but MySQL 8 defaults to
+    2, where concurrent inserts interleave their ids. The mode can't change
+    while the server runs, so it is read once.
+
+    Returns:
+        bool: Whether the ids can be computed from the first one.
+    """
+    if engine.dialect.name != "mysql":
+        return True
+    with checkout() as connection:
+        mode = connection.execute(
+            text("SELECT @@innodb_autoinc_lock_mode")).scalar()
+    return int(mode) in (0, 1)
+
+
+def validate_ids_mode(mode):
+    """
+    Check that the generated primary keys can be returned.
+
+    Args:
+        mode (str): "insert" or "upsert", upserted records always have their
+            primary key.
+
+    Raises:
+        HTTPException: If the server doesn't generate consecutive ids.
+    """
+    if mode == "insert" and not consecutive_ids():
+        raise HTTPException(
+            status_code=422,
+            detail="response=ids is not available for inserts, the database runs with innodb_autoinc_lock_mode=2")
+
+
+def _generated_ids(db, result, count):
+    """
+    Get the primary keys generated by a multi-row INSERT.
+
+    MySQL reports the first generated id and SQLite the last one. The ids of
+    a single statement are only known if they are consecutive, otherwise
+    they are None.
+
+    Args:
+        db: The database connection.
+        result: The result of the INSERT.
+        count (int): The number of inserted records.
+
+    Returns:
+        range: The generated primary keys, in insertion order.
+    """
+    if result.lastrowid is None or not consecutive_ids():
+        return [None] * count
+    if db.get_bind().dialect.name == "sqlite":
+        return range(result.lastrowid - count + 1, result.lastrowid + 1)
+    return range(result.lastrowid, result.lastrowid + count)
+
+
+def _insert_batch(db, table, rows, errors, ids=None):
+    """
+    Insert a batch of records in one transaction, bisecting it on failure.
+
+    Args:
+        db: The database connection.
+        table: The table to insert into.
+        rows: A list of (index, data) tuples.
+        errors: The dictionary collecting the failed records.
+        ids: The dictionary collecting the primary keys, if any.
+    """
+    if not rows:
+        return
+
+    primary_key = table.primary_key.columns.values()[0].name
+    batch_ids = {}
+
+    try:
+        # Records with different fields can't share a VALUES clause
+        groups = {}
+        for index, data in rows:
+            groups.setdefault(tuple(data.keys()), []).append((index, data))
+
+        for group in groups.values():
+            result = db.execute(insert(table).values(
+                [data for _, data in group]))
+
+            if ids is not None:
+                if primary_key in group[0][1]:
+                    batch_ids.update(
+                        (index, data[primary_key]) for index, data in group)
+                else:
+                    batch_ids.update(zip(
+                        (index for index, _ in group), _generated_ids(db, result, len(group))))
+
+        # The summaries are updated in the same transaction as the rows
+        update_hires_summary(db, table, added=[data for _, data in rows])
+        db.commit()
+
+        if ids is not None:
+            ids.update(batch_ids)
+
+    except Exception as e:
+        db.rollback()
+
+        if len(rows) == 1:
+            errors[rows[0][0]] = str(e)
+            return
+
+        middle = len(rows) // 2
+        _insert_batch(db, table, rows[:middle], errors, ids)
+        _insert_batch(db, table, rows[middle:], errors, ids)
+
+# Function for bulk upserting records
+
+
+def upsert_records(db, model_class, rows, ids=None, outcomes=None):
+    """
+    Insert or update records using one INSERT ... ON DUPLICATE KEY UPDATE
+    per batch.
+
+    The existing rows of a batch are read (and locked) first to tell which
+    records are new, which change a row and which are identical to it.
+    Unchanged records are not written. Batches are committed and bisected on
+    failure like in insert_records.
+
+    Args:
+        db: The database connection.
+        model_class: The model class.
+        rows: A list of (index, data) tuples with validated data, all of them
+            with their primary key.
+        ids (dict): Optional dictionary collecting the primary key of every
+            upserted record, keyed by its index.
+        outcomes (dict): Optional dictionary collecting "inserted", "updated"
+            or "unchanged" for every upserted record, keyed by its index.
+
+    Returns:
+        dict: The error message of every failed record, keyed by its index.
+    """
+    errors = {}
+
+    for start in range(0, len(rows), BULK_INSERT_BATCH_SIZE):
+        _upsert_batch(db, model_class.__table__,
+                      rows[start:start + BULK_INSERT_BATCH_SIZE], errors, ids, outcomes)
+
+    return errors
+
+
+def _upsert_statement(db, table, values):
+    """
+    Build the upsert of a group of records with the same fields.
 
     Args:
         db: The database connection.
+        table: The table to upsert into.
+        values (list): The records.
+
+    Returns:
+        Insert: The INSERT statement updating the existing rows.
+    """
+    primary_key = table.primary_key.columns.values()[0].name
+    fields = [name for name in values[0] if name != primary_key]
+
+    if db.get_bind().dialect.name == "sqlite":
+        statement = sqlite.insert(table).values(values)
+        return statement.on_conflict_do_update(
+            index_elements=[primary_key],
+            set_={name: statement.excluded[name] for name in fields})
+
+    statement = mysql.insert(table).values(values)
+    return statement.on_duplicate_key_update(
+        {name: statement.inserted[name] for name in fields})
+
+
+def _upsert_batch(db, table, rows, errors, ids=None, outcomes=None):
+    """
+    Upsert a batch of records in one transaction, bisecting it on failure.
+
+    Args:
+        db: The database connection.
+        table: The table to upsert into.
+        rows: A list of (index, data) tuples.
+        errors: The dictionary collecting the failed records.
+        ids: The dictionary collecting the primary keys, if any.
+        outcomes: The dictionary collecting the outcomes, if any.
+    """
+    if not rows:
+        return
+
+    primary_key = table.primary_key.columns.values()[0]
+
+    try:
+        keys = {data[primary_key.name] for _, data in rows}
+        current = {
+            row[primary_key.name]: row
+            for row in db.execute(
+                select(table).where(primary_key.in_(keys)).with_for_update()
+            ).mappings()
+        }
+
+        # Compare every record with the row it will replace, the previous
+        # record with the same key in the batch included
+        batch_outcomes = {}
+        groups = {}
+        added = []
+        removed = []
+        for index, data in rows:
+            key = data[primary_key.name]
+            row = current.get(key)
+            if row is None:
+                batch_outcomes[index] = "inserted"
+            elif all(row[name] == value for name, value in data.items()):
+                batch_outcomes[index] = "unchanged"
+                continue
+            else:
+                batch_outcomes[index] = "updated"
+
+            current[key] = {**row, **data} if row is not None else data
+            groups.setdefault(tuple(data.keys()), []).append(data)
+            added.append(current[key])
+            if row is not None:
+                removed.append(row)
+
+        for group in groups.values():
+            db.execute(_upsert_statement(db, table, group))
+
+        # The summaries are updated in the same transaction as the rows
+        update_hires_summary(db, table, added, removed)
+        db.commit()
+
+        if ids is not None:
+            ids.update((index, data[primary_key.name]) for index, data in rows)
+        if outcomes is not None:
+            outcomes.update(batch_outcomes)
+
+    except Exception as e:
+        db.rollback()
+
+        if len(rows) == 1:
+            errors[rows[0][0]] = str(e)
+            return
+
+        middle = len(rows) // 2
+        _upsert_batch(db, table, rows[:middle], errors, ids, outcomes)
+        _upsert_batch(db, table, rows[middle:], errors, ids, outcomes)
+
+# Functions for validating and inserting records
+
+
+def validate_records(model_class, model_list, mode="insert"):
+    """
+    Validate records, keeping track of each record by its index.
+
+    It only runs Python code, so the async endpoints run it in the
+    threadpool instead of the event loop.
+
+    Args:
         model_class: The model class.
         model_list: The list of model instances.
+        mode (str): "insert" or "upsert".
 
     Returns:
-        list: A list of successfully inserted records.
-        list: A list of failed records.
+        list: The (index, data) tuples of the valid records.
+        dict: The error message of every invalid record, keyed by its index.
     """
-    successfully_inserted = []
-    failed_records = []
+    valid_rows, errors = get_validator(
+        model_class).validate_batch(model_list)
 
-    for item in model_list:
-        try:
-            # Extract values based on data type
-            raw_data = item
+    if mode == "upsert":
+        # Records can only be matched to a row by their primary key
+        primary_key = model_class.__table__.primary_key.columns.values()[
+            0].name
+        for index, data in valid_rows:
+            if primary_key not in data:
+                errors[index] = f"Missing required fields: {primary_key}"
+        valid_rows = [row for row in valid_rows if row[0] not in errors]
 
-            # Filter fields that don't exist in the model
-            model_columns = model_class.__table__.columns.keys()
-            filtered_data = {
-                key: value for key, value in raw_data.items() if key in model_columns
-            }
+    return valid_rows, errors
 
-            # Automatic type and field validation
-            missing_fields = []
-            type_errors = []
-
-            for col_name, column in model_class.__table__.columns.items():
-                if col_name not in filtered_data:
-                    if not column.nullable and col_name != "id":
-                        missing_fields.append(col_name)
-                    continue
-
-                value = filtered_data[col_name]
-                expected_type = column.type.python_type
-
-                # Try to validate type
-                if not isinstance(value, expected_type):
-                    try:
-                        # Try to convert to basic type if possible
-                        if expected_type == int and isinstance(value, str) and value.isdigit():
-                            filtered_data[col_name] = int(value)
-                        elif expected_type == float and isinstance(value, (int, str)) and str(value).replace('.', '', 1).isdigit():
-                            filtered_data[col_name] = float(value)
-                        elif expected_type == datetime:
-                            filtered_data[col_name] = datetime.strptime(
-                                value, "%Y-%m-%d %H:%M:%S")
-                        else:
-                            with open(error_log_file, "a") as error_log:
-                                error_log.write(
-                                    f"Value '{value}' is not of type {expected_type.__name__}\n")
-                            raise TypeError(
-                                f"Value '{value}' is not of type {expected_type.__name__}")
-                    except Exception as te:
-                        type_errors.append(f"{col_name}: {te}")
-
-            if missing_fields:
-                # Insert missing fields at the beginning of the list
-                type_errors.insert(
-                    0, f"Missing required fields: {', '.join(missing_fields)}")
-
-            if type_errors:
-                # Raise a ValueError with the joined type errors
-                raise ValueError("; ".join(type_errors))
-
-            # Create an instance of the model and save it
-            db_item = model_class(**filtered_data)
-            db.add(db_item)
-            db.flush()
-            db.commit()
-            successfully_inserted.append(raw_data)
 
-        except Exception as e:
+def store_records(db, model_class, valid_rows, errors, mode="insert", outcomes=None, ids=None):
+    """
+    Insert validated records, keeping track of each record by its index.
+
+    Args:
+        db: The database connection.
+        model_class: The model class.
+        valid_rows: The (index, data) tuples of the valid records.
+        errors (dict): The errors of the records, updated with the ones of
+            the insert.
+        mode (str): "insert" or "upsert".
+        outcomes (dict): Optional dictionary collecting "inserted",
+            "updated" or "unchanged" for every stored record, keyed by its
+            index.
+        ids (dict): Optional dictionary collecting the primary keys. It is
+            updated as every batch commits, so it tells which records were
+            stored if an error interrupts the insert.
+
+    Returns:
+        dict: The primary key of every inserted record, keyed by its index.
+    """
+    # Reject records with unknown foreign keys before touching the table
+    reference_errors = check_references(db, model_class, valid_rows)
+    if reference_errors:
+        errors.update(reference_errors)
+        valid_rows = [row for row in valid_rows if row[0] not in errors]
+
+    # The keys are always collected for the report snapshot
+    ids = {} if ids is None else ids
+    try:
+        if mode == "upsert":
+            errors.update(upsert_records(
+                db, model_class, valid_rows, ids, outcomes))
+        else:
+            errors.update(insert_records(db, model_class, valid_rows, ids))
+            if outcomes is not None:
+                outcomes.update(
+                    (index, "inserted") for index, _ in valid_rows if index not in errors)
+    finally:
+        # The batches committed before an error are stored too
+        if ids:
+            invalidate_references(model_class)
+            invalidate_reports()
+            invalidate_snapshot(model_class, ids.values(), mode == "upsert")
+
+    return ids
+
+
+def ingest_records(db, model_class, model_list, return_ids=False, mode="insert", outcomes=None):
+    """
+    Validate and insert records, keeping track of each record by its index.
+
+    Args:
+        db: The database connection.
+        model_class: The model class.
+        model_list: The list of model instances.
+        return_ids (bool): Whether to collect the primary keys of the
+            inserted records.
+        mode (str): "insert" to add new records or "upsert" to insert or
+            update records by their primary key.
+        outcomes (dict): Optional dictionary collecting "inserted",
+            "updated" or "unchanged" for every stored record, keyed by its
+            index.
+
+    Returns:
+        dict: The error message of every failed record, keyed by its index.
+        dict: The primary key of every inserted record, keyed by its index,
+        or None if return_ids is False.
+    """
+    valid_rows, errors = validate_records(model_class, model_list, mode)
+    ids = store_records(db, model_class, valid_rows, errors, mode, outcomes)
+    return errors, ids if return_ids else None
+
+# Functions for batch creating records
+
+
+def batch_results(model_class, model_list, errors, ids, return_ids=False, outcomes=None, counts=None):
+    """
+    Split a batch into its inserted and failed records.
+
+    Args:
+        model_class: The model class.
+        model_list: The list of model instances.
+        errors (dict): The error message of every failed record.
+        ids (dict): The primary key of every inserted record.
+        return_ids (bool): Whether to return the primary keys of the
+            inserted records instead of the records.
+        outcomes (dict): The outcome of every stored record, if counted.
+        counts (dict): Optional dictionary collecting the number of
+            inserted, updated and unchanged records.
+
+    Returns:
+        list: A list of successfully inserted records, or their primary keys.
+        list: A list of failed records.
+    """
+    if counts is not None:
+        for outcome in ("inserted", "updated", "unchanged"):
+            counts.setdefault(outcome, 0)
+        for outcome in outcomes.values():
+            counts[outcome] += 1
+
+    successfully_inserted = []
+    failed_records = []
+
+    for index, raw_data in enumerate(model_list):
+        if index in errors:
             # Add the record and error to the failed records list
             failed_records.append({
                 "record": raw_data,
-                "error": str(e)
+                "error": errors[index]
             })
-            db.rollback()
-            db.expire_all()
+        elif return_ids:
+            successfully_inserted.append(ids[index])
+        else:
+            successfully_inserted.append(raw_data)
 
-        if failed_records:
-            with open(error_log_file, "a") as error_log:
-                error_log.write(
-                    f"Failed to create {len(failed_records)} records in {model_class.__tablename__}\nFailed records:\n{failed_records}\n")
+    if failed_records:
+        error_log.write(
+            f"Failed to create {len(failed_records)} records in {model_class.__tablename__}",
+            table=model_class.__tablename__, failed_records=failed_records)
 
     return successfully_inserted, failed_records
+
+
+def batch_create(db, model_class, model_list, return_ids=False, mode="insert", counts=None):
+    """
+    Batch create records.
+
+    Args:
+        db: The database connection.
+        model_class: The model class.
+        model_list: The list of model instances.
+        return_ids (bool): Whether to return the primary keys of the inserted
+            records instead of the records.
+        mode (str): "insert" or "upsert".
+        counts (dict): Optional dictionary collecting the number of
+            inserted, updated and unchanged records.
+
+    Returns:
+        list: A list of successfully inserted records, or their primary keys.
+        list: A list of failed records.
+    """
+    outcomes = {} if counts is not None else None
+    errors, ids = ingest_records(
+        db, model_class, model_list, True, mode, outcomes)
+    return batch_results(model_class, model_list, errors, ids, return_ids, outcomes, counts)
+
+
+async def async_batch_create(db, model_class, model_list, return_ids=False, mode="insert", counts=None):
+    """
+    Batch create records on an async session.
+
+    Only the database work runs on the event loop. Validating the records
+    and building the results run in the threadpool, so a large batch
+    doesn't hold up the other requests.
+
+    Args:
+        db (AsyncSession): The async database session.
+        model_class: The model class.
+        model_list: The list of model instances.
+        return_ids (bool): Whether to return the primary keys of the inserted
+            records instead of the records.
+        mode (str): "insert" or "upsert".
+        counts (dict): Optional dictionary collecting the number of
+            inserted, updated and unchanged records.
+
+    Returns:
+        list: A list of successfully inserted records, or their primary keys.
+        list: A list of failed records.
+    """
+    outcomes = {} if counts is not None else None
+    valid_rows, errors = await run_in_threadpool(
+        validate_records, model_class, model_list, mode)
+    ids = await db.run_sync(
+        store_records, model_class, valid_rows, errors, mode, outcomes)
+    return await run_in_threadpool(
+        batch_results, model_class, model_list, errors, ids, return_ids, outcomes, counts)
+
+# Functions for streaming ingest
+
+
+async def iter_lines(stream):
+    """
+    Split a byte stream into lines as it arrives.
+
+    Args:
+        stream: The async iterator of body chunks.
+
+    Yields:
+        bytes: Each line without its line break.
+    """
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        if b"\n" not in chunk:
+            continue
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r")
+
+    if buffer.strip():
+        yield buffer.rstrip(b"\r")
+
+
+async def iter_records(lines, csv_format=False):
+    """
+    Parse NDJSON or CSV lines into records.
+
+    CSV input must start with a header row and can't have line breaks inside
+    a field. Empty CSV fields are left out of the record.
+
+    Args:
+        lines: The async iterator of lines.
+        csv_format (bool): Whether the lines are CSV instead of NDJSON.
+
+    Yields:
+        tuple: The record and None, or the raw line and the parse error.
+    """
+    header = None
+
+    async for line in lines:
+        if not line.strip():
+            continue
+
+        try:
+            text = line.decode("utf-8")
+            if not csv_format:
+                yield json.loads(text), None
+                continue
+
+            values = next(csv.reader([text]))
+            if header is None:
+                header = values
+                continue
+            if len(values) != len(header):
+                raise ValueError(
+                    f"Expected {len(header)} fields, found {len(values)}")
+            yield {key: value for key, value in zip(header, values) if value != ""}, None
+
+        except Exception as e:
+            yield line.decode("utf-8", errors="replace"), f"Invalid line: {e}"
+
+
+def write_rejects(path, rejects):
+    """
+    Append rejected records to a reject file.
+
+    Args:
+        path (str): The path to the reject file.
+        rejects (list): The rejected records and their errors.
+    """
+    os.makedirs(REJECTS_DIR, exist_ok=True)
+    with open(path, "a") as reject_file:
+        for reject in rejects:
+            reject_file.write(json.dumps(reject, default=str) + "\n")
+
+
+async def stream_create(db, model_class, records, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Create records from a stream, committing them in chunks.
+
+    Every chunk goes through batch_create, so the same validation rules
+    apply. Failed records are written to a reject file instead of being
+    returned in the response.
+
+    Args:
+        db: The async database connection.
+        model_class: The model class.
+        records: The async iterator of (record, error) tuples.
+        chunk_size (int): The number of records sent to batch_create at a time.
+
+    Returns:
+        dict: The number of received, inserted and failed records and the id
+        of the reject file.
+    """
+    await run_in_threadpool(prune_rejects)
+
+    reject_id = uuid4().hex
+    reject_path = os.path.join(REJECTS_DIR, f"{reject_id}.ndjson")
+    summary = {"total": 0, "inserted": 0, "failed": 0}
+    rejects = []
+    chunk = []
+
+    async def flush():
+        if chunk:
+            success, failed = await async_batch_create(
+                db, model_class, chunk)
+            summary["inserted"] += len(success)
+            rejects.extend(failed)
+            chunk.clear()
+
+        # Write the rejects as they come to keep memory flat
+        if rejects:
+            await run_in_threadpool(write_rejects, reject_path, rejects)
+            summary["failed"] += len(rejects)
+            rejects.clear()
+
+    async for record, error in records:
+        summary["total"] += 1
+        if error is not None:
+            rejects.append({"record": record, "error": error})
+            if len(rejects) >= chunk_size:
+                await flush()
+            continue
+
+        chunk.append(record)
+        if len(chunk) + len(rejects) >= chunk_size:
+            await flush()
+
+    await flush()
+
+    summary["rejects"] = reject_id if summary["failed"] else None
+    return summary
+
+
+def prune_rejects(retention=REJECTS_RETENTION):
+    """
+    Delete the reject files older than the retention period.
+
+    Args:
+        retention (int): The seconds a reject file is kept.
+    """
+    if not os.path.isdir(REJECTS_DIR):
+        return
+
+    expired = time.time() - retention
+    for entry in os.scandir(REJECTS_DIR):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < expired:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            # Removed by a download or another prune
+            pass
+
+
+def remove_reject_file(path):
+    """
+    Delete a reject file once it has been downloaded.
+
+    Args:
+        path (str): The path to the reject file.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def get_reject_file(reject_id):
+    """
+    Get the path of a reject file.
+
+    Args:
+        reject_id (str): The id returned by a streaming ingest.
+
+    Returns:
+        str: The path to the reject file.
+
+    Raises:
+        HTTPException: If the reject file doesn't exist.
+    """
+    path = os.path.join(REJECTS_DIR, f"{reject_id}.ndjson")
+    if len(reject_id) != 32 or any(c not in "0123456789abcdef" for c in reject_id) or not os.path.exists(path):
+        raise HTTPException(
+            status_code=404, detail=f"Reject file {reject_id} not found")
+    return path
+
+# Function for reading records
+
+
+async def stream_page(table, conditions=(), after=None, limit=PAGE_SIZE):
+    """
+    Stream a page of records as JSON, using keyset pagination on the
+    primary key.
+
+    The rows are read from a server-side cursor on a connection of their
+    own and encoded one by one, so no ORM objects are built and the page is
+    never held in memory. Datetimes use the same format as the ingest
+    endpoints, so the records can be sent back as they are.
+
+    Args:
+        table: The table to read.
+        conditions: The filters of the query.
+        after: The last primary key of the previous page, if any.
+        limit (int): The maximum number of records of the page.
+
+    Yields:
+        bytes: The chunks of {"data": [...], "next_after": ...}, where
+        next_after is the value of after for the next page, or null on the
+        last page.
+    """
+    primary_key = table.primary_key.columns.values()[0]
+
+    statement = select(table).where(*conditions)
+    if after is not None:
+        statement = statement.where(primary_key > after)
+    # One extra row tells whether there is a next page
+    statement = statement.order_by(primary_key).limit(limit + 1)
+
+    def encode(row):
+        return orjson.dumps(
+            dict(row), default=lambda value: value.strftime(DATETIME_FORMAT),
+            option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+    count = 0
+    last = None
+    next_after = None
+
+    connection = await checkout_async()
+    try:
+        result = await connection.stream(statement)
+        try:
+            yield b'{"data":['
+            async for row in result.mappings():
+                if count == limit:
+                    next_after = last
+                    break
+                yield (b"," if count else b"") + encode(row)
+                count += 1
+                last = row[primary_key.name]
+        finally:
+            await result.close()
+    finally:
+        await connection.close()
+
+    yield b'],"next_after":' + orjson.dumps(next_after) + b"}"
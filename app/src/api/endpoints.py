@@ -1,132 +1,340 @@
 # Library imports
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from typing import Literal, Optional
+
+# Shared imports
+from error_log import get_error_log
 
 # Local imports
-from ..schemas import PostRequest
-from ..database import get_db
+from ..schemas import POST_REQUEST_OPENAPI
+from ..database import get_async_db
 from ..models import Department, Job, HiredEmployee
 from .api_utils import *
+from .idempotency import run_idempotent, MAX_IDEMPOTENCY_KEY_LENGTH
+from .ingest_queue import ingest_queue
 
 # Router
 router = APIRouter()
 
 # Error log file
 error_log_file = "./.data/api_errors.txt"
+error_log = get_error_log(error_log_file)
 
 
-@router.post("/departments/")
-def create_departments(request: PostRequest, db: Session = Depends(get_db)):
+async def create_table(request, db, model_class, label, idempotency_key, response_mode="full", wait=True, mode="insert"):
     """
-    Create departments.
+    Create the records of a table from a register or a list of registers.
 
     Args:
-        request (PostRequest): The request body.
-        db (Session): The database session.
+        request (dict | list): The parsed request body, a register or a
+            list of registers.
+        db (AsyncSession): The async database session.
+        model_class: The model class.
+        label (str): The name of the records in the message.
+        idempotency_key (str): The Idempotency-Key header, if any.
+        response_mode (str): "full" to echo the inserted records, "ids" to
+            return their primary keys or "summary" to return only counts.
+        wait (bool): Whether to insert the records before responding, or to
+            queue them and answer 202 with a job id.
+        mode (str): "insert" to add new records or "upsert" to insert or
+            update them by primary key.
 
     Returns:
-        dict: A dictionary containing the message and success/failed records.
-    """
-    if isinstance(request, dict):
-        department_list = [request]
-    elif isinstance(request, list):
-        department_list = request
-    else:
-        with open(error_log_file, "a") as error_log:
-            error_log.write(
-                "Invalid request: Request must be a register or a list of registers\n")
-        return {"message": "Invalid request", "error": "Request must be a register or a list of registers"}
+        ORJSONResponse: The message and success/failed records.
+    """
+    # The body is a register or a list of registers, checked when parsed
+    record_list = [request] if isinstance(request, dict) else request
 
-    validate_record_limit(department_list)
+    validate_record_limit(record_list)
+    if response_mode == "ids":
+        await run_in_threadpool(validate_ids_mode, mode)
 
-    success_registers, errors = batch_create(
-        db, Department, department_list)
+    async def execute():
+        if not wait:
+            job = ingest_queue.submit(
+                model_class, record_list, response_mode == "ids", mode)
+            return {
+                "message": f"{len(record_list)} {label}(s) accepted",
+                "job_id": job.id,
+                "status_url": f"/ingest/jobs/{job.id}"
+            }
 
-    if errors:
-        with open(error_log_file, "a") as error_log:
+        counts = {} if mode == "upsert" else None
+        success_registers, errors = await async_batch_create(
+            db, model_class, record_list, response_mode == "ids", mode, counts)
+
+        if errors:
             error_log.write(
-                f"{len(errors)} department(s) failed to create\n")
-    return {
-        "message": f"{len(success_registers)} department(s) created successfully",
-        "success": success_registers,
-        "failed": errors if errors else None
-    }
+                f"{len(errors)} {label}(s) failed to create", table=model_class.__tablename__)
 
+        action = "upserted" if mode == "upsert" else "created"
+        result = {
+            "message": f"{len(success_registers)} {label}(s) {action} successfully",
+        }
+        if response_mode == "full":
+            result["success"] = success_registers
+        elif counts is None:
+            result["inserted"] = len(success_registers)
+        if counts is not None:
+            result.update(counts)
+        if response_mode == "ids":
+            result["ids"] = success_registers
+        result["failed"] = errors if errors else None
+        return result
 
-@router.post("/jobs/")
-def create_jobs(request: PostRequest, db: Session = Depends(get_db)):
+    status_code = 200 if wait else 202
+
+    if idempotency_key is None:
+        return ORJSONResponse(await execute(), status_code=status_code)
+
+    options = {"response": response_mode, "wait": wait, "mode": mode}
+    result, replayed = await run_idempotent(
+        db, f"{model_class.__tablename__}:{idempotency_key}", record_list, execute, options)
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return ORJSONResponse(result, status_code=status_code, headers=headers)
+
+
+@router.post("/departments/", openapi_extra=POST_REQUEST_OPENAPI)
+async def create_departments(request: Request, response_mode: Literal["summary", "ids", "full"] = Query("full", alias="response"), wait: bool = True, mode: Literal["insert", "upsert"] = "insert", idempotency_key: Optional[str] = Header(None, max_length=MAX_IDEMPOTENCY_KEY_LENGTH), db: AsyncSession = Depends(get_async_db)):
     """
-    Create jobs.
+    Create departments.
 
     Args:
-        request (PostRequest): The request body.
-        db (Session): The database session.
+        request (Request): The request, its JSON body is a register or a list of registers.
+        response_mode (str): The response mode, summary, ids or full.
+        wait (bool): False to queue the batch and get a job id back.
+        mode (str): "upsert" to update the records that already exist.
+        idempotency_key (str): Key making retries of the same batch safe.
+        db (AsyncSession): The async database session.
 
     Returns:
-        dict: A dictionary containing the message and success/failed records.
-    """
-    if isinstance(request, dict):
-        job_list = [request]
-    elif isinstance(request, list):
-        job_list = request
-    else:
-        with open(error_log_file, "a") as error_log:
-            error_log.write(
-                "Invalid request: Request must be a register or a list of registers\n")
-        return {"message": "Invalid request", "error": "Request must be a register or a list of registers"}
+        ORJSONResponse: The message and success/failed records.
+    """
+    return await create_table(await parse_post_body(request), db, Department, "department", idempotency_key, response_mode, wait, mode)
 
-    validate_record_limit(job_list)
 
-    success_registers, errors = batch_create(
-        db, Job, job_list)
+@router.post("/jobs/", openapi_extra=POST_REQUEST_OPENAPI)
+async def create_jobs(request: Request, response_mode: Literal["summary", "ids", "full"] = Query("full", alias="response"), wait: bool = True, mode: Literal["insert", "upsert"] = "insert", idempotency_key: Optional[str] = Header(None, max_length=MAX_IDEMPOTENCY_KEY_LENGTH), db: AsyncSession = Depends(get_async_db)):
+    """
+    Create jobs.
 
-    if errors:
-        with open(error_log_file, "a") as error_log:
-            error_log.write(
-                f"{len(errors)} job(s) failed to create\n")
+    Args:
+        request (Request): The request, its JSON body is a register or a list of registers.
+        response_mode (str): The response mode, summary, ids or full.
+        wait (bool): False to queue the batch and get a job id back.
+        mode (str): "upsert" to update the records that already exist.
+        idempotency_key (str): Key making retries of the same batch safe.
+        db (AsyncSession): The async database session.
 
-    return {
-        "message": f"{len(success_registers)} job(s) created successfully",
-        "success": success_registers,
-        "failed": errors if errors else None
-    }
+    Returns:
+        ORJSONResponse: The message and success/failed records.
+    """
+    return await create_table(await parse_post_body(request), db, Job, "job", idempotency_key, response_mode, wait, mode)
 
 
-@router.post("/employees/")
-def create_employees(request: PostRequest, db: Session = Depends(get_db)):
+@router.post("/employees/", openapi_extra=POST_REQUEST_OPENAPI)
+async def create_employees(request: Request, response_mode: Literal["summary", "ids", "full"] = Query("full", alias="response"), wait: bool = True, mode: Literal["insert", "upsert"] = "insert", idempotency_key: Optional[str] = Header(None, max_length=MAX_IDEMPOTENCY_KEY_LENGTH), db: AsyncSession = Depends(get_async_db)):
     """
     Create employees.
 
     Args:
-        request (PostRequest): The request body.
-        db (Session): The database session.
+        request (Request): The request, its JSON body is a register or a list of registers.
+        response_mode (str): The response mode, summary, ids or full.
+        wait (bool): False to queue the batch and get a job id back.
+        mode (str): "upsert" to update the records that already exist.
+        idempotency_key (str): Key making retries of the same batch safe.
+        db (AsyncSession): The async database session.
 
     Returns:
-        dict: A dictionary containing the message and success/failed records.
-    """
-    if isinstance(request, dict):
-        employee_list = [request]
-    elif isinstance(request, list):
-        employee_list = request
-    else:
-        with open(error_log_file, "a") as error_log:
-            error_log.write(
-                "Invalid request: Request must be a register or a list of registers\n")
-        return {"message": "Invalid request", "error": "Request must be a register or a list of registers"}
+        ORJSONResponse: The message and success/failed records.
+    """
+    return await create_table(await parse_post_body(request), db, HiredEmployee, "employee", idempotency_key, response_mode, wait, mode)
 
-    validate_record_limit(employee_list)
 
-    success_registers, errors = batch_create(
-        db, HiredEmployee, employee_list)
+async def stream_table(request, db, model_class, chunk_size, label):
+    """
+    Create the records of a table from a streamed NDJSON or CSV body.
 
-    if errors:
-        with open(error_log_file, "a") as error_log:
-            error_log.write(
-                f"{len(errors)} employee(s) failed to create\n")
+    Args:
+        request (Request): The request with the streamed body.
+        db (AsyncSession): The async database session.
+        model_class: The model class.
+        chunk_size (int): The number of records committed at a time.
+        label (str): The name of the records in the message.
+
+    Returns:
+        dict: A dictionary containing the message and the ingest summary.
+    """
+    csv_format = request.headers.get(
+        "content-type", "").startswith("text/csv")
+    records = iter_records(iter_lines(request.stream()), csv_format)
+
+    summary = await stream_create(db, model_class, records, chunk_size)
+
+    if summary["failed"]:
+        error_log.write(
+            f"{summary['failed']} {label}(s) failed to create",
+            table=model_class.__tablename__, rejects=summary["rejects"])
 
     return {
-        "message": f"{len(success_registers)} employee(s) created successfully",
-        "success": success_registers,
-        "failed": errors if errors else None
+        "message": f"{summary['inserted']} {label}(s) created successfully",
+        **summary
     }
+
+
+@router.post("/departments/stream")
+async def stream_departments(request: Request, chunk_size: int = Query(STREAM_CHUNK_SIZE, ge=1, le=MAX_STREAM_CHUNK_SIZE), db: AsyncSession = Depends(get_async_db)):
+    """
+    Create departments from a NDJSON or CSV body of any size.
+
+    Args:
+        request (Request): The request with the streamed body.
+        chunk_size (int): The number of records committed at a time.
+        db (AsyncSession): The async database session.
+
+    Returns:
+        dict: A dictionary containing the message and the ingest summary.
+    """
+    return await stream_table(request, db, Department, chunk_size, "department")
+
+
+@router.post("/jobs/stream")
+async def stream_jobs(request: Request, chunk_size: int = Query(STREAM_CHUNK_SIZE, ge=1, le=MAX_STREAM_CHUNK_SIZE), db: AsyncSession = Depends(get_async_db)):
+    """
+    Create jobs from a NDJSON or CSV body of any size.
+
+    Args:
+        request (Request): The request with the streamed body.
+        chunk_size (int): The number of records committed at a time.
+        db (AsyncSession): The async database session.
+
+    Returns:
+        dict: A dictionary containing the message and the ingest summary.
+    """
+    return await stream_table(request, db, Job, chunk_size, "job")
+
+
+@router.post("/employees/stream")
+async def stream_employees(request: Request, chunk_size: int = Query(STREAM_CHUNK_SIZE, ge=1, le=MAX_STREAM_CHUNK_SIZE), db: AsyncSession = Depends(get_async_db)):
+    """
+    Create employees from a NDJSON or CSV body of any size.
+
+    Args:
+        request (Request): The request with the streamed body.
+        chunk_size (int): The number of records committed at a time.
+        db (AsyncSession): The async database session.
+
+    Returns:
+        dict: A dictionary containing the message and the ingest summary.
+    """
+    return await stream_table(request, db, HiredEmployee, chunk_size, "employee")
+
+
+@router.get("/rejects/{reject_id}")
+def download_rejects(reject_id: str):
+    """
+    Download the rejected records of a streaming ingest.
+
+    Args:
+        reject_id (str): The id returned by the streaming endpoint.
+
+    Returns:
+        FileResponse: The NDJSON file with the rejected records and their
+        errors, deleted once it has been sent.
+    """
+    path = get_reject_file(reject_id)
+    return FileResponse(
+        path=path,
+        filename=f"rejects_{reject_id}.ndjson",
+        media_type="application/x-ndjson",
+        background=BackgroundTask(remove_reject_file, path)
+    )
+
+
+@router.get("/ingest/jobs/{job_id}")
+def get_ingest_job(job_id: str):
+    """
+    Get the status of a queued ingest job.
+
+    Args:
+        job_id (str): The id returned when the batch was accepted.
+
+    Returns:
+        dict: The status, counts and failures of the job.
+    """
+    job = ingest_queue.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404, detail=f"Ingest job {job_id} not found")
+    return job.to_dict()
+
+
+@router.get("/departments/")
+def read_departments(after: Optional[int] = None, limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """
+    Read departments, a page at a time.
+
+    Args:
+        after (int): The next_after value of the previous page.
+        limit (int): The maximum number of departments of the page.
+
+    Returns:
+        StreamingResponse: The departments and the next_after value.
+    """
+    return StreamingResponse(
+        stream_page(Department.__table__, after=after, limit=limit),
+        media_type="application/json")
+
+
+@router.get("/jobs/")
+def read_jobs(after: Optional[int] = None, limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """
+    Read jobs, a page at a time.
+
+    Args:
+        after (int): The next_after value of the previous page.
+        limit (int): The maximum number of jobs of the page.
+
+    Returns:
+        StreamingResponse: The jobs and the next_after value.
+    """
+    return StreamingResponse(
+        stream_page(Job.__table__, after=after, limit=limit),
+        media_type="application/json")
+
+
+@router.get("/employees/")
+def read_employees(after: Optional[int] = None, limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), department_id: Optional[int] = None, job_id: Optional[int] = None, start: Optional[datetime] = Query(None, alias="from"), end: Optional[datetime] = Query(None, alias="to")):
+    """
+    Read employees, a page at a time.
+
+    Args:
+        after (int): The next_after value of the previous page.
+        limit (int): The maximum number of employees of the page.
+        department_id (int): Only employees of this department.
+        job_id (int): Only employees with this job.
+        start (datetime): Only employees hired at or after this time.
+        end (datetime): Only employees hired before this time.
+
+    Returns:
+        StreamingResponse: The employees and the next_after value.
+    """
+    table = HiredEmployee.__table__
+    conditions = []
+    if department_id is not None:
+        conditions.append(table.c.department_id == department_id)
+    if job_id is not None:
+        conditions.append(table.c.job_id == job_id)
+    if start is not None:
+        conditions.append(table.c.datetime >= start)
+    if end is not None:
+        conditions.append(table.c.datetime < end)
+
+    return StreamingResponse(
+        stream_page(table, conditions, after, limit),
+        media_type="application/json")
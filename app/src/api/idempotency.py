@@ -0,0 +1,221 @@
+# Library imports
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy import delete
+from threading import Lock
+import hashlib
+import json
+import os
+import time
+
+# Shared imports
+from error_log import get_error_log
+
+# Local imports
+from ..models import IdempotencyKey
+
+# Constants
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_PERSIST = os.getenv(
+    "IDEMPOTENCY_PERSIST", "false").lower() in ("1", "true", "yes")
+# The stored key is prefixed with the table name and must fit String(255)
+MAX_IDEMPOTENCY_KEY_LENGTH = 200
+error_log_file = "./.data/api_errors.txt"
+error_log = get_error_log(error_log_file)
+
+
+def fingerprint(records, options=None):
+    """
+    Hash a batch so a key reused with a different payload can be detected.
+
+    Args:
+        records (list): The records of the request.
+        options (dict): The query options of the request, which change what
+            is stored and returned.
+
+    Returns:
+        str: The SHA-256 hex digest of the records and options.
+    """
+    payload = json.dumps([records, options or {}], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class IdempotencyCache:
+    """
+    Bounded LRU cache of batch outcomes by idempotency key.
+
+    Entries expire after the TTL. Keys whose request is still running are
+    tracked so a concurrent retry is rejected instead of executed twice.
+    """
+
+    def __init__(self, max_size=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.in_flight = set()
+        self.lock = Lock()
+
+    def get(self, key):
+        """
+        Get the stored outcome of a key.
+
+        Args:
+            key (str): The idempotency key.
+
+        Returns:
+            tuple: The fingerprint and response, or None if not stored.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def put(self, key, digest, response):
+        """
+        Store the outcome of a key, evicting the least recently used ones.
+
+        Args:
+            key (str): The idempotency key.
+            digest (str): The fingerprint of the request.
+            response (dict): The response returned for the request.
+        """
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, digest, response)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def begin(self, key):
+        """
+        Mark a key as running.
+
+        Args:
+            key (str): The idempotency key.
+
+        Raises:
+            HTTPException: If a request with the same key is still running.
+        """
+        with self.lock:
+            if key in self.in_flight:
+                raise HTTPException(
+                    status_code=409, detail="A request with this Idempotency-Key is still in progress")
+            self.in_flight.add(key)
+
+    def end(self, key):
+        """
+        Mark a key as finished.
+
+        Args:
+            key (str): The idempotency key.
+        """
+        with self.lock:
+            self.in_flight.discard(key)
+
+
+idempotency_cache = IdempotencyCache()
+
+# Functions for the persisted keys
+
+
+def load_persisted(db, key):
+    """
+    Load the stored outcome of a key from the idempotency_keys table.
+
+    Args:
+        db: The database connection.
+        key (str): The idempotency key.
+
+    Returns:
+        tuple: The fingerprint and response, or None if not stored.
+    """
+    entry = db.get(IdempotencyKey, key)
+    if entry is None:
+        return None
+    if entry.created_at < datetime.now() - timedelta(seconds=IDEMPOTENCY_TTL):
+        return None
+    return entry.fingerprint, json.loads(entry.response)
+
+
+def save_persisted(db, key, digest, response):
+    """
+    Store the outcome of a key in the idempotency_keys table, purging the
+    expired ones.
+
+    Args:
+        db: The database connection.
+        key (str): The idempotency key.
+        digest (str): The fingerprint of the request.
+        response (dict): The response returned for the request.
+    """
+    now = datetime.now()
+    db.execute(delete(IdempotencyKey).where(
+        IdempotencyKey.created_at < now - timedelta(seconds=IDEMPOTENCY_TTL)))
+    db.merge(IdempotencyKey(
+        key=key,
+        fingerprint=digest,
+        response=json.dumps(response, default=str),
+        created_at=now
+    ))
+    db.commit()
+
+
+async def run_idempotent(db, key, records, execute, options=None):
+    """
+    Run a batch once per idempotency key.
+
+    A replayed key returns the stored response without running the batch.
+
+    Args:
+        db (AsyncSession): The async database session.
+        key (str): The idempotency key, scoped to the endpoint.
+        records (list): The records of the request.
+        execute: The coroutine function running the batch.
+        options (dict): The query options of the request.
+
+    Returns:
+        dict: The response of the batch.
+        bool: Whether the response was replayed.
+
+    Raises:
+        HTTPException: If the key was used with a different payload or
+        options, or is still running.
+    """
+    digest = fingerprint(records, options)
+
+    idempotency_cache.begin(key)
+    try:
+        stored = idempotency_cache.get(key)
+        if stored is None and IDEMPOTENCY_PERSIST:
+            stored = await db.run_sync(load_persisted, key)
+            if stored is not None:
+                idempotency_cache.put(key, *stored)
+
+        if stored is not None:
+            if stored[0] != digest:
+                raise HTTPException(
+                    status_code=422, detail="Idempotency-Key was already used with a different payload or options")
+            return stored[1], True
+
+        response = await execute()
+
+        idempotency_cache.put(key, digest, response)
+        if IDEMPOTENCY_PERSIST:
+            # The batch is already committed, so the response is returned
+            # even if only the in-memory cache has the key
+            try:
+                await db.run_sync(save_persisted, key, digest, response)
+            except Exception as e:
+                await db.rollback()
+                error_log.write(
+                    f"Error persisting Idempotency-Key: {str(e)}", key=key)
+
+        return response, False
+    finally:
+        idempotency_cache.end(key)
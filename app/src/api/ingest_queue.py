@@ -0,0 +1,289 @@
+# Library imports
+from collections import OrderedDict
+from datetime import datetime
+from fastapi import HTTPException
+from queue import Queue, Empty, Full
+from threading import Thread, Lock
+from uuid import uuid4
+import os
+
+# Shared imports
+from error_log import get_error_log
+
+# Local imports
+from ..database import open_session
+from ..models import Department, Job, HiredEmployee
+from .api_utils import store_records, validate_records
+
+# Constants
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "100"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+INGEST_COALESCE_ROWS = int(os.getenv("INGEST_COALESCE_ROWS", "5000"))
+INGEST_JOB_RETENTION = 10000
+# Tables in the order their foreign keys need them
+TABLE_ORDER = (Department, Job, HiredEmployee)
+error_log_file = "./.data/api_errors.txt"
+error_log = get_error_log(error_log_file)
+
+
+class IngestJob:
+    """
+    A batch accepted for background insertion and its outcome.
+    """
+
+    def __init__(self, model_class, records, return_ids=False, mode="insert"):
+        self.id = uuid4().hex
+        self.model_class = model_class
+        self.records = records
+        self.total = len(records)
+        self.return_ids = return_ids
+        self.mode = mode
+        self.status = "queued"
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.inserted = None
+        self.ids = None
+        self.failed = None
+        self.counts = None
+        self.error = None
+
+    def fail(self, error):
+        """
+        Mark the job as failed.
+
+        Args:
+            error (Exception): The error that stopped the job.
+        """
+        self.status = "failed"
+        self.error = str(error)
+        self.records = None
+        self.finished_at = datetime.now()
+
+    def to_dict(self):
+        """
+        Get the status of the job.
+
+        Returns:
+            dict: The status, counts and failures of the job.
+        """
+        status = {
+            "id": self.id,
+            "table": self.model_class.__tablename__,
+            "status": self.status,
+            "mode": self.mode,
+            "total": self.total,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        # A failed job may have stored part of its records
+        if self.inserted is not None:
+            status["inserted"] = self.inserted
+            if self.counts is not None:
+                status.update(self.counts)
+            if self.return_ids:
+                status["ids"] = self.ids
+            status["failed"] = self.failed if self.failed else None
+        if self.error is not None:
+            status["error"] = self.error
+        return status
+
+
+class IngestQueue:
+    """
+    Bounded in-process queue of ingest jobs served by a pool of workers.
+
+    Each worker takes a job and drains the jobs queued behind it up to
+    INGEST_COALESCE_ROWS records, so small batches of the same table are
+    inserted together. Jobs still queued when the process stops are lost.
+    """
+
+    def __init__(self, workers=INGEST_WORKERS, max_size=INGEST_QUEUE_SIZE):
+        self.workers = workers
+        self.queue = Queue(maxsize=max_size)
+        self.jobs = OrderedDict()
+        self.threads = []
+        self.lock = Lock()
+
+    def start(self):
+        """
+        Start the workers if they are not running.
+        """
+        with self.lock:
+            if self.threads:
+                return
+            for number in range(self.workers):
+                thread = Thread(
+                    target=self._run, name=f"ingest-worker-{number}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def submit(self, model_class, records, return_ids=False, mode="insert"):
+        """
+        Queue a batch for insertion.
+
+        Args:
+            model_class: The model class.
+            records (list): The records to be inserted.
+            return_ids (bool): Whether to report primary keys instead of records.
+            mode (str): "insert" or "upsert".
+
+        Returns:
+            IngestJob: The queued job.
+
+        Raises:
+            HTTPException: If the queue is full.
+        """
+        self.start()
+        job = IngestJob(model_class, records, return_ids, mode)
+
+        with self.lock:
+            self.jobs[job.id] = job
+            while len(self.jobs) > INGEST_JOB_RETENTION:
+                self.jobs.popitem(last=False)
+
+        try:
+            self.queue.put_nowait(job)
+        except Full:
+            with self.lock:
+                self.jobs.pop(job.id, None)
+            raise HTTPException(
+                status_code=503,
+                detail="Ingest queue is full, try again later",
+                headers={"Retry-After": "1"})
+
+        return job
+
+    def get(self, job_id):
+        """
+        Get a job by id.
+
+        Args:
+            job_id (str): The id of the job.
+
+        Returns:
+            IngestJob: The job, or None if it doesn't exist.
+        """
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _run(self):
+        while True:
+            jobs = [self.queue.get()]
+            try:
+                rows = jobs[0].total
+
+                # Coalesce the jobs queued behind the first one
+                while rows < INGEST_COALESCE_ROWS:
+                    try:
+                        job = self.queue.get_nowait()
+                    except Empty:
+                        break
+                    jobs.append(job)
+                    rows += job.total
+
+                groups = OrderedDict()
+                for job in jobs:
+                    groups.setdefault(
+                        (job.model_class, job.mode), []).append(job)
+
+                # Referenced tables first, so hires queued before their
+                # department or job still find it
+                for (model_class, mode), group in sorted(groups.items(), key=table_order):
+                    self._process(model_class, mode, group)
+            except Exception as e:
+                # The worker must survive, only the unfinished jobs fail
+                unfinished = [job for job in jobs if job.status in ("queued", "running")]
+                for job in unfinished:
+                    job.fail(e)
+                error_log.write(
+                    f"Ingest worker error: {str(e)}", jobs=[job.id for job in unfinished])
+
+    def _process(self, model_class, mode, jobs):
+        """
+        Insert the records of several jobs of the same table together.
+
+        The records are committed in batches, so if an error interrupts the
+        insert, the jobs whose records were all stored (or rejected) before
+        it are still done.
+
+        Args:
+            model_class: The model class.
+            mode (str): "insert" or "upsert".
+            jobs (list): The jobs to be processed.
+        """
+        started_at = datetime.now()
+        for job in jobs:
+            job.status = "running"
+            job.started_at = started_at
+
+        records = [record for job in jobs for record in job.records]
+        outcomes = {} if mode == "upsert" else None
+        errors = {}
+        ids = {}
+        error = None
+
+        try:
+            valid_rows, errors = validate_records(model_class, records, mode)
+            with open_session() as db:
+                store_records(db, model_class, valid_rows,
+                              errors, mode, outcomes, ids)
+        except Exception as e:
+            error = e
+            error_log.write(
+                f"Ingest job failed: {str(e)}", table=model_class.__tablename__, jobs=[job.id for job in jobs])
+
+        # Split the outcome back into the jobs
+        offset = 0
+        for job in jobs:
+            job.failed = []
+            job.ids = [] if job.return_ids else None
+            if outcomes is not None:
+                job.counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+            pending = 0
+            for index, record in enumerate(job.records, start=offset):
+                if index in errors:
+                    job.failed.append(
+                        {"record": record, "error": errors[index]})
+                elif index not in ids:
+                    # Not stored when the error happened
+                    pending += 1
+                    continue
+                else:
+                    if job.return_ids:
+                        job.ids.append(ids[index])
+                    if outcomes is not None and index in outcomes:
+                        job.counts[outcomes[index]] += 1
+            job.inserted = job.total - len(job.failed) - pending
+            offset += job.total
+
+            if pending:
+                job.fail(error or "Records were not stored")
+            else:
+                # Only the outcome is kept once the job is done
+                job.records = None
+                job.status = "done"
+                job.finished_at = datetime.now()
+
+            if job.failed:
+                error_log.write(
+                    f"Failed to create {len(job.failed)} records in {model_class.__tablename__}",
+                    table=model_class.__tablename__, job=job.id, failed_records=job.failed)
+
+
+def table_order(group):
+    """
+    Sort key of the groups of coalesced jobs, referenced tables first.
+
+    Args:
+        group (tuple): The (model class, mode) of the group and its jobs.
+
+    Returns:
+        int: The position of the table in TABLE_ORDER.
+    """
+    model_class = group[0][0]
+    return TABLE_ORDER.index(model_class) if model_class in TABLE_ORDER else len(TABLE_ORDER)
+
+
+ingest_queue = IngestQueue()
@@ -0,0 +1,121 @@
+# Library imports
+from sqlalchemy import select
+from threading import Lock
+import time
+
+# Local imports
+from ..models import Department, Job
+
+# Constants
+REFERENCE_CACHE_TTL = 300
+
+
+class ReferenceCache:
+    """
+    In-process cache of the values of a referenced column.
+
+    The values are loaded on first use and reloaded when they expire, when
+    the cache is invalidated or when a lookup misses, so a value inserted by
+    another process is never rejected because of a stale cache.
+    """
+
+    def __init__(self, column, ttl=REFERENCE_CACHE_TTL):
+        self.column = column
+        self.ttl = ttl
+        self.values = None
+        self.loaded_at = 0
+        self.lock = Lock()
+
+    def invalidate(self):
+        """
+        Drop the cached values so they are reloaded on the next lookup.
+        """
+        with self.lock:
+            self.values = None
+
+    def _load(self, db):
+        values = frozenset(db.execute(select(self.column)).scalars())
+        with self.lock:
+            self.values = values
+            self.loaded_at = time.monotonic()
+        return values
+
+    def find_missing(self, db, values):
+        """
+        Find the values that don't exist in the referenced column.
+
+        Args:
+            db: The database connection.
+            values (set): The values to be checked.
+
+        Returns:
+            set: The values that don't exist.
+        """
+        with self.lock:
+            cached = self.values
+            expired = time.monotonic() - self.loaded_at > self.ttl
+
+        reloaded = cached is None or expired
+        if reloaded:
+            cached = self._load(db)
+
+        missing = values - cached
+        if missing and not reloaded:
+            # The value may have been inserted after the cache was loaded
+            missing = values - self._load(db)
+
+        return missing
+
+
+# Caches of the columns referenced by the ingest models
+REFERENCE_CACHES = {
+    table.name: ReferenceCache(table.c.id)
+    for table in (Department.__table__, Job.__table__)
+}
+
+
+def check_references(db, model_class, rows):
+    """
+    Check the foreign keys of validated records against the reference caches.
+
+    Args:
+        db: The database connection.
+        model_class: The model class.
+        rows: A list of (index, data) tuples with validated data.
+
+    Returns:
+        dict: The error message of every record with a missing reference,
+        keyed by its index.
+    """
+    errors = {}
+
+    for column in model_class.__table__.columns:
+        for foreign_key in column.foreign_keys:
+            cache = REFERENCE_CACHES.get(foreign_key.column.table.name)
+            if cache is None:
+                continue
+
+            values = {
+                data[column.name] for _, data in rows
+                if data.get(column.name) is not None
+            }
+            missing = cache.find_missing(db, values) if values else set()
+
+            for index, data in rows:
+                if data.get(column.name) in missing:
+                    error = f"{column.name}: Value '{data[column.name]}' does not exist in {cache.column.table.name}"
+                    errors[index] = f"{errors[index]}; {error}" if index in errors else error
+
+    return errors
+
+
+def invalidate_references(model_class):
+    """
+    Invalidate the reference cache of a table after it has been written.
+
+    Args:
+        model_class: The model class of the written table.
+    """
+    cache = REFERENCE_CACHES.get(model_class.__tablename__)
+    if cache is not None:
+        cache.invalidate()
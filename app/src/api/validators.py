@@ -0,0 +1,273 @@
+# Library imports
+from datetime import datetime
+from functools import partial
+import numpy as np
+import pandas as pd
+
+# Shared imports
+from error_log import get_error_log
+
+# Local imports
+from ..models import Department, Job, HiredEmployee
+
+# Constants
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+COLUMNAR_MIN_ROWS = 100
+error_log_file = "./.data/api_errors.txt"
+error_log = get_error_log(error_log_file)
+
+# Functions for coercing values to the column types
+
+
+def _type_error(value, expected_type):
+    """
+    Log and build the error for a value that can't be coerced.
+
+    Args:
+        value: The invalid value.
+        expected_type: The type expected by the column.
+
+    Returns:
+        TypeError: The error to be raised.
+    """
+    error_log.write(
+        f"Value '{value}' is not of type {expected_type.__name__}")
+    return TypeError(f"Value '{value}' is not of type {expected_type.__name__}")
+
+
+def _reject(value, expected_type):
+    raise _type_error(value, expected_type)
+
+
+def _coerce_int(value):
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    raise _type_error(value, int)
+
+
+def _coerce_float(value):
+    if isinstance(value, (int, str)) and str(value).replace('.', '', 1).isdigit():
+        return float(value)
+    raise _type_error(value, float)
+
+
+def _coerce_datetime(value):
+    return datetime.strptime(value, DATETIME_FORMAT)
+
+
+COERCERS = {
+    int: _coerce_int,
+    float: _coerce_float,
+    datetime: _coerce_datetime,
+}
+
+# Functions for coercing whole columns
+# They only convert the values they are sure about, anything else is left
+# to the per-row coercers so the error messages stay the same
+
+
+def _bulk_coerce_int(values):
+    strings = values[values.map(type) == str]
+    digits = strings.str.fullmatch(r"[0-9]{1,18}").astype(bool)
+    converted = strings[digits].astype("int64").astype(object)
+    return converted.index, converted.to_numpy()
+
+
+def _bulk_coerce_datetime(values):
+    strings = values[values.map(type) == str]
+    parsed = pd.to_datetime(strings, format=DATETIME_FORMAT, errors="coerce")
+    parsed = parsed[parsed.notna()]
+    return parsed.index, parsed.to_numpy().astype("datetime64[us]").astype(object)
+
+
+BULK_COERCERS = {
+    int: _bulk_coerce_int,
+    datetime: _bulk_coerce_datetime,
+}
+
+
+class _Missing:
+    pass
+
+
+_MISSING = _Missing()
+
+
+class ModelValidator:
+    """
+    Validator compiled once from the columns of a model.
+
+    The column names, required fields and coercion functions are resolved
+    when the validator is built, so validating a record only applies them.
+    """
+
+    def __init__(self, model_class):
+        self.model_class = model_class
+        self.column_names = frozenset(model_class.__table__.columns.keys())
+        self.required = set()
+        self.columns = []
+
+        for col_name, column in model_class.__table__.columns.items():
+            if not column.nullable and col_name != "id":
+                self.required.add(col_name)
+
+            expected_type = column.type.python_type
+            coerce = COERCERS.get(expected_type) or partial(
+                _reject, expected_type=expected_type)
+            self.columns.append((col_name, expected_type, coerce))
+
+    def __call__(self, raw_data):
+        """
+        Validate a record and coerce its values.
+
+        Args:
+            raw_data: The record to be validated.
+
+        Returns:
+            dict: The filtered record with values coerced to the column types.
+
+        Raises:
+            ValueError: If required fields are missing or a value has the wrong type.
+        """
+        # Filter fields that don't exist in the model
+        column_names = self.column_names
+        filtered_data = {
+            key: value for key, value in raw_data.items() if key in column_names
+        }
+
+        missing_fields = []
+        type_errors = []
+
+        for col_name, expected_type, coerce in self.columns:
+            if col_name not in filtered_data:
+                if col_name in self.required:
+                    missing_fields.append(col_name)
+                continue
+
+            value = filtered_data[col_name]
+            if not isinstance(value, expected_type):
+                try:
+                    filtered_data[col_name] = coerce(value)
+                except Exception as te:
+                    type_errors.append(f"{col_name}: {te}")
+
+        if missing_fields:
+            # Insert missing fields at the beginning of the list
+            type_errors.insert(
+                0, f"Missing required fields: {', '.join(missing_fields)}")
+
+        if type_errors:
+            # Raise a ValueError with the joined type errors
+            raise ValueError("; ".join(type_errors))
+
+        return filtered_data
+
+    def validate_rows(self, records):
+        """
+        Validate records one by one.
+
+        Args:
+            records: The records to be validated.
+
+        Returns:
+            list: (index, data) tuples of the valid records.
+            dict: The error message of every invalid record, keyed by its index.
+        """
+        valid_rows = []
+        errors = {}
+
+        for index, raw_data in enumerate(records):
+            try:
+                valid_rows.append((index, self(raw_data)))
+            except Exception as e:
+                errors[index] = str(e)
+
+        return valid_rows, errors
+
+    def validate_batch(self, records):
+        """
+        Validate a batch of records column by column.
+
+        The batch is pivoted into one array per column, the null and type
+        masks are built for the whole column at once and integers and
+        datetimes are converted in bulk. Records that can't be settled this
+        way are validated one by one, so they get the same error messages.
+
+        Args:
+            records: The records to be validated.
+
+        Returns:
+            list: (index, data) tuples of the valid records.
+            dict: The error message of every invalid record, keyed by its index.
+        """
+        if len(records) < COLUMNAR_MIN_ROWS:
+            return self.validate_rows(records)
+
+        rows = [record if type(record) is dict else {} for record in records]
+        pending = np.array([type(record) is not dict for record in records])
+        columns = []
+
+        for col_name, expected_type, _ in self.columns:
+            values = pd.Series(
+                [row.get(col_name, _MISSING) for row in rows], dtype=object)
+            types = values.map(type)
+            missing = (types == _Missing).to_numpy()
+            valid = (types == expected_type).to_numpy() | missing
+
+            if col_name in self.required:
+                pending |= missing
+
+            bulk_coerce = BULK_COERCERS.get(expected_type)
+            if bulk_coerce is not None and not valid.all():
+                positions, converted = bulk_coerce(values[~valid])
+                values[positions] = converted
+                valid[positions.to_numpy()] = True
+
+            pending |= ~valid
+            columns.append((col_name, values.to_numpy(), missing))
+
+        valid_rows = [
+            (index, {
+                col_name: values[index]
+                for col_name, values, missing in columns if not missing[index]
+            })
+            for index in np.flatnonzero(~pending).tolist()
+        ]
+
+        # Validate the unsettled records one by one
+        pending_indexes = np.flatnonzero(pending).tolist()
+        retried_rows, retried_errors = self.validate_rows(
+            [records[index] for index in pending_indexes])
+
+        valid_rows.extend(
+            (pending_indexes[position], data) for position, data in retried_rows)
+        errors = {
+            pending_indexes[position]: error
+            for position, error in retried_errors.items()
+        }
+
+        valid_rows.sort(key=lambda row: row[0])
+        return valid_rows, errors
+
+
+# Validators compiled at startup for the ingest models
+VALIDATORS = {
+    model_class: ModelValidator(model_class)
+    for model_class in (Department, Job, HiredEmployee)
+}
+
+
+def get_validator(model_class):
+    """
+    Get the compiled validator of a model, compiling it on first use.
+
+    Args:
+        model_class: The model class.
+
+    Returns:
+        ModelValidator: The validator of the model.
+    """
+    validator = VALIDATORS.get(model_class)
+    if validator is None:
+        validator = VALIDATORS[model_class] = ModelValidator(model_class)
+    return validator
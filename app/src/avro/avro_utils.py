@@ -1,238 +1,759 @@
 # Library imports
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import HTTPException
-from sqlalchemy import text
+from functools import lru_cache
+from itertools import chain, islice
+from queue import Empty, Full, Queue
+from sqlalchemy import DateTime, func, select, text
+from threading import Event
 import fastavro
+import fastavro.write
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 from zipfile import ZipFile
-from tempfile import TemporaryDirectory
+
+# Shared imports
+from error_log import get_error_log
 
 # Local imports
+from ..database import backup_engine, checkout, checkout_async
+from ..api.api_utils import insert_records, BULK_INSERT_BATCH_SIZE
+from ..api.reference_cache import invalidate_references
+from ..api.validators import DATETIME_FORMAT
+from ..reports.hires_summary import rebuild_hires_summary
+from ..reports.report_cache import invalidate_reports
+from ..reports.columnar import invalidate_snapshot
+from ..models import HiredEmployee
+
 error_log_file = "./.data/avro_errors.txt"
+error_log = get_error_log(error_log_file)
+
+# Rows fetched from the database at a time while writing a backup
+AVRO_FETCH_SIZE = 10000
+# Parallel full backups: connections writing chunks at once, and ids per chunk
+AVRO_BACKUP_WORKERS = int(os.getenv("AVRO_BACKUP_WORKERS", "4"))
+AVRO_BACKUP_CHUNK_SIZE = int(os.getenv("AVRO_BACKUP_CHUNK_SIZE", "250000"))
+# Batches of blocks a worker can write ahead of the ZIP stream, per chunk
+AVRO_BACKUP_QUEUE_SIZE = 8
+# Compression of the backups, and bytes of records per Avro block
+AVRO_CODECS = ("null", "deflate", "snappy", "zstandard", "xz")
+AVRO_CODEC_LEVELS = {"deflate": (0, 9), "zstandard": (1, 22)}
+AVRO_CODEC = os.getenv("AVRO_CODEC", "null")
+AVRO_CODEC_LEVEL = int(os.getenv("AVRO_CODEC_LEVEL")) if os.getenv("AVRO_CODEC_LEVEL") else None
+AVRO_SYNC_INTERVAL = int(os.getenv("AVRO_SYNC_INTERVAL", "16000"))
+MIN_SYNC_INTERVAL = 1024
+MAX_SYNC_INTERVAL = 64 * 1024 * 1024
+# Avro types of the Python types of the columns
+AVRO_TYPES = {
+    bool: "boolean",
+    int: "long",
+    float: "double",
+    str: "string",
+    bytes: "bytes",
+    datetime: {"type": "long", "logicalType": "timestamp-millis"},
+}
+
+# Functions for creating Avro backups
+
+
+def backup_statement(model):
+    """
+    Build the query reading a table for a backup, in primary key order.
 
-# Temporary directory for backups
-backup_folder = TemporaryDirectory(dir=".", prefix="backup")
-BACKUP_DIR = backup_folder.name
+    Parameters:
+    - model (Model): The SQLAlchemy model representing the table.
 
-# Function for creating an Avro backup
+    Returns:
+    - Select: The query.
+    """
+    table = model.__table__
+    return select(table).order_by(*table.primary_key.columns)
 
 
-def create_avro_backup(model, db, table_name, backup_dir=BACKUP_DIR):
+def backup_record(row):
     """
-    Create an Avro backup of a given table in the database.
+    Convert a row into an Avro record.
+
+    The table stores naive UTC datetimes. fastavro would read naive values
+    as local time of the host, so they are marked as UTC.
 
     Parameters:
-    - model (Model): The SQLAlchemy model representing the table.
-    - db (Session): The SQLAlchemy session to the database.
-    - table_name (str): The name of the table to backup.
-    - backup_dir (str): The directory to store the backup in.
+    - row (Row): The row of the table.
 
     Returns:
-    - Filename of the backup file.
+    - dict: The record, with the native values of the row.
     """
-    # Obtain all records from the database
-    records = db.query(model).all()
+    record = row._asdict()
+    for name, value in record.items():
+        if isinstance(value, datetime) and value.tzinfo is None:
+            record[name] = value.replace(tzinfo=timezone.utc)
+    return record
 
-    # Check if there are any records
-    if not records:
-        with open(error_log_file, "a") as error_log:
-            error_log.write(f"No records found in {table_name}\n")
-        raise HTTPException(
-            status_code=404, detail=f"No records found in {table_name}")
 
-    record_dicts = []
-    for record in records:
-        record_data = {}
-        for key, value in dict(record.__dict__).items():
-            if key == '_sa_instance_state':
-                continue
-            if isinstance(value, datetime):
-                value = value.strftime("%Y-%m-%d %H:%M:%S")
-            record_data[key] = value
-        record_dicts.append(record_data)
-
-    # Get the sample record
-    sample_record = record_dicts[0]
-    fields = []
+@lru_cache(maxsize=None)
+def avro_schema(model):
+    """
+    Build the Avro schema of a table from the columns of its model.
+
+    The schema is parsed once per model. Nullable columns are unions with
+    null and datetimes are stored as timestamp-millis.
+
+    Parameters:
+    - model (Model): The SQLAlchemy model representing the table.
 
-    # Iterate over the sample record and determine the field types
-    for key, value in sample_record.items():
-        field_type = "null"
-        if isinstance(value, int):
-            field_type = "int"
-        elif isinstance(value, str):
-            field_type = "string"
-        elif value is None:
-            field_type = "null"
-        else:
-            field_type = "string"
-
-        fields.append({"name": key, "type": ["null", field_type]})
-
-    # Create the Avro schema
-    schema = {
+    Returns:
+    - dict: The parsed Avro schema.
+    """
+    fields = []
+    for column in model.__table__.columns:
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            python_type = str
+        field_type = AVRO_TYPES.get(python_type, "string")
+        if column.nullable:
+            field_type = ["null", field_type]
+        fields.append({"name": column.name, "type": field_type})
+
+    return fastavro.parse_schema({
         "type": "record",
-        "name": f"{table_name}_backup",
+        "name": f"{model.__tablename__}_backup",
         "fields": fields,
+    })
+
+
+@lru_cache(maxsize=None)
+def codec_available(codec):
+    """
+    Check that the library of a codec is installed, by compressing a block.
+
+    Parameters:
+    - codec (str): The codec.
+
+    Returns:
+    - bool: Whether backups can be written with the codec.
+    """
+    try:
+        fastavro.writer(BlockStream(), {"type": "record", "name": "probe", "fields": []},
+                        [{}], codec=codec)
+    except ValueError:
+        return False
+    return True
+
+
+def backup_options(codec=None, codec_level=None, sync_interval=None):
+    """
+    Validate the Avro writer options of a backup, with the defaults of the
+    environment for the ones not given.
+
+    Parameters:
+    - codec (str): The compression codec.
+    - codec_level (int): The compression level, for deflate and zstandard.
+    - sync_interval (int): The bytes of records per block.
+
+    Returns:
+    - dict: The codec, compression_level and sync_interval of the writer.
+    """
+    codec = codec or AVRO_CODEC
+    if codec not in AVRO_CODECS or not codec_available(codec):
+        raise HTTPException(
+            status_code=422, detail=f"Codec {codec} is not available")
+
+    if codec_level is None and codec == AVRO_CODEC:
+        codec_level = AVRO_CODEC_LEVEL
+    if codec_level is not None:
+        if codec not in AVRO_CODEC_LEVELS:
+            raise HTTPException(
+                status_code=422, detail=f"Codec {codec} has no compression levels")
+        low, high = AVRO_CODEC_LEVELS[codec]
+        if not low <= codec_level <= high:
+            raise HTTPException(
+                status_code=422, detail=f"The {codec} level must be between {low} and {high}")
+
+    sync_interval = sync_interval or AVRO_SYNC_INTERVAL
+    if not MIN_SYNC_INTERVAL <= sync_interval <= MAX_SYNC_INTERVAL:
+        raise HTTPException(
+            status_code=422,
+            detail=f"The sync interval must be between {MIN_SYNC_INTERVAL} and {MAX_SYNC_INTERVAL}")
+
+    return {"codec": codec, "compression_level": codec_level, "sync_interval": sync_interval}
+
+
+def avro_writer(fo, model, options=None, sync_marker=b""):
+    """
+    Start an Avro file of a table, recording the writer options in its
+    metadata.
+
+    Parameters:
+    - fo: The file object.
+    - model (Model): The SQLAlchemy model representing the table.
+    - options (dict): The writer options, the defaults if None.
+    - sync_marker (bytes): The sync marker, random if empty.
+
+    Returns:
+    - Writer: The writer, with the header already written.
+    """
+    options = options or backup_options()
+    level = options["compression_level"]
+    metadata = {
+        "backup.codec_level": "default" if level is None else str(level),
+        "backup.sync_interval": str(options["sync_interval"]),
     }
+    return fastavro.write.Writer(
+        fo, avro_schema(model), metadata=metadata, sync_marker=sync_marker, **options)
+
+
+def backup_timestamp():
+    """
+    Get the timestamp of a backup taken now, as used in its file names.
+
+    Returns:
+    - str: The timestamp.
+    """
+    return datetime.now().strftime("%Y%m%d%H%M%S")
+
+
+def backup_filename(table_name, timestamp=None):
+    """
+    Name a backup file after its table and the time of the backup.
+
+    Parameters:
+    - table_name (str): The name of the table.
+    - timestamp (str): The timestamp of the backup, now by default.
+
+    Returns:
+    - str: The file name.
+    """
+    return f"{table_name}_{timestamp or backup_timestamp()}.avro"
+
+
+class BlockStream:
+    """
+    Write-only file object keeping the written bytes until they are taken.
+
+    It is not seekable, so the Avro writer and ZipFile write it strictly
+    forward and every byte can be sent as soon as it is drained.
+    """
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def seekable(self):
+        return False
+
+    def drain(self):
+        """
+        Take the bytes written so far.
+
+        Returns:
+        - bytes: The written bytes.
+        """
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+async def stream_avro_backup(model, table_name, options=None):
+    """
+    Start an Avro backup of a table, streamed as it is read.
+
+    The rows are read from a server-side cursor on a connection of their
+    own, since the response outlives the request session, and every block
+    written by the Avro writer is yielded as soon as it is complete. Only
+    one fetch of rows and one block are held in memory at a time.
+
+    Parameters:
+    - model (Model): The SQLAlchemy model representing the table.
+    - table_name (str): The name of the table to backup.
+    - options (dict): The writer options, the defaults if None.
+
+    Returns:
+    - AsyncIterator[bytes]: The content of the backup file.
+    """
+    options = options or backup_options()
+    connection = await checkout_async()
+    try:
+        result = await connection.stream(backup_statement(model))
+        rows = await result.fetchmany(AVRO_FETCH_SIZE)
+    except BaseException:
+        await connection.close()
+        raise
+
+    # Check if there are any records before the response starts
+    if not rows:
+        await connection.close()
+        error_log.write(f"No records found in {table_name}", table=table_name)
+        raise HTTPException(
+            status_code=404, detail=f"No records found in {table_name}")
+
+    return _write_avro_blocks(connection, result, rows, model, options)
+
+
+async def _write_avro_blocks(connection, result, rows, model, options):
+    """
+    Write the rows of a streamed result as Avro, yielding the bytes.
 
-    # Create the filename
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    filename = os.path.join(backup_dir, f"{table_name}_{timestamp}.avro")
+    Parameters:
+    - connection (AsyncConnection): The connection, closed at the end.
+    - result (AsyncResult): The streamed result.
+    - rows (list): The rows already fetched.
+    - model (Model): The SQLAlchemy model representing the table.
+    - options (dict): The writer options.
+
+    Returns:
+    - AsyncIterator[bytes]: The content of the backup file.
+    """
+    try:
+        stream = BlockStream()
+        records = [backup_record(row) for row in rows]
+        writer = avro_writer(stream, model, options)
+
+        while records:
+            for record in records:
+                writer.write(record)
+            data = stream.drain()
+            if data:
+                yield data
+            records = [backup_record(row) for row in await result.fetchmany(AVRO_FETCH_SIZE)]
+
+        writer.flush()
+        yield stream.drain()
+    finally:
+        await connection.close()
+
+
+def open_snapshots(count):
+    """
+    Open connections that all read the same snapshot of the database.
+
+    On MySQL every connection starts a consistent snapshot while another
+    one holds a global read lock, so no write can land between them. The
+    lock is only held while the snapshots are opened. Without the privilege
+    to take it, the snapshots are opened back to back.
+
+    Parameters:
+    - count (int): The number of connections.
+
+    Returns:
+    - list: The connections, to be closed by the caller.
+    """
+    mysql = backup_engine.dialect.name == "mysql"
+    connections = []
+    lock = None
+
+    try:
+        if mysql:
+            lock = checkout(backup_engine)
+            try:
+                lock.exec_driver_sql("FLUSH TABLES WITH READ LOCK")
+            except Exception as e:
+                error_log.write(
+                    f"Backup snapshots opened without a global read lock: {str(e)}")
+                lock.close()
+                lock = None
+
+        for _ in range(count):
+            connection = checkout(backup_engine)
+            connections.append(connection)
+            if mysql:
+                connection.exec_driver_sql(
+                    "START TRANSACTION WITH CONSISTENT SNAPSHOT")
+    except Exception:
+        for connection in connections:
+            connection.close()
+        raise
+    finally:
+        if lock is not None:
+            lock.exec_driver_sql("UNLOCK TABLES")
+            lock.close()
+
+    return connections
+
+
+def backup_chunks(connection, model):
+    """
+    Split a table into primary key ranges of AVRO_BACKUP_CHUNK_SIZE ids.
+
+    Parameters:
+    - connection (Connection): A connection reading the backup snapshot.
+    - model (Model): The SQLAlchemy model representing the table.
+
+    Returns:
+    - list: The (model, first id, id after the last one) of every chunk.
+    """
+    primary_key = model.__table__.primary_key.columns.values()[0]
+    low, high = connection.execute(
+        select(func.min(primary_key), func.max(primary_key))).one()
+    if low is None:
+        return []
+    return [
+        (model, start, min(start + AVRO_BACKUP_CHUNK_SIZE, high + 1))
+        for start in range(low, high + 1, AVRO_BACKUP_CHUNK_SIZE)
+    ]
+
+
+def avro_header(model, sync_marker, options):
+    """
+    Get the header of the Avro files of a table.
+
+    Parameters:
+    - model (Model): The SQLAlchemy model representing the table.
+    - sync_marker (bytes): The sync marker of the file.
+    - options (dict): The writer options.
+
+    Returns:
+    - bytes: The header.
+    """
+    stream = BlockStream()
+    avro_writer(stream, model, options, sync_marker)
+    return stream.drain()
+
+
+def _put(queue, item, stop):
+    """
+    Put an item on a bounded queue, giving up if the backup is stopped.
+
+    Parameters:
+    - queue (Queue): The queue.
+    - item: The item.
+    - stop (Event): Set when the backup is stopped.
+
+    Returns:
+    - bool: Whether the item was put.
+    """
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return True
+        except Full:
+            continue
+    return False
 
-    # Write the records to the file
-    with open(filename, "wb") as out:
-        fastavro.writer(out, schema, record_dicts)
 
-    return filename
+def write_backup_chunk(connection, chunk, sync_marker, options, output, stop):
+    """
+    Write the rows of a chunk as Avro blocks, without the file header.
 
+    Parameters:
+    - connection (Connection): A connection reading the backup snapshot.
+    - chunk (tuple): The model, the first id and the id after the last one.
+    - sync_marker (bytes): The sync marker shared by the chunks of the table.
+    - options (dict): The writer options.
+    - output (Queue): The queue receiving the blocks.
+    - stop (Event): Set when the backup is stopped.
 
-def create_avro_full_backup(model_list, db, backup_dir=BACKUP_DIR):
+    Returns:
+    - bool: Whether the chunk was written before the backup was stopped.
     """
-    Create a full backup of all tables in the database.
+    model, start, end = chunk
+    primary_key = model.__table__.primary_key.columns.values()[0]
+    # Streamed from a server-side cursor, so only AVRO_FETCH_SIZE rows of
+    # the chunk are held in memory at a time
+    rows = connection.execute(
+        backup_statement(model)
+        .where(primary_key >= start, primary_key < end)
+        .execution_options(yield_per=AVRO_FETCH_SIZE))
+
+    stream = BlockStream()
+    writer = avro_writer(stream, model, options, sync_marker)
+    # The header is written once for the whole table
+    stream.drain()
+
+    for partition in rows.partitions():
+        for row in partition:
+            writer.write(backup_record(row))
+        data = stream.drain()
+        if data and not _put(output, data, stop):
+            return False
+
+    writer.flush()
+    data = stream.drain()
+    return not data or _put(output, data, stop)
+
+
+def _backup_worker(connection, pending, chunks, outputs, sync_markers, options, stop):
+    """
+    Write chunks, in order, until there are none left or the backup stops.
+
+    Every chunk ends with None on its queue, or with the error that
+    interrupted it.
+
+    Parameters:
+    - connection (Connection): The connection of the worker.
+    - pending (Queue): The positions of the chunks left to write.
+    - chunks (list): The chunks.
+    - outputs (list): The queue of every chunk.
+    - sync_markers (dict): The sync marker of every model.
+    - options (dict): The writer options.
+    - stop (Event): Set when the backup is stopped.
+    """
+    while not stop.is_set():
+        try:
+            position = pending.get_nowait()
+        except Empty:
+            return
+
+        chunk, output = chunks[position], outputs[position]
+        try:
+            if not write_backup_chunk(connection, chunk, sync_markers[chunk[0]], options, output, stop):
+                return
+        except Exception as e:
+            _put(output, e, stop)
+            return
+        _put(output, None, stop)
+
+
+def stream_avro_full_backup(model_list, timestamp=None, options=None):
+    """
+    Start a full backup of all tables as a streamed ZIP file.
+
+    The tables are split into id ranges written in parallel, every worker
+    on its own connection reading the same consistent snapshot. The chunks
+    of a table share the sync marker, so its entry is one header followed
+    by the blocks of every chunk. The blocks are passed through bounded
+    queues straight into the ZIP entries, so nothing is written to disk and
+    memory only holds the blocks the workers are ahead by.
 
     Parameters:
     - model_list (list): A list of SQLAlchemy models.
-    - db (Session): The SQLAlchemy session to the database.
-    - backup_dir (str): The directory to store the backup in.
+    - timestamp (str): The timestamp of the backup, for the file names.
+    - options (dict): The writer options, the defaults if None.
 
     Returns:
-    - Filename of the backup file.
+    - Iterator[bytes]: The content of the ZIP file.
     """
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    # Create a temporary directory on a predefined location and name
-    temp_folder = TemporaryDirectory(dir=backup_dir)
-    folder_path = temp_folder.name
-    print(folder_path)
-    zip_filename = f"backup_all_{timestamp}.zip"
-    zip_filepath = os.path.join(folder_path, zip_filename)
+    options = options or backup_options()
+    connections = open_snapshots(AVRO_BACKUP_WORKERS)
+    try:
+        chunks = [chunk for model in model_list
+                  for chunk in backup_chunks(connections[0], model)]
+    except BaseException:
+        for connection in connections:
+            connection.close()
+        raise
 
-    avro_files = []
+    return _write_full_backup(connections, model_list, chunks,
+                              timestamp or backup_timestamp(), options)
 
-    for model in model_list:
-        file = create_avro_backup(
-            model, db, model.__tablename__, backup_dir=folder_path)
-        avro_files.append(file)
 
-    with ZipFile(zip_filepath, 'w') as zipObj:
-        for file in avro_files:
-            filename = os.path.basename(file)
-            zipObj.write(file, arcname=filename)
+def _write_full_backup(connections, model_list, chunks, timestamp, options):
+    """
+    Write the chunks of the tables into a ZIP file, yielding the bytes.
+
+    Parameters:
+    - connections (list): The connections of the workers, closed at the end.
+    - model_list (list): A list of SQLAlchemy models.
+    - chunks (list): The chunks of all tables, in table order.
+    - timestamp (str): The timestamp of the backup.
+    - options (dict): The writer options.
+
+    Returns:
+    - Iterator[bytes]: The content of the ZIP file.
+    """
+    sync_markers = {model: os.urandom(16) for model in model_list}
+    outputs = [Queue(maxsize=AVRO_BACKUP_QUEUE_SIZE) for _ in chunks]
+    pending = Queue()
+    for position in range(len(chunks)):
+        pending.put(position)
+
+    # The chunks are taken in order and read in order, so the worker of the
+    # chunk being read is never waiting for room on its queue
+    stop = Event()
+    executor = ThreadPoolExecutor(max_workers=len(connections))
+    for connection in connections:
+        executor.submit(_backup_worker, connection, pending,
+                        chunks, outputs, sync_markers, options, stop)
 
-    new_zip_filepath = os.path.join(backup_dir, f"{zip_filename}")
-    print(zip_filepath, new_zip_filepath)
-    os.rename(zip_filepath, new_zip_filepath)
-    temp_folder.cleanup()
-    return new_zip_filepath
+    try:
+        stream = BlockStream()
+        position = 0
+        with ZipFile(stream, "w") as archive:
+            for model in model_list:
+                arcname = backup_filename(model.__tablename__, timestamp)
+                with archive.open(arcname, "w", force_zip64=True) as entry:
+                    entry.write(avro_header(model, sync_markers[model], options))
+                    while position < len(chunks) and chunks[position][0] is model:
+                        for data in iter(outputs[position].get, None):
+                            if isinstance(data, Exception):
+                                raise data
+                            entry.write(data)
+                            yield stream.drain()
+                        position += 1
+                yield stream.drain()
+        yield stream.drain()
+    except Exception as e:
+        error_log.write(f"Error creating full backup: {str(e)}")
+        raise
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
+        for connection in connections:
+            connection.close()
 
 
-def restore_table_from_avro(file, db, model, table_name, backup_dir=BACKUP_DIR):
+def restore_record(model, record):
+    """
+    Convert an Avro record into the values of a table row.
+
+    Backups store datetimes as timestamp-millis, which are read as UTC
+    datetimes and stored naive like the table does. Older backups stored
+    them as strings, which are parsed.
+
+    Parameters:
+    - model (Model): The SQLAlchemy model representing the table.
+    - record (dict): The record read from the file.
+
+    Returns:
+    - dict: The values of the columns of the model.
+    """
+    data = {}
+    for column in model.__table__.columns:
+        if column.name not in record:
+            continue
+        value = record[column.name]
+        if isinstance(value, datetime):
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        elif isinstance(value, str) and column.name in datetime_columns(model):
+            value = datetime.strptime(value, DATETIME_FORMAT)
+        data[column.name] = value
+    return data
+
+
+@lru_cache(maxsize=None)
+def datetime_columns(model):
+    """
+    Get the names of the datetime columns of a table.
+
+    Parameters:
+    - model (Model): The SQLAlchemy model representing the table.
+
+    Returns:
+    - frozenset: The column names.
+    """
+    return frozenset(
+        column.name for column in model.__table__.columns
+        if isinstance(column.type, DateTime))
+
+
+def restore_table_from_avro(file, db, model, table_name):
     """
     Restore a table from an AVRO file.
 
+    The file is read and inserted BULK_INSERT_BATCH_SIZE records at a time,
+    so memory doesn't grow with the size of the backup. A file that turns
+    out to be corrupt halfway leaves the records read before the error.
+
     Parameters:
     - file (UploadFile): The file to be restored.
     - db (Session): The SQLAlchemy session to the database.
     - model (Model): The SQLAlchemy model representing the table.
     - table_name (str): The name of the table to restore.
-    - backup_dir (str): The directory to store the backup in.
 
     Returns:
     - dict: A dictionary containing the message and success/failed records.
     """
     try:
-        # Read the file
+        # Read the header and the first record of the file
         reader = fastavro.reader(file.file)
-        records = list(reader)
+        records = iter(reader)
+        first_record = next(records, None)
     except Exception as e:
-        with open(error_log_file, "a") as error_log:
-            error_log.write(f"Invalid AVRO file: {str(e)}\n")
+        error_log.write(f"Invalid AVRO file: {str(e)}")
         # Handle any exceptions
         raise HTTPException(
             status_code=400, detail=f"Invalid AVRO file: {str(e)}")
 
     # Check if the file has the expected columns
     expected_columns = model.__table__.columns.keys()
-    if not records:
-        with open(error_log_file, "a") as error_log:
-            error_log.write(f"AVRO file has no records\n")
+    if first_record is None:
+        error_log.write("AVRO file has no records")
         raise HTTPException(
             status_code=404, detail=f"AVRO file has no records")
 
-    first_record = records[0]
+    file_columns = {field["name"] for field in reader.writer_schema["fields"]}
     missing_columns = [
-        col for col in expected_columns if col not in first_record]
+        col for col in expected_columns if col not in file_columns]
 
     if missing_columns:
-        with open(error_log_file, "a") as error_log:
-            error_log.write(
-                f"AVRO file is missing columns: {', '.join(missing_columns)}\n")
+        error_log.write(
+            f"AVRO file is missing columns: {', '.join(missing_columns)}", table=table_name)
         raise HTTPException(
             status_code=400, detail=f"AVRO file is missing columns: {', '.join(missing_columns)}")
 
     try:
-        # Delete all records from the table
-        db.execute(text("SET FOREIGN_KEY_CHECKS=0;"))
+        # Delete all records from the table, keeping the rows that reference
+        # it (SQLite doesn't enforce foreign keys unless asked to)
+        mysql = db.get_bind().dialect.name == "mysql"
+        if mysql:
+            db.execute(text("SET FOREIGN_KEY_CHECKS=0;"))
         db.query(model).delete()
-        db.execute(text("SET FOREIGN_KEY_CHECKS=1;"))
+        if mysql:
+            db.execute(text("SET FOREIGN_KEY_CHECKS=1;"))
         db.commit()
     except Exception as e:
         db.rollback()
-        with open(error_log_file, "a") as error_log:
-            error_log.write(
-                f"Error deleting records from {model.__tablename__}: {str(e)}\n")
+        error_log.write(
+            f"Error deleting records from {model.__tablename__}: {str(e)}", table=model.__tablename__)
         raise HTTPException(
             status_code=500, detail=f"Error deleting records from {model.__tablename__}: {str(e)}")
 
-    # Prepare lists for successful and failed records
-    successfully_inserted = []
+    records = enumerate(chain([first_record], records))
+    restored = 0
     failed_records = []
-
-    # Iterate over the records and insert them into the database
-    for record in records:
+    read_error = None
+    while True:
         try:
-            # Filter the record to only include columns that exist in the model
-            filtered_data = {
-                key: value for key, value in record.items() if key in model.__table__.columns.keys()
-            }
-
-            # Create an instance of the model with the filtered data
-            db_item = model(**filtered_data)
-            # Add the instance to the database
-            db.add(db_item)
-            db.flush()
-            # Commit the transaction
-            db.commit()
-
-            # Add the filtered data to the list of successfully inserted records
-            successfully_inserted.append(filtered_data)
+            batch = list(islice(records, BULK_INSERT_BATCH_SIZE))
         except Exception as e:
-            # Add the filtered data and the error to the list of failed records
-            failed_records.append({
-                "record": filtered_data,
-                "error": str(e)
-            })
-            # Rollback the transaction
-            db.rollback()
-            db.expire_all()
+            read_error = e
+            break
+        if not batch:
+            break
+
+        # Keep the columns of the model, with values ready for the table
+        rows = []
+        for index, record in batch:
+            try:
+                rows.append((index, restore_record(model, record)))
+            except ValueError as e:
+                failed_records.append({"record": record, "error": str(e)})
+
+        # Insert the records in one multi-row batch, isolating the failed ones
+        errors = insert_records(db, model, rows)
+        failed_records.extend(
+            {"record": data, "error": errors[index]}
+            for index, data in rows if index in errors)
+        restored += len(rows) - len(errors)
+
+    invalidate_references(model)
+    invalidate_reports()
+    invalidate_snapshot(model, replaced=True)
+
+    # The restored rows replace the ones the summary was counting
+    if model is HiredEmployee:
+        rebuild_hires_summary(db)
 
     if failed_records:
-        with open(error_log_file, "a") as error_log:
-            error_log.write(
-                f"Failed to restore {len(failed_records)} records to {table_name}\nFailed records:\n{failed_records}\n")
+        error_log.write(
+            f"Failed to restore {len(failed_records)} records to {table_name}",
+            table=table_name, failed_records=failed_records)
+
+    if read_error is not None:
+        error_log.write(
+            f"Invalid AVRO file after {restored} restored records: {str(read_error)}", table=table_name)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid AVRO file after {restored} restored records: {str(read_error)}")
 
     return {
-        "message": f"Restored {len(successfully_inserted)} records to {table_name}",
+        "message": f"Restored {restored} records to {table_name}",
         "failed": failed_records if failed_records else None
     }
 
-
-def remove_file(file_path):
-    """
-    Remove a file.
-
-    Parameters:
-    - file_path (str): The path to the file.
-    """
-    if os.path.exists(file_path):
-        os.remove(file_path)
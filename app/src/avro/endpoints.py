@@ -1,130 +1,129 @@
 # Library imports
-from fastapi import APIRouter, Depends, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, Depends, Query, UploadFile, File
 from fastapi.exceptions import HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-import os
+from typing import Literal, Optional
 
 # Local imports
 from ..database import get_db
 from ..models import Department, Job, HiredEmployee
-from .avro_utils import create_avro_backup, restore_table_from_avro, create_avro_full_backup, remove_file
+from .avro_utils import backup_filename, backup_options, backup_timestamp, stream_avro_backup, stream_avro_full_backup, restore_table_from_avro, MAX_SYNC_INTERVAL, MIN_SYNC_INTERVAL
 
 # Router
 router = APIRouter(prefix="/avro")
 
 
-@router.get("/backup/departments")
-def backup_departments(db: Session = Depends(get_db), background_tasks: BackgroundTasks = None):
+def get_backup_options(codec: Optional[Literal["null", "deflate", "snappy", "zstandard", "xz"]] = None, codec_level: Optional[int] = None, sync_interval: Optional[int] = Query(None, ge=MIN_SYNC_INTERVAL, le=MAX_SYNC_INTERVAL)):
     """
-    Backup the departments table.
+    Read the Avro writer options of a backup from the query.
 
     Parameters:
-    - db (Session): The SQLAlchemy session to the database.
-    - background_tasks (BackgroundTasks): Background tasks.
+    - codec (str): The compression codec, AVRO_CODEC by default.
+    - codec_level (int): The compression level, for deflate and zstandard.
+    - sync_interval (int): The bytes of records per block, AVRO_SYNC_INTERVAL by default.
 
     Returns:
-    - FileResponse: The response containing the backup file.
+    - dict: The writer options.
     """
-    try:
-        filename = create_avro_backup(Department, db, "departments")
+    return backup_options(codec, codec_level, sync_interval)
+
 
-        background_tasks.add_task(remove_file, filename)
+async def stream_backup(model, table_name, options):
+    """
+    Stream the Avro backup of a table as a file download.
+
+    Parameters:
+    - model (Model): The SQLAlchemy model representing the table.
+    - table_name (str): The name of the table to backup.
+    - options (dict): The writer options.
 
-        return FileResponse(
-            path=filename,
-            filename=os.path.basename(filename),
-            media_type="application/octet-stream"
-        )
+    Returns:
+    - StreamingResponse: The response streaming the backup file.
+    """
+    try:
+        content = await stream_avro_backup(model, table_name, options)
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error creating backup: {str(e)}")
 
+    return StreamingResponse(
+        content,
+        media_type="application/octet-stream",
+        headers={
+            "Content-Disposition": f"attachment; filename={backup_filename(table_name)}"}
+    )
 
-@router.get("/backup/jobs")
-def backup_jobs(db: Session = Depends(get_db), background_tasks: BackgroundTasks = None):
+
+@router.get("/backup/departments")
+async def backup_departments(options: dict = Depends(get_backup_options)):
     """
-    Backup the jobs table.
+    Backup the departments table.
 
     Parameters:
-    - db (Session): The SQLAlchemy session to the database.
-    - background_tasks (BackgroundTasks): Background tasks.
+    - options (dict): The Avro writer options.
 
     Returns:
-    - FileResponse: The response containing the backup file.
+    - StreamingResponse: The response streaming the backup file.
     """
-    try:
-        filename = create_avro_backup(Job, db, "jobs")
+    return await stream_backup(Department, "departments", options)
 
-        background_tasks.add_task(remove_file, filename)
 
-        return FileResponse(
-            path=filename,
-            filename=os.path.basename(filename),
-            media_type="application/octet-stream"
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Error creating backup: {str(e)}")
+@router.get("/backup/jobs")
+async def backup_jobs(options: dict = Depends(get_backup_options)):
+    """
+    Backup the jobs table.
+
+    Parameters:
+    - options (dict): The Avro writer options.
+
+    Returns:
+    - StreamingResponse: The response streaming the backup file.
+    """
+    return await stream_backup(Job, "jobs", options)
 
 
 @router.get("/backup/employees")
-def backup_employees(db: Session = Depends(get_db), background_tasks: BackgroundTasks = None):
+async def backup_employees(options: dict = Depends(get_backup_options)):
     """
     Backup the employees table.
 
     Parameters:
-    - db (Session): The SQLAlchemy session to the database.
-    - background_tasks (BackgroundTasks): Background tasks.
+    - options (dict): The Avro writer options.
 
     Returns:
-    - FileResponse: The response containing the backup file.
+    - StreamingResponse: The response streaming the backup file.
     """
-    try:
-        filename = create_avro_backup(HiredEmployee, db, "hired_employees")
-
-        background_tasks.add_task(remove_file, filename)
-
-        return FileResponse(
-            path=filename,
-            filename=os.path.basename(filename),
-            media_type="application/octet-stream"
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Error creating backup: {str(e)}")
+    return await stream_backup(HiredEmployee, "hired_employees", options)
 
 
 @router.get("/backup/all")
-def backup_all_tables(db: Session = Depends(get_db), background_tasks: BackgroundTasks = None):
+def backup_all_tables(options: dict = Depends(get_backup_options)):
     """
     Backup of all tables in the database.
 
     Parameters:
-    - db (Session): The SQLAlchemy session to the database.
-    - background_tasks (BackgroundTasks): Background tasks.
+    - options (dict): The Avro writer options.
 
     Returns:
-    - FileResponse: The response containing the backup file.
+    - StreamingResponse: The response streaming the ZIP file of the backups.
     """
     model_list = [Department, Job, HiredEmployee]
-
-    filename = create_avro_full_backup(model_list, db)
-
-    background_tasks.add_task(remove_file, filename)
+    timestamp = backup_timestamp()
 
     try:
-        return FileResponse(
-            path=filename,
-            filename=os.path.basename(filename),
-            media_type="application/zip",
-            headers={
-                "Content-Disposition": f"attachment; filename={os.path.basename(filename)}"}
-        )
+        content = stream_avro_full_backup(model_list, timestamp, options)
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error creating backup: {str(e)}")
 
+    return StreamingResponse(
+        content,
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f"attachment; filename=backup_all_{timestamp}.zip"}
+    )
+
 
 @router.post("/restore/departments")
 def restore_departments(file: UploadFile = File(...), db: Session = Depends(get_db)):
@@ -1,8 +1,14 @@
 # Library imports
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from contextlib import asynccontextmanager, contextmanager
+from threading import Lock
 import os
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -14,27 +20,280 @@ DB_USER = os.getenv("MYSQL_USER")
 DB_PASSWORD = os.getenv("MYSQL_PASSWORD")
 DB_NAME = os.getenv("MYSQL_DATABASE")
 
-# Create the database URL
-DATABASE_URL = f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+# Create the database URLs
+# They can be overridden, e.g. to run against SQLite with aiosqlite
+DATABASE_URL = os.getenv(
+    "DATABASE_URL", f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}")
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL", f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}")
 
-# Create the SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
+# Connection pool settings
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+DB_POOL_PRE_PING = os.getenv(
+    "DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_POOL_PREWARM = int(os.getenv("DB_POOL_PREWARM", "0"))
 
-# Create a session factory
+
+def pool_options(url):
+    """
+    Get the connection pool options for a database URL.
+
+    Args:
+        url (str): The database URL.
+
+    Returns:
+        dict: The keyword arguments for create_engine.
+    """
+    options = {"pool_pre_ping": DB_POOL_PRE_PING,
+               "pool_recycle": DB_POOL_RECYCLE}
+    # SQLite in memory shares one connection per thread, with no pool to size.
+    # File-based SQLite gets a QueuePool like the servers, sized the same way.
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or parsed.database not in (None, "", ":memory:"):
+        options.update(pool_size=DB_POOL_SIZE,
+                       max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+
+def streaming_url(url):
+    """
+    Get a database URL whose driver streams results from server-side cursors.
+
+    mysqlconnector has no server-side cursors: a streamed result is still
+    fetched whole when the statement runs. MySQL URLs on it are switched
+    to PyMySQL, which streams results through SSCursor.
+
+    Args:
+        url (str): The database URL.
+
+    Returns:
+        str: The URL, with PyMySQL instead of mysqlconnector.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "mysql" and parsed.get_driver_name() == "mysqlconnector":
+        return parsed.set(drivername="mysql+pymysql").render_as_string(hide_password=False)
+    return url
+
+
+# Create the SQLAlchemy engines
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL))
+
+# Full backups read whole tables, through server-side cursors
+BACKUP_DATABASE_URL = os.getenv("BACKUP_DATABASE_URL", streaming_url(DATABASE_URL))
+backup_engine = engine if BACKUP_DATABASE_URL == DATABASE_URL else create_engine(
+    BACKUP_DATABASE_URL, **pool_options(BACKUP_DATABASE_URL))
+
+# Create the session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(
+    autoflush=False, expire_on_commit=False, bind=async_engine)
 
 # Create the declarative base for the models
 Base = declarative_base()
 
+# Connection pool metrics
+
+
+class PoolStats:
+    """
+    Live statistics of the connection pool of an engine.
+
+    The pool counters come from the pool itself. Checkouts and new
+    connections are counted through pool events, and the time spent waiting
+    for a connection is measured by measure_wait, around every checkout made
+    through the session and connection helpers below.
+    """
+
+    def __init__(self, sync_engine):
+        self.engine = sync_engine
+        self.lock = Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+        event.listen(sync_engine, "connect", self._on_connect)
+        event.listen(sync_engine, "checkout", self._on_checkout)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self.lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self.lock:
+            self.checkouts += 1
+
+    def record_wait(self, seconds):
+        """
+        Record the time spent waiting for a connection.
+
+        Args:
+            seconds (float): The wait time.
+        """
+        with self.lock:
+            self.waits += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_timeout(self):
+        """
+        Record a request that gave up waiting for a connection.
+        """
+        with self.lock:
+            self.timeouts += 1
+
+    @contextmanager
+    def measure_wait(self):
+        """
+        Measure the wait for the connection checked out inside the block.
+
+        A checkout that times out is recorded as a timeout instead.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except PoolTimeoutError:
+            self.record_timeout()
+            raise
+        self.record_wait(time.perf_counter() - start)
+
+    def snapshot(self):
+        """
+        Get the current statistics.
+
+        Returns:
+            dict: The pool counters and wait times.
+        """
+        pool = self.engine.pool
+        stats = {}
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            if hasattr(pool, name):
+                stats[name] = getattr(pool, name)()
+
+        with self.lock:
+            stats.update({
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": self.wait_total / self.waits * 1e3 if self.waits else 0.0,
+                "wait_ms_max": self.wait_max * 1e3,
+            })
+        return stats
+
+
+pool_stats = PoolStats(engine)
+async_pool_stats = PoolStats(async_engine.sync_engine)
+backup_pool_stats = pool_stats if backup_engine is engine else PoolStats(
+    backup_engine)
+
+
+def prewarm_pool(count=DB_POOL_PREWARM):
+    """
+    Open connections ahead of the first requests.
+
+    Args:
+        count (int): The number of connections, capped by the pool size.
+    """
+    connections = []
+    try:
+        for _ in range(min(count, DB_POOL_SIZE)):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+async def prewarm_async_pool(count=DB_POOL_PREWARM):
+    """
+    Open async connections ahead of the first requests.
+
+    Args:
+        count (int): The number of connections, capped by the pool size.
+    """
+    connections = []
+    try:
+        for _ in range(min(count, DB_POOL_SIZE)):
+            connections.append(await async_engine.connect())
+    finally:
+        for connection in connections:
+            await connection.close()
+
 # Create the database connection
 
 
-def get_db():
+@contextmanager
+def open_session():
     """
-    Get a database connection.
+    Open a database session with its connection checked out.
+
+    The connection is checked out up front so the pool wait is recorded.
     """
     db = SessionLocal()
     try:
+        with pool_stats.measure_wait():
+            db.connection()
         yield db
     finally:
         db.close()
+
+
+@asynccontextmanager
+async def open_async_session():
+    """
+    Open an async database session with its connection checked out.
+
+    The connection is checked out up front so the pool wait is recorded.
+    """
+    async with AsyncSessionLocal() as db:
+        with async_pool_stats.measure_wait():
+            await db.connection()
+        yield db
+
+
+def checkout(bind=engine):
+    """
+    Check out a connection from the engine or the backup engine.
+
+    Args:
+        bind (Engine): The engine.
+
+    Returns:
+        Connection: The connection, to be closed by the caller.
+    """
+    stats = backup_pool_stats if bind is backup_engine else pool_stats
+    with stats.measure_wait():
+        return bind.connect()
+
+
+async def checkout_async():
+    """
+    Check out a connection from the async engine.
+
+    Returns:
+        AsyncConnection: The connection, to be closed by the caller.
+    """
+    with async_pool_stats.measure_wait():
+        return await async_engine.connect()
+
+
+def get_db():
+    """
+    Get a database connection.
+    """
+    with open_session() as db:
+        yield db
+
+
+async def get_async_db():
+    """
+    Get an async database connection.
+    """
+    async with open_async_session() as db:
+        yield db
@@ -5,10 +5,14 @@ from fastapi.responses import JSONResponse
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from starlette.status import HTTP_401_UNAUTHORIZED
+from contextlib import asynccontextmanager
+from starlette.concurrency import run_in_threadpool
 import secrets
 import os
 
 # Local imports
+from .database import pool_stats, async_pool_stats, backup_pool_stats, prewarm_pool, prewarm_async_pool, DB_POOL_PREWARM
+from .api.api_utils import consecutive_ids, error_log
 from .api.endpoints import router as api_router
 from .avro.endpoints import router as backup_router
 from .reports.endpoints import router as report_router
@@ -55,8 +59,30 @@ def authenticate_user(credentials: HTTPBasicCredentials = Depends(security)):
 if not os.path.exists("./.data"):
     os.makedirs("./.data")
 
+# Application lifespan
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Pre-warm the connection pools and check the server settings before
+    serving requests.
+    """
+    if DB_POOL_PREWARM > 0:
+        prewarm_pool()
+        await prewarm_async_pool()
+
+    # Read innodb_autoinc_lock_mode now, it is checked again on first use
+    try:
+        if not await run_in_threadpool(consecutive_ids):
+            error_log.write(
+                "innodb_autoinc_lock_mode is 2, response=ids is disabled for inserts")
+    except Exception as e:
+        error_log.write(f"Error reading innodb_autoinc_lock_mode: {str(e)}")
+    yield
+
 # Initialize the FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Add the routers to the app
 app.include_router(api_router, dependencies=[Depends(authenticate_user)])
@@ -88,3 +114,20 @@ async def validation_exception_handler(request, exc):
 def read_root():
     import os
     return {"message": f"Welcome to the HR Transactions API {os.getcwd()}"}
+
+# Connection pool metrics endpoint
+
+
+@app.get("/metrics/pool", dependencies=[Depends(authenticate_user)])
+def read_pool_metrics():
+    """
+    Get the live statistics of the connection pools.
+
+    Returns:
+        dict: The statistics of the sync and async pools, and of the backup
+        pool when backups have their own engine.
+    """
+    metrics = {"sync": pool_stats.snapshot(), "async": async_pool_stats.snapshot()}
+    if backup_pool_stats is not pool_stats:
+        metrics["backup"] = backup_pool_stats.snapshot()
+    return metrics
@@ -1,3 +1,6 @@
 from .department import Department
 from .job import Job
 from .employee import HiredEmployee
+from .idempotency_key import IdempotencyKey
+from .quarterly_hires_summary import QuarterlyHiresSummary
+from .daily_hires_summary import DailyHiresSummary
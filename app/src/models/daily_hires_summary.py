@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Date, Integer
+from ..database import Base
+
+
+class DailyHiresSummary(Base):
+    __tablename__ = 'daily_hires_summary'
+
+    day = Column(Date, primary_key=True)
+    department_id = Column(Integer, primary_key=True, autoincrement=False)
+    job_id = Column(Integer, primary_key=True, autoincrement=False)
+    hires = Column(Integer, nullable=False, default=0)
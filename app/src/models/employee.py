@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from ..database import Base
 
 
 class HiredEmployee(Base):
     __tablename__ = 'hired_employees'
+    __table_args__ = (
+        # Range scans by hire date for the reports
+        Index('ix_hired_employees_datetime_department_job',
+              'datetime', 'department_id', 'job_id'),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, Text, DateTime
+from ..database import Base
+
+
+class IdempotencyKey(Base):
+    __tablename__ = 'idempotency_keys'
+
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    # MEDIUMTEXT on MySQL, a full response of 1000 records outgrows TEXT
+    response = Column(Text(length=2**24 - 1), nullable=False)
+    created_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer
+from ..database import Base
+
+
+class QuarterlyHiresSummary(Base):
+    __tablename__ = 'quarterly_hires_summary'
+
+    year = Column(Integer, primary_key=True, autoincrement=False)
+    quarter = Column(Integer, primary_key=True, autoincrement=False)
+    department_id = Column(Integer, primary_key=True, autoincrement=False)
+    job_id = Column(Integer, primary_key=True, autoincrement=False)
+    hires = Column(Integer, nullable=False, default=0)
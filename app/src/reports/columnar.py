@@ -0,0 +1,506 @@
+# Library imports
+from datetime import date, timedelta
+from sqlalchemy import func, select
+from threading import Lock
+import numpy as np
+import os
+import time
+
+# Local imports
+from ..models import Department, Job, HiredEmployee
+from .reports_utils import period_of
+
+# Constants
+SNAPSHOT_LOAD_CHUNK_SIZE = 100000
+# Largest daily cube kept in memory (days x groups), 40 MB of int32
+MAX_CUBE_CELLS = 10_000_000
+# Largest id mapped through a lookup table when encoding names
+MAX_LOOKUP_SIZE = 1_000_000
+EPOCH = date(1970, 1, 1)
+# Seconds before the snapshot is reloaded in full, to pick up changes
+# made by other processes below the watermark
+SNAPSHOT_TTL = int(os.getenv("SNAPSHOT_TTL", "300"))
+
+
+class NameEncoding:
+    """
+    Dictionary encoding of the names of a lookup table.
+
+    Ids are mapped to their position in the sorted array of known ids, with
+    one extra position for ids that don't exist. Names are mapped to codes
+    in sorted order (missing names first, like NULLs in MySQL), so grouping
+    and sorting by code is grouping and sorting by name.
+    """
+
+    def __init__(self, rows=()):
+        rows = sorted(rows)
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.id_names = [row[1] for row in rows]
+
+        # Case-insensitive order, like the default MySQL collation
+        self.names = [None] + sorted(set(self.id_names),
+                                     key=lambda name: (name.casefold(), name))
+        codes = {name: code for code, name in enumerate(self.names)}
+        # The last position stands for unknown ids, without a name
+        self.name_codes = np.array(
+            [codes[name] for name in self.id_names] + [0], dtype=np.int64)
+
+    def encode(self, values):
+        """
+        Get the position of every id in the array of known ids.
+
+        Args:
+            values (ndarray): The ids.
+
+        Returns:
+            ndarray: The positions, len(self.ids) for unknown ids.
+        """
+        unknown = len(self.ids)
+        if not unknown:
+            return np.zeros(len(values), dtype=np.int64)
+
+        if 0 <= self.ids[0] and self.ids[-1] < MAX_LOOKUP_SIZE:
+            # Direct lookup table, much faster than a search per value
+            lookup = np.full(self.ids[-1] + 2, unknown, dtype=np.int64)
+            lookup[self.ids] = np.arange(unknown)
+            return lookup[np.clip(values, -1, self.ids[-1] + 1)]
+
+        positions = np.searchsorted(self.ids, values)
+        clipped = np.minimum(positions, unknown - 1)
+        return np.where(self.ids[clipped] == values, clipped, unknown)
+
+
+class DailyCube:
+    """
+    Cumulative hires per day and group.
+
+    Row d holds the hires of every group before day first_day + d, so the
+    hires of any range of days are the difference of two rows.
+    """
+
+    def __init__(self, first_day, cumulative):
+        self.first_day = first_day
+        self.cumulative = cumulative
+
+    @classmethod
+    def build(cls, days, groups, group_count):
+        """
+        Count the hires per day and group.
+
+        Args:
+            days (ndarray): The hire day of every row, in days since 1970-01-01.
+            groups (ndarray): The group of every row.
+            group_count (int): The number of groups.
+
+        Returns:
+            DailyCube: The cube, or None if it doesn't fit in MAX_CUBE_CELLS.
+        """
+        if not len(days):
+            return cls(0, np.zeros((1, group_count), dtype=np.int32))
+
+        first_day = int(days.min())
+        span = int(days.max()) - first_day + 1
+        if span * group_count > MAX_CUBE_CELLS:
+            return None
+
+        hires = np.bincount((days - first_day) * group_count + groups,
+                            minlength=span * group_count).reshape(span, group_count)
+        cumulative = np.zeros((span + 1, group_count), dtype=np.int32)
+        np.cumsum(hires, axis=0, out=cumulative[1:])
+        return cls(first_day, cumulative)
+
+    def total(self, start_day, end_day):
+        """
+        Count the hires of every group in a half-open range of days.
+
+        Args:
+            start_day (int): The first day.
+            end_day (int): The day after the last one.
+
+        Returns:
+            ndarray: The hires per group.
+        """
+        last = len(self.cumulative) - 1
+        start = min(max(start_day - self.first_day, 0), last)
+        end = min(max(end_day - self.first_day, 0), last)
+        return self.cumulative[max(end, start)] - self.cumulative[start]
+
+    def totals(self, boundaries):
+        """
+        Count the hires of every group between consecutive days.
+
+        Args:
+            boundaries (ndarray): Increasing days, the first day of every
+                range followed by the day after the last one.
+
+        Returns:
+            ndarray: The hires per range and group.
+        """
+        positions = np.clip(boundaries - self.first_day, 0, len(self.cumulative) - 1)
+        return np.diff(self.cumulative[positions], axis=0)
+
+
+class HiresColumns:
+    """
+    Immutable column arrays of hired_employees and their daily cubes.
+
+    Department and job are kept as ids and as positions in their name
+    encodings, the hire time as days since 1970-01-01, since reports are
+    filtered by date.
+    """
+
+    def __init__(self, department_ids, job_ids, days, departments, jobs, watermark):
+        self.department_ids = department_ids
+        self.job_ids = job_ids
+        self.days = days
+        self.departments = departments
+        self.jobs = jobs
+        self.watermark = watermark
+
+        # Hires per department, and per department name and job name
+        self.department_codes = departments.encode(department_ids)
+        self.job_count = len(jobs.names)
+        self.group_count = len(departments.names) * self.job_count
+        self.groups = (departments.name_codes[self.department_codes] * self.job_count
+                       + jobs.name_codes[jobs.encode(job_ids)])
+
+        self.department_cube = DailyCube.build(
+            days, self.department_codes, len(departments.ids) + 1)
+        self.group_cube = DailyCube.build(days, self.groups, self.group_count)
+
+    def period_mask(self, start_day, end_day):
+        """
+        Select the hires of a half-open range of days.
+
+        Args:
+            start_day (int): The first day.
+            end_day (int): The day after the last one.
+
+        Returns:
+            ndarray: The boolean mask of the hires in the range.
+        """
+        return (self.days >= start_day) & (self.days < end_day)
+
+
+EMPTY_COLUMNS = HiresColumns(
+    np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+    np.empty(0, dtype=np.int64), NameEncoding(), NameEncoding(), None)
+
+
+class HiresSnapshot:
+    """
+    In-memory columnar snapshot of hired_employees for the report endpoints.
+
+    The snapshot is loaded lazily by the first report. Writes only mark it
+    stale: appended rows are read past the id watermark on the next report,
+    while writes that can change rows below it (explicit lower ids,
+    upserts, restores) make the next report reload it in full. Each refresh
+    swaps in new arrays, so a report never sees a half-refreshed snapshot.
+
+    Writes made by other processes (other workers, the migration) don't
+    mark it stale, so every report also compares the watermark with the
+    highest id in the table, and the snapshot is reloaded in full after
+    the TTL.
+    """
+
+    def __init__(self, ttl=SNAPSHOT_TTL):
+        self.lock = Lock()
+        self.ttl = ttl
+        self.stale = True
+        self.full_reload = True
+        self.loaded_at = None
+        self.columns = EMPTY_COLUMNS
+
+    def mark_stale(self, full=False):
+        """
+        Mark the snapshot for refresh on the next report.
+
+        Args:
+            full (bool): Whether rows below the watermark may have changed.
+        """
+        with self.lock:
+            self.stale = True
+            self.full_reload = self.full_reload or full
+
+    def covers(self, key):
+        """
+        Check whether a new primary key is below the watermark.
+
+        Args:
+            key (int): The primary key.
+
+        Returns:
+            bool: True if an incremental refresh would miss the key.
+        """
+        watermark = self.columns.watermark
+        return watermark is not None and key <= watermark
+
+    def check_watermark(self, db):
+        """
+        Mark the snapshot stale if the table changed since it was loaded.
+
+        A higher id than the watermark means appended rows, a lower one
+        deleted rows. Other changes are picked up when the TTL expires.
+        Must be called with the lock held.
+
+        Args:
+            db: The database connection.
+        """
+        if time.monotonic() - self.loaded_at > self.ttl:
+            self.stale = self.full_reload = True
+            return
+
+        watermark = self.columns.watermark
+        last_id = db.execute(select(func.max(HiredEmployee.id))).scalar()
+        if last_id != watermark:
+            self.stale = True
+            self.full_reload = watermark is not None and (
+                last_id is None or last_id < watermark)
+
+    def get(self, db):
+        """
+        Get the columns, refreshing them first if the snapshot is stale.
+
+        Args:
+            db: The database connection.
+
+        Returns:
+            HiresColumns: The current columns.
+        """
+        with self.lock:
+            if not self.stale:
+                self.check_watermark(db)
+            if not self.stale:
+                return self.columns
+            full = self.full_reload
+            self.stale = False
+            self.full_reload = False
+
+            try:
+                self.columns = self._load(
+                    db, EMPTY_COLUMNS if full else self.columns)
+                if full:
+                    self.loaded_at = time.monotonic()
+            except Exception:
+                self.stale = True
+                self.full_reload = self.full_reload or full
+                raise
+            return self.columns
+
+    def _load(self, db, columns):
+        table = HiredEmployee.__table__
+        statement = select(table.c.id, table.c.department_id,
+                           table.c.job_id, table.c.datetime).order_by(table.c.id)
+        if columns.watermark is not None:
+            statement = statement.where(table.c.id > columns.watermark)
+
+        watermark = columns.watermark
+        chunks = [(columns.department_ids, columns.job_ids, columns.days)]
+        result = db.execute(statement.execution_options(
+            yield_per=SNAPSHOT_LOAD_CHUNK_SIZE))
+        for partition in result.partitions():
+            ids, department_ids, job_ids, hired_at = zip(*partition)
+            chunks.append((
+                np.array(department_ids, dtype=np.int64),
+                np.array(job_ids, dtype=np.int64),
+                np.array(hired_at, dtype="datetime64[D]").astype(np.int64),
+            ))
+            watermark = ids[-1]
+
+        # The lookup tables are small, so they are always reloaded
+        departments = NameEncoding(db.execute(
+            select(Department.id, Department.department)).all())
+        jobs = NameEncoding(db.execute(select(Job.id, Job.job)).all())
+
+        return HiresColumns(
+            *(np.concatenate(column) for column in zip(*chunks)),
+            departments, jobs, watermark)
+
+
+hires_snapshot = HiresSnapshot()
+
+
+def invalidate_snapshot(model_class, keys=(), replaced=False):
+    """
+    Mark the snapshot stale after a write to one of its tables.
+
+    Args:
+        model_class: The model class of the written table.
+        keys: The primary keys of the written rows, None for the ones the
+            database generated without reporting them. Generated keys come
+            from the auto-increment counter, always above the highest id
+            when the snapshot was loaded, so they are read past the watermark.
+        replaced (bool): Whether existing rows may have been changed.
+    """
+    if model_class is HiredEmployee:
+        full = replaced or any(
+            key is not None and hires_snapshot.covers(key) for key in keys)
+        hires_snapshot.mark_stale(full)
+    elif model_class in (Department, Job):
+        hires_snapshot.mark_stale()
+
+
+def to_day(value):
+    """
+    Get the day number of a period boundary.
+
+    Args:
+        value (datetime): The boundary, at midnight.
+
+    Returns:
+        int: The days since 1970-01-01.
+    """
+    return (value.date() - EPOCH).days
+
+
+def quarter_ranges(start_day, end_day):
+    """
+    Split a half-open range of days at the quarter boundaries.
+
+    Args:
+        start_day (int): The first day.
+        end_day (int): The day after the last one.
+
+    Yields:
+        tuple: The first day, the day after the last one and the quarter
+        (0-3) of every part.
+    """
+    current = EPOCH + timedelta(days=start_day)
+    while start_day < end_day:
+        quarter = (current.month - 1) // 3
+        if quarter == 3:
+            current = date(current.year + 1, 1, 1)
+        else:
+            current = date(current.year, quarter * 3 + 4, 1)
+        next_day = min((current - EPOCH).days, end_day)
+        yield start_day, next_day, quarter
+        start_day = next_day
+
+
+def period_ranges(start_day, end_day, granularity):
+    """
+    Split a half-open range of days into cube periods.
+
+    Args:
+        start_day (int): The first day.
+        end_day (int): The day after the last one.
+        granularity (str): "year", "quarter", "month" or "week".
+
+    Returns:
+        list: The labels of the periods.
+        ndarray: The first day of every period followed by end_day.
+    """
+    labels = []
+    boundaries = []
+    while start_day < end_day:
+        label, next_period = period_of(EPOCH + timedelta(days=start_day), granularity)
+        labels.append(label)
+        boundaries.append(start_day)
+        start_day = min((next_period - EPOCH).days, end_day)
+    return labels, np.array(boundaries + [end_day], dtype=np.int64)
+
+
+def rollup(rows, key, counts, levels):
+    """
+    Append the rows of a cube level and their subtotals, like WITH ROLLUP.
+
+    Args:
+        rows (list): The rows to append to.
+        key (dict): The labels of the outer levels.
+        counts (ndarray): The hires, one axis per remaining level.
+        levels (list): (name, labels) of the remaining levels.
+    """
+    (name, labels), inner = levels[0], levels[1:]
+    totals = counts.reshape(len(labels), -1).sum(axis=1)
+    for position in np.flatnonzero(totals).tolist():
+        row_key = {**key, name: labels[position]}
+        if inner:
+            rollup(rows, row_key, counts[position], inner)
+        rows.append({**row_key, "hires": int(totals[position])})
+
+
+def get_quarterly_hires(db, start, end):
+    columns = hires_snapshot.get(db)
+    start_day, end_day = to_day(start), to_day(end)
+
+    if columns.group_cube is not None:
+        # Hires of each quarter of the period, read from the cumulative cube
+        counts = np.zeros((columns.group_count, 4), dtype=np.int64)
+        for first, last, quarter in quarter_ranges(start_day, end_day):
+            counts[:, quarter] += columns.group_cube.total(first, last)
+    else:
+        # Pack the group and the quarter into one key per hire and count
+        # them all with a single bincount
+        mask = columns.period_mask(start_day, end_day)
+        months = columns.days[mask].astype(
+            "datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        keys = columns.groups[mask] * 4 + months % 12 // 3
+        counts = np.bincount(keys, minlength=columns.group_count * 4).reshape(
+            columns.group_count, 4)
+
+    # The groups are numbered in name order, like ORDER BY department, job
+    groups = np.flatnonzero(counts.any(axis=1))
+    return [
+        {"department": columns.departments.names[group // columns.job_count],
+         "job": columns.jobs.names[group % columns.job_count],
+         "Q1": q1, "Q2": q2, "Q3": q3, "Q4": q4}
+        for group, (q1, q2, q3, q4) in zip(groups.tolist(), counts[groups].tolist())
+    ]
+
+
+def get_departments_above_average(db, start, end):
+    columns = hires_snapshot.get(db)
+    start_day, end_day = to_day(start), to_day(end)
+    departments = columns.departments
+
+    if columns.department_cube is not None:
+        hired = columns.department_cube.total(start_day, end_day)
+    else:
+        hired = np.bincount(
+            columns.department_codes[columns.period_mask(start_day, end_day)],
+            minlength=len(departments.ids) + 1)
+
+    if not hired.any():
+        return []
+    average = hired[hired > 0].mean()
+
+    # Known departments only, most hires first
+    positions = np.flatnonzero(hired[:-1] > average)
+    positions = positions[np.argsort(-hired[positions], kind="stable")]
+
+    return [
+        {"id": int(departments.ids[position]),
+         "department": departments.id_names[position], "hired": int(hired[position])}
+        for position in positions.tolist()
+    ]
+
+
+def get_hires_cube(db, start, end, granularity="quarter", dimensions=("department", "job")):
+    columns = hires_snapshot.get(db)
+    labels, boundaries = period_ranges(to_day(start), to_day(end), granularity)
+
+    if columns.group_cube is not None:
+        counts = columns.group_cube.totals(boundaries)
+    else:
+        mask = columns.period_mask(boundaries[0], boundaries[-1])
+        periods = np.searchsorted(boundaries, columns.days[mask], side="right") - 1
+        counts = np.bincount(
+            periods * columns.group_count + columns.groups[mask],
+            minlength=len(labels) * columns.group_count)
+
+    # One axis per period, department name and job name, summed over the
+    # dimensions left out and ordered like the requested ones
+    cube = counts.reshape(len(labels), len(columns.departments.names), columns.job_count)
+    kept = [dimension for dimension in ("department", "job") if dimension in dimensions]
+    dropped = tuple(1 + axis for axis, dimension in enumerate(("department", "job"))
+                    if dimension not in dimensions)
+    cube = cube.sum(axis=dropped).transpose(
+        0, *(1 + kept.index(dimension) for dimension in dimensions))
+
+    names = {"department": columns.departments.names, "job": columns.jobs.names}
+    rows = []
+    if cube.any():
+        rollup(rows, {}, cube, [("period", labels)] +
+               [(dimension, names[dimension]) for dimension in dimensions])
+        rows.append({"hires": int(cube.sum())})
+    return rows
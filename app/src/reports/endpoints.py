@@ -1,28 +1,66 @@
 # Library imports
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from datetime import date
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import ORJSONResponse
+from typing import List, Literal, Optional
+import os
 
 # Local imports
-from ..database import get_db
-from .reports_utils import get_quarterly_hires, get_departments_above_average
+from ..database import open_session
+from .reports_utils import get_cube_dimensions, get_report_period, DEFAULT_REPORT_YEAR
+from .report_cache import cached_report
+from . import columnar, reports_utils
+
+# Report backend, "sql" to query MySQL or "columnar" to use the in-memory snapshot
+REPORT_BACKEND = os.getenv("REPORT_BACKEND", "sql")
+reports = columnar if REPORT_BACKEND == "columnar" else reports_utils
 
 # Router
-router = APIRouter(prefix="/report")
+router = APIRouter(prefix="/report", default_response_class=ORJSONResponse)
+
+
+def run_report(report, *args):
+    """
+    Run a report query on its own session.
+
+    The session is only opened when the report is not cached.
+
+    Args:
+        report: The report function, taking the database session.
+        *args: The report parameters.
+
+    Returns:
+        list: The report rows.
+    """
+    with open_session() as db:
+        return report(db, *args)
 
 
 @router.get("/quarterly_hires")
-def backup_departments(db: Session = Depends(get_db)):
-    data = get_quarterly_hires(db)
-    return {
+def backup_departments(request: Request, year: int = Query(DEFAULT_REPORT_YEAR, ge=1, le=9998), start: Optional[date] = Query(None, alias="from"), end: Optional[date] = Query(None, alias="to")):
+    start, end = get_report_period(year, start, end)
+    return cached_report(request, "quarterly_hires", {"from": start, "to": end}, lambda: {
         "message": "Quarterly hires grouped by department and job",
-        "data": data
-    }
+        "data": run_report(reports.get_quarterly_hires, start, end)
+    })
 
 
 @router.get("/departments_above_average")
-def backup_jobs(db: Session = Depends(get_db)):
-    data = get_departments_above_average(db)
-    return {
+def backup_jobs(request: Request, year: int = Query(DEFAULT_REPORT_YEAR, ge=1, le=9998), start: Optional[date] = Query(None, alias="from"), end: Optional[date] = Query(None, alias="to")):
+    start, end = get_report_period(year, start, end)
+    return cached_report(request, "departments_above_average", {"from": start, "to": end}, lambda: {
         "message": "Departments above average hired",
-        "data": data
-    }
+        "data": run_report(reports.get_departments_above_average, start, end)
+    })
+
+
+@router.get("/hires_cube")
+def hires_cube(request: Request, granularity: Literal["year", "quarter", "month", "week"] = "quarter", dimensions: List[Literal["department", "job"]] = Query(["department", "job"]), year: int = Query(DEFAULT_REPORT_YEAR, ge=1, le=9998), start: Optional[date] = Query(None, alias="from"), end: Optional[date] = Query(None, alias="to")):
+    start, end = get_report_period(year, start, end)
+    dimensions = get_cube_dimensions(dimensions)
+    params = {"from": start, "to": end,
+              "granularity": granularity, "dimensions": dimensions}
+    return cached_report(request, "hires_cube", params, lambda: {
+        "message": f"Hires per {granularity} rolled up by {', '.join(dimensions)}",
+        "data": run_report(reports.get_hires_cube, start, end, granularity, dimensions)
+    })
@@ -0,0 +1,221 @@
+# Library imports
+from collections import Counter
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects import mysql, sqlite
+import argparse
+
+# Shared imports
+from hires_scan import daily_hires_scan, hires_scan as scan_hires
+
+# Local imports
+from ..models import DailyHiresSummary, HiredEmployee, QuarterlyHiresSummary
+from .report_cache import invalidate_reports
+
+
+def quarter_of(value):
+    """
+    Get the year and quarter of a hire date.
+
+    Args:
+        value (datetime): The hire date.
+
+    Returns:
+        tuple: The year and the quarter (1-4).
+    """
+    return value.year, (value.month - 1) // 3 + 1
+
+
+def day_of(value):
+    """
+    Get the day of a hire date.
+
+    Args:
+        value (datetime): The hire date.
+
+    Returns:
+        tuple: The day.
+    """
+    return (value.date(),)
+
+
+def summary_key(summary):
+    """
+    Get the key columns of a summary, in primary key order.
+
+    Args:
+        summary: The summary model class.
+
+    Returns:
+        tuple: The column names, the period first.
+    """
+    return tuple(column.name for column in summary.__table__.primary_key.columns)
+
+
+def hires_delta(added=(), removed=(), period=quarter_of):
+    """
+    Count the change of hires per summary key.
+
+    Args:
+        added: The hired employees added to the table, as dictionaries.
+        removed: The hired employees removed from the table, as dictionaries.
+        period: Function returning the period columns of a hire date.
+
+    Returns:
+        Counter: The change of hires keyed by (*period, department_id, job_id).
+    """
+    delta = Counter()
+    for rows, sign in ((added, 1), (removed, -1)):
+        for row in rows:
+            delta[(*period(row["datetime"]), row["department_id"], row["job_id"])] += sign
+    return delta
+
+
+def apply_hires_delta(db, delta, summary=QuarterlyHiresSummary):
+    """
+    Add a change of hires to a summary in the current transaction.
+
+    The counters are incremented in place with one upsert, so concurrent
+    writers never overwrite each other. The rows are upserted in key order,
+    so concurrent writers lock them in the same order and can't deadlock.
+
+    Args:
+        db: The database connection.
+        delta (Counter): The change of hires per summary key.
+        summary: The summary model class.
+    """
+    key = summary_key(summary)
+    values = [
+        dict(zip(key, row_key), hires=hires)
+        for row_key, hires in sorted(delta.items()) if hires
+    ]
+    if not values:
+        return
+
+    table = summary.__table__
+    if db.get_bind().dialect.name == "sqlite":
+        statement = sqlite.insert(table).values(values)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(key),
+            set_={"hires": table.c.hires + statement.excluded.hires})
+    else:
+        statement = mysql.insert(table).values(values)
+        statement = statement.on_duplicate_key_update(
+            hires=table.c.hires + statement.inserted.hires)
+
+    db.execute(statement)
+
+
+def update_hires_summary(db, table, added=(), removed=()):
+    """
+    Keep the summaries in step with a write to the hired employees table.
+
+    The summaries are always updated in the same order, so concurrent
+    writers lock their rows in the same order too. Writes to other tables
+    are ignored.
+
+    Args:
+        db: The database connection.
+        table: The written table.
+        added: The rows added to the table, as dictionaries.
+        removed: The rows replaced or removed, as dictionaries.
+    """
+    if table.name == HiredEmployee.__tablename__:
+        for summary, period, _ in SUMMARIES:
+            apply_hires_delta(db, hires_delta(added, removed, period), summary)
+
+
+def hires_scan():
+    """
+    Build the query counting the quarterly hires straight from hired_employees.
+
+    The query is shared with the migration, which rebuilds the summary too.
+
+    Returns:
+        Select: The query returning the summary rows.
+    """
+    return scan_hires(HiredEmployee.__table__)
+
+
+def daily_scan():
+    """
+    Build the query counting the daily hires straight from hired_employees.
+
+    Returns:
+        Select: The query returning the summary rows.
+    """
+    return daily_hires_scan(HiredEmployee.__table__)
+
+
+# The summaries, with the period of a hire and the scan rebuilding them
+SUMMARIES = (
+    (QuarterlyHiresSummary, quarter_of, hires_scan),
+    (DailyHiresSummary, day_of, daily_scan),
+)
+
+
+def rebuild_hires_summary(db):
+    """
+    Rebuild the summaries from full scans of hired_employees.
+
+    Args:
+        db: The database connection.
+    """
+    for summary, _, scan in SUMMARIES:
+        table = summary.__table__
+        db.execute(delete(table))
+        db.execute(insert(table).from_select(
+            [*summary_key(summary), "hires"], scan()))
+    db.commit()
+    invalidate_reports()
+
+
+def check_hires_summary(db):
+    """
+    Compare the summaries against full scans of hired_employees.
+
+    Args:
+        db: The database connection.
+
+    Returns:
+        list: The keys whose counts differ, with the summary table and the
+        summary and scan counts.
+    """
+    mismatches = []
+    for summary, _, scan in SUMMARIES:
+        key = summary_key(summary)
+        stored = {tuple(row[:-1]): row[-1] for row in db.execute(select(summary.__table__))}
+        scanned = {tuple(row[:-1]): row[-1] for row in db.execute(scan())}
+        mismatches.extend(
+            {"table": summary.__tablename__, **dict(zip(key, row_key)),
+             "summary": stored.get(row_key, 0), "scan": scanned.get(row_key, 0)}
+            for row_key in sorted(stored.keys() | scanned.keys())
+            if stored.get(row_key, 0) != scanned.get(row_key, 0)
+        )
+    return mismatches
+
+
+if __name__ == "__main__":
+    # Usage (from the app folder):
+    #     python -m src.reports.hires_summary [--rebuild]
+    from ..database import SessionLocal
+
+    parser = argparse.ArgumentParser(
+        description="Check the quarterly and daily hires summaries against hired_employees")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="rebuild the summaries if they are out of date")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        mismatches = check_hires_summary(db)
+        for mismatch in mismatches:
+            print(mismatch)
+        print(f"{len(mismatches)} mismatched key(s)")
+
+        if mismatches and args.rebuild:
+            rebuild_hires_summary(db)
+            print("Summaries rebuilt")
+    finally:
+        db.close()
+
+    raise SystemExit(1 if mismatches and not args.rebuild else 0)
@@ -0,0 +1,114 @@
+# Library imports
+from fastapi import Response
+from threading import Lock
+import hashlib
+import orjson
+import os
+import time
+
+# Constants
+REPORT_CACHE_TTL = int(os.getenv("REPORT_CACHE_TTL", "300"))
+
+
+class ReportCache:
+    """
+    In-process cache of encoded report responses.
+
+    Entries are keyed by report name and parameters and expire after the
+    TTL. Every write to the reported tables invalidates the whole cache; a
+    report computed while a write was running is not stored, so a stale
+    result never outlives the write.
+    """
+
+    def __init__(self, ttl=REPORT_CACHE_TTL):
+        self.ttl = ttl
+        self.entries = {}
+        self.generation = 0
+        self.lock = Lock()
+
+    def invalidate(self):
+        """
+        Drop every cached report.
+        """
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def get(self, key):
+        """
+        Get a cached report.
+
+        Args:
+            key (tuple): The report name and parameters.
+
+        Returns:
+            tuple: The encoded body and its ETag, or None if not cached.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[2] > self.ttl:
+                del self.entries[key]
+                return None
+            return entry[0], entry[1]
+
+    def compute(self, key, build):
+        """
+        Build and cache a report.
+
+        Args:
+            key (tuple): The report name and parameters.
+            build: Function returning the report content.
+
+        Returns:
+            tuple: The encoded body and its ETag.
+        """
+        with self.lock:
+            generation = self.generation
+
+        body = orjson.dumps(build())
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+        with self.lock:
+            if generation == self.generation:
+                self.entries[key] = (body, etag, time.monotonic())
+        return body, etag
+
+
+report_cache = ReportCache()
+
+
+def invalidate_reports():
+    """
+    Invalidate the cached reports after the reported tables have been written.
+    """
+    report_cache.invalidate()
+
+
+def cached_report(request, name, params, build):
+    """
+    Answer a report request from the cache, building the report on a miss.
+
+    The ETag is a hash of the body, so it only changes when the report does.
+
+    Args:
+        request (Request): The request, for its If-None-Match header.
+        name (str): The report name.
+        params (dict): The report parameters.
+        build: Function returning the report content.
+
+    Returns:
+        Response: The report, or 304 Not Modified if the client has it.
+    """
+    key = (name, tuple(sorted(params.items())))
+    cached = report_cache.get(key)
+    body, etag = cached if cached is not None else report_cache.compute(
+        key, build)
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,56 +1,152 @@
-from sqlalchemy import text
+from datetime import date, datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy import case, func, select, text
 
+# Shared imports
+from hires_scan import hires_scan
 
-def get_quarterly_hires(db):
-    query = text(
-        """
-            WITH HiresWithQuartil AS (
+# Local imports
+from ..models import DailyHiresSummary, Department, HiredEmployee, Job, QuarterlyHiresSummary
+
+# Constants
+DEFAULT_REPORT_YEAR = 2021
+CUBE_GRANULARITIES = ("year", "quarter", "month", "week")
+CUBE_DIMENSIONS = ("department", "job")
+DIMENSION_COLUMNS = {"department": Department.department, "job": Job.job}
+
+
+def get_report_period(year=DEFAULT_REPORT_YEAR, start=None, end=None):
+    """
+    Get the half-open period [start, end) covered by a report.
+
+    Args:
+        year (int): The reported year, used when no dates are given.
+        start (date): The first day of the period, if any.
+        end (date): The day after the period, if any.
+
+    Returns:
+        tuple: The start and end datetimes of the period.
+
+    Raises:
+        HTTPException: If the period is empty, or has no end in the calendar.
+    """
+    start = start or date(year, 1, 1)
+    if end is None:
+        if start.year == date.max.year:
+            raise HTTPException(
+                status_code=422, detail=f"'to' is required for periods starting in {date.max.year}")
+        end = date(start.year + 1, 1, 1)
+
+    if start >= end:
+        raise HTTPException(
+            status_code=422, detail="'from' must be earlier than 'to'")
+
+    return (datetime(start.year, start.month, start.day),
+            datetime(end.year, end.month, end.day))
+
+
+def get_cube_dimensions(dimensions):
+    """
+    Check the dimensions of a cube request.
+
+    Args:
+        dimensions (list): The dimensions, from the outermost to the innermost.
+
+    Returns:
+        tuple: The dimensions.
+
+    Raises:
+        HTTPException: If a dimension is repeated.
+    """
+    if len(set(dimensions)) != len(dimensions):
+        raise HTTPException(
+            status_code=422, detail="Dimensions can't be repeated")
+    return tuple(dimensions)
+
+
+def quarter_index(value):
+    """
+    Number the quarter of a period boundary, if the boundary starts a quarter.
+
+    Args:
+        value (datetime): The boundary.
+
+    Returns:
+        int: year * 4 + quarter - 1, or None if the boundary is inside a quarter.
+    """
+    if value.day != 1 or value.month % 3 != 1 or value.time() != datetime.min.time():
+        return None
+    return value.year * 4 + (value.month - 1) // 3
+
+
+def get_quarterly_hires(db, start, end):
+    start_quarter = quarter_index(start)
+    end_quarter = quarter_index(end)
+
+    if start_quarter is not None and end_quarter is not None:
+        # Whole quarters are served from the summary maintained by the ingest path
+        query = text(
+            """
                 SELECT
-                    he.department_id,
-                    he.job_id,
-                    CASE
-                        WHEN MONTH(he.`datetime`) BETWEEN '01' AND '03' THEN 1
-                        WHEN MONTH(he.`datetime`) BETWEEN '04' AND '06' THEN 2
-                        WHEN MONTH(he.`datetime`) BETWEEN '07' AND '09' THEN 3
-                        WHEN MONTH(he.`datetime`) BETWEEN '10' AND '12' THEN 4
-                        ELSE NULL
-                    END AS quartil
-                FROM hired_employees he
-                WHERE YEAR(he.`datetime`) = '2021'
-            )
-            SELECT
-                d.department,
-                j.job,
-                COUNT(CASE WHEN hwq.quartil = 1 THEN 1 END) AS Q1,
-                COUNT(CASE WHEN hwq.quartil = 2 THEN 1 END) AS Q2,
-                COUNT(CASE WHEN hwq.quartil = 3 THEN 1 END) AS Q3,
-                COUNT(CASE WHEN hwq.quartil = 4 THEN 1 END) AS Q4
-            FROM HiresWithQuartil hwq
-            LEFT JOIN departments d ON hwq.department_id = d.id
-            LEFT JOIN jobs j ON hwq.job_id = j.id
-            GROUP BY d.department, j.job
-            ORDER BY d.department ASC, j.job ASC;
-        """
-    )
+                    d.department,
+                    j.job,
+                    SUM(CASE WHEN qhs.quarter = 1 THEN qhs.hires ELSE 0 END) AS Q1,
+                    SUM(CASE WHEN qhs.quarter = 2 THEN qhs.hires ELSE 0 END) AS Q2,
+                    SUM(CASE WHEN qhs.quarter = 3 THEN qhs.hires ELSE 0 END) AS Q3,
+                    SUM(CASE WHEN qhs.quarter = 4 THEN qhs.hires ELSE 0 END) AS Q4
+                FROM quarterly_hires_summary qhs
+                LEFT JOIN departments d ON qhs.department_id = d.id
+                LEFT JOIN jobs j ON qhs.job_id = j.id
+                WHERE qhs.year BETWEEN :start_year AND :end_year
+                  AND qhs.year * 4 + qhs.quarter - 1 >= :start_quarter
+                  AND qhs.year * 4 + qhs.quarter - 1 < :end_quarter
+                GROUP BY d.department, j.job
+                HAVING SUM(qhs.hires) > 0
+                ORDER BY d.department ASC, j.job ASC;
+            """
+        )
+        params = {"start_year": start.year, "end_year": end.year,
+                  "start_quarter": start_quarter, "end_quarter": end_quarter}
+    else:
+        # Other periods are counted from the employees with the portable
+        # summary query, restricted to a range on datetime that can use the
+        # (datetime, department_id, job_id) index
+        table = HiredEmployee.__table__
+        hires = (
+            hires_scan(table)
+            .where(table.c.datetime >= start, table.c.datetime < end)
+            .subquery()
+        )
+        query = (
+            select(Department.department, Job.job, *(
+                func.sum(case((hires.c.quarter == quarter, hires.c.hires), else_=0)).label(f"Q{quarter}")
+                for quarter in range(1, 5)))
+            .select_from(hires)
+            .outerjoin(Department, hires.c.department_id == Department.id)
+            .outerjoin(Job, hires.c.job_id == Job.id)
+            .group_by(Department.department, Job.job)
+            .order_by(Department.department, Job.job)
+        )
+        params = {}
 
-    result = db.execute(query).fetchall()
+    result = db.execute(query, params).fetchall()
 
     return [
-        {"department": row[0], "job": row[1], "Q1": row[2],
-            "Q2": row[3], "Q3": row[4], "Q4": row[5]}
+        {"department": row[0], "job": row[1], "Q1": int(row[2]),
+            "Q2": int(row[3]), "Q3": int(row[4]), "Q4": int(row[5])}
         for row in result
     ]
 
 
-def get_departments_above_average(db):
+def get_departments_above_average(db, start, end):
     query = text(
         """
             WITH DepartmentHires AS (
-                SELECT 
+                SELECT
                     department_id,
                     COUNT(id) as num_hired
                 FROM hired_employees
-                WHERE YEAR(`datetime`) = "2021"
+                WHERE `datetime` >= :start AND `datetime` < :end
                 GROUP BY department_id
             ),
             AverageHires AS (
@@ -59,15 +155,141 @@ def get_departments_above_average(db):
             )
 
             SELECT d.id, d.department, dh.num_hired as hired
-            FROM departments d 
+            FROM departments d
             JOIN DepartmentHires dh ON d.id = dh.department_id
             JOIN AverageHires ah ON dh.num_hired > ah.avg_hired
             ORDER BY dh.num_hired DESC
         """
     )
 
-    result = db.execute(query).fetchall()
+    result = db.execute(query, {"start": start, "end": end}).fetchall()
 
     return [
         {"id": row[0], "department": row[1], "hired": row[2]} for row in result
     ]
+
+
+def period_of(day, granularity):
+    """
+    Get the cube period containing a day.
+
+    Args:
+        day (date): The day.
+        granularity (str): "year", "quarter", "month" or "week".
+
+    Returns:
+        tuple: The label of the period, like the SQL backend labels it, and
+        the first day of the next period.
+    """
+    if granularity == "week":
+        year, week, weekday = day.isocalendar()
+        return f"{year}-W{week:02d}", day + timedelta(days=8 - weekday)
+    if granularity == "year":
+        return str(day.year), date(day.year + 1, 1, 1)
+
+    months = 3 if granularity == "quarter" else 1
+    first_month = (day.month - 1) // months * months
+    next_month = day.year * 12 + first_month + months
+    label = (f"{day.year}-Q{first_month // 3 + 1}" if granularity == "quarter"
+             else f"{day.year}-{day.month:02d}")
+    return label, date(next_month // 12, next_month % 12 + 1, 1)
+
+
+def name_order(name):
+    """
+    Sort key of a dimension value: missing names first, like NULLs in
+    MySQL, then case-insensitive, like the default MySQL collation.
+
+    Args:
+        name (str): The name, None if unknown.
+
+    Returns:
+        tuple: The sort key.
+    """
+    if name is None:
+        return (0, "", "")
+    return (1, name.casefold(), name)
+
+
+def rollup(rows, key, counts, names):
+    """
+    Append the rows of a cube level and their subtotals, like WITH ROLLUP.
+
+    Args:
+        rows (list): The rows to append to.
+        key (dict): The labels of the outer levels.
+        counts (dict): The hires keyed by the labels of the remaining levels.
+        names (tuple): The names of the remaining levels.
+    """
+    groups = {}
+    for labels, hires in counts.items():
+        groups.setdefault(labels[0], {})[labels[1:]] = hires
+
+    for label in sorted(groups, key=name_order):
+        row_key = {**key, names[0]: label}
+        if len(names) > 1:
+            rollup(rows, row_key, groups[label], names[1:])
+        rows.append({**row_key, "hires": sum(groups[label].values())})
+
+
+def get_hires_cube(db, start, end, granularity="quarter", dimensions=CUBE_DIMENSIONS):
+    start_quarter = quarter_index(start)
+    end_quarter = quarter_index(end)
+
+    # Hires per finest period, department id and job id
+    if granularity in ("year", "quarter") and start_quarter is not None and end_quarter is not None:
+        # Years and quarters of whole-quarter periods come from the summary
+        summary = QuarterlyHiresSummary.__table__
+        index = summary.c.year * 4 + summary.c.quarter - 1
+        source = (
+            select(index.label("period"), summary.c.department_id, summary.c.job_id,
+                   func.sum(summary.c.hires).label("hires"))
+            .where(summary.c.year.between(start.year, end.year),
+                   index >= start_quarter, index < end_quarter)
+            .group_by(index, summary.c.department_id, summary.c.job_id)
+        )
+
+        def label(index):
+            return period_of(date(index // 4, index % 4 * 3 + 1, 1), granularity)[0]
+    else:
+        # Other granularities and periods come from the daily summary, a
+        # range on its leading day column
+        summary = DailyHiresSummary.__table__
+        source = (
+            select(summary.c.day.label("period"), summary.c.department_id,
+                   summary.c.job_id, summary.c.hires)
+            .where(summary.c.day >= start.date(), summary.c.day < end.date(),
+                   summary.c.hires > 0)
+        )
+
+        def label(day):
+            return period_of(day, granularity)[0]
+
+    # The names are joined to the aggregate, which is rolled up in memory,
+    # so every subtotal and the grand total come with the same read
+    source = source.subquery()
+    columns = [DIMENSION_COLUMNS[dimension] for dimension in dimensions]
+    query = (
+        select(source.c.period, *columns, func.sum(source.c.hires))
+        .select_from(source)
+        .outerjoin(Department, source.c.department_id == Department.id)
+        .outerjoin(Job, source.c.job_id == Job.id)
+        .group_by(source.c.period, *columns)
+    )
+
+    labels = {}
+    counts = {}
+    for period, *names, hires in db.execute(query):
+        if period not in labels:
+            labels[period] = label(period)
+        key = (labels[period], *names)
+        counts[key] = counts.get(key, 0) + int(hires)
+    counts = {key: hires for key, hires in counts.items() if hires}
+
+    # Rolled-up levels are left out of their rows, since a NULL department
+    # or job is an unknown one
+    rows = []
+    if counts:
+        rollup(rows, {}, counts, ("period", *dimensions))
+        rows.append({"hires": sum(counts.values())})
+    return rows
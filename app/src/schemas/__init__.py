@@ -1,6 +1,17 @@
+from pydantic import TypeAdapter
 from typing import List, Union
 from .department import DepartmentCreate
 from .job import JobCreate
 from .employee import HiredEmployeeCreate
 
 PostRequest = Union[dict, List[dict]]
+
+# Request body documentation for the endpoints parsing the body themselves
+POST_REQUEST_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": TypeAdapter(PostRequest).json_schema()}
+        },
+    }
+}
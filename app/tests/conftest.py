@@ -0,0 +1,73 @@
+"""
+Test settings: the API runs against a SQLite file through aiosqlite, the
+async stand-in of MySQL, in a temporary working folder.
+
+Run from the app folder:
+    python -m pytest tests
+"""
+# Library imports
+import asyncio
+from datetime import datetime
+import os
+import sys
+import tempfile
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK_DIR = tempfile.mkdtemp(prefix="api_tests")
+DATABASE_FILE = os.path.join(WORK_DIR, "test.db")
+
+# The engines are created on import, so the settings go first
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{DATABASE_FILE}",
+    ASYNC_DATABASE_URL=f"sqlite+aiosqlite:///{DATABASE_FILE}",
+    API_USER="test",
+    API_PASS="test",
+)
+sys.path.insert(0, APP_DIR)
+# Error logs and reject files are written to ./.data
+os.chdir(WORK_DIR)
+
+# Local imports
+from src.database import Base, async_engine, engine  # noqa: E402
+from src.models import Department, HiredEmployee, Job  # noqa: E402
+
+AUTH = ("test", "test")
+
+
+@pytest.fixture
+def tables():
+    """
+    Create empty tables, with the departments and jobs referenced by the
+    test hires.
+    """
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(Department.__table__.insert(), [
+            {"id": id, "department": f"Department {id}"} for id in range(1, 13)])
+        connection.execute(Job.__table__.insert(), [
+            {"id": id, "job": f"Job {id}"} for id in range(1, 184)])
+    yield
+    # Every test runs its own event loop, the async pool can't outlive it
+    asyncio.run(async_engine.dispose())
+
+
+@pytest.fixture
+def add_hires(tables):
+    """
+    Insert hires straight into the table, like another process would,
+    without the ingest path and its summary and snapshot updates.
+
+    Every hire is an id, or a dictionary of columns with the id. The other
+    columns default to a hire in department 1 and job 1 on 2021-02-01.
+    """
+    def add(*hires):
+        rows = [hire if isinstance(hire, dict) else {"id": hire} for hire in hires]
+        with engine.begin() as connection:
+            connection.execute(HiredEmployee.__table__.insert(), [
+                {"name": f"Employee {row['id']}", "datetime": datetime(2021, 2, 1),
+                 "department_id": 1, "job_id": 1, **row}
+                for row in rows])
+    return add
@@ -0,0 +1,93 @@
+# Library imports
+from sqlalchemy import func, select
+import asyncio
+
+import httpx
+
+# Local imports
+from src.database import AsyncSessionLocal, SessionLocal, async_engine
+from src.main import app
+from src.models import HiredEmployee
+from src.api.api_utils import async_batch_create
+from conftest import AUTH
+
+PRODUCERS = 8
+BATCH_SIZE = 250
+
+
+def hires(producer):
+    """
+    Build the batch of a producer, with ids of its own.
+    """
+    first = producer * BATCH_SIZE + 1
+    return [
+        {"id": id, "name": f"Employee {id}", "datetime": "2021-03-01 10:00:00",
+         "department_id": id % 12 + 1, "job_id": id % 183 + 1}
+        for id in range(first, first + BATCH_SIZE)
+    ]
+
+
+def count_hires():
+    with SessionLocal() as db:
+        return db.execute(select(func.count()).select_from(HiredEmployee)).scalar()
+
+
+def test_concurrent_batch_create(tables):
+    async def produce(producer):
+        async with AsyncSessionLocal() as db:
+            return await async_batch_create(db, HiredEmployee, hires(producer), return_ids=True)
+
+    async def main():
+        try:
+            return await asyncio.gather(*(produce(producer) for producer in range(PRODUCERS)))
+        finally:
+            await async_engine.dispose()
+
+    results = asyncio.run(main())
+
+    for producer, (ids, failed) in enumerate(results):
+        assert failed == []
+        assert ids == [record["id"] for record in hires(producer)]
+    assert count_hires() == PRODUCERS * BATCH_SIZE
+
+
+def test_concurrent_batch_create_reports_failures(tables):
+    batch = hires(0)
+    batch[10]["department_id"] = 999
+    batch[20]["datetime"] = "not a date"
+
+    async def main():
+        try:
+            async with AsyncSessionLocal() as first, AsyncSessionLocal() as second:
+                return await asyncio.gather(
+                    async_batch_create(first, HiredEmployee, batch),
+                    async_batch_create(second, HiredEmployee, hires(1)))
+        finally:
+            await async_engine.dispose()
+
+    (inserted, failed), (other, other_failed) = asyncio.run(main())
+
+    assert len(inserted) == BATCH_SIZE - 2
+    assert [record["record"]["id"] for record in failed] == [11, 21]
+    assert len(other) == BATCH_SIZE and other_failed == []
+    assert count_hires() == 2 * BATCH_SIZE - 2
+
+
+def test_concurrent_requests(tables):
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", auth=AUTH) as client:
+                return await asyncio.gather(*(
+                    client.post("/employees/?response=summary", json=hires(producer))
+                    for producer in range(PRODUCERS)))
+        finally:
+            await async_engine.dispose()
+
+    responses = asyncio.run(main())
+
+    for response in responses:
+        assert response.status_code == 200
+        assert response.json()["inserted"] == BATCH_SIZE
+        assert response.json()["failed"] is None
+    assert count_hires() == PRODUCERS * BATCH_SIZE
@@ -0,0 +1,99 @@
+# Library imports
+from datetime import datetime
+import io
+import time
+
+import fastavro
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+# Local imports
+from conftest import AUTH
+from src.database import engine
+from src.avro import avro_utils
+from src.main import app
+from src.models import HiredEmployee
+
+
+def test_backup_is_restored(add_hires):
+    add_hires(*range(1, 11))
+
+    with TestClient(app) as client:
+        client.auth = AUTH
+        backup = client.get("/avro/backup/employees", params={"codec": "deflate"})
+        assert backup.status_code == 200
+
+        with engine.begin() as connection:
+            connection.execute(HiredEmployee.__table__.delete().where(HiredEmployee.id > 5))
+
+        response = client.post("/avro/restore/employees",
+                               files={"file": ("employees.avro", backup.content)})
+
+    assert response.status_code == 200, response.text
+    with engine.connect() as connection:
+        assert connection.execute(select(func.count(HiredEmployee.id))).scalar() == 10
+
+
+def test_datetimes_survive_a_round_trip_on_a_non_utc_host(add_hires, monkeypatch):
+    hired_at = [datetime(2021, 1, 1, 12, 0, 0), datetime(2021, 7, 1, 23, 30, 15), datetime(2021, 12, 31, 0, 0, 1)]
+    add_hires(*({"id": id, "datetime": value} for id, value in enumerate(hired_at, start=1)))
+    monkeypatch.setenv("TZ", "America/Bogota")
+    time.tzset()
+
+    try:
+        with TestClient(app) as client:
+            client.auth = AUTH
+            backup = client.get("/avro/backup/employees")
+            response = client.post("/avro/restore/employees",
+                                   files={"file": ("employees.avro", backup.content)})
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+    assert response.status_code == 200, response.text
+    with engine.connect() as connection:
+        restored = connection.execute(
+            select(HiredEmployee.datetime).order_by(HiredEmployee.id)).scalars().all()
+    assert restored == hired_at
+
+
+def test_restore_is_inserted_in_batches(add_hires, monkeypatch):
+    add_hires(*range(1, 11))
+    batches = []
+    insert_records = avro_utils.insert_records
+
+    def record_batch(db, model, rows, ids=None):
+        batches.append(len(rows))
+        return insert_records(db, model, rows, ids)
+
+    monkeypatch.setattr(avro_utils, "BULK_INSERT_BATCH_SIZE", 4)
+    monkeypatch.setattr(avro_utils, "insert_records", record_batch)
+
+    with TestClient(app) as client:
+        client.auth = AUTH
+        backup = client.get("/avro/backup/employees")
+        response = client.post("/avro/restore/employees",
+                               files={"file": ("employees.avro", backup.content)})
+
+    assert response.status_code == 200, response.text
+    assert batches == [4, 4, 2]
+    with engine.connect() as connection:
+        assert connection.execute(select(func.count(HiredEmployee.id))).scalar() == 10
+
+
+def test_missing_columns_are_read_from_the_schema(add_hires):
+    add_hires(1)
+    schema = {"type": "record", "name": "hired_employees",
+              "fields": [{"name": "id", "type": "long"}, {"name": "name", "type": "string"}]}
+    content = io.BytesIO()
+    fastavro.writer(content, schema, [{"id": 2, "name": "Employee 2"}])
+
+    with TestClient(app) as client:
+        client.auth = AUTH
+        response = client.post("/avro/restore/employees",
+                               files={"file": ("employees.avro", content.getvalue())})
+
+    assert response.status_code == 400
+    assert "datetime" in response.json()["detail"]
+    with engine.connect() as connection:
+        assert connection.execute(select(func.count(HiredEmployee.id))).scalar() == 1
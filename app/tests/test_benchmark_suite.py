@@ -0,0 +1,37 @@
+# Library imports
+from types import SimpleNamespace
+
+import pytest
+
+# Local imports
+from benchmarks import suite
+from src.avro.avro_utils import codec_available, AVRO_CODECS
+
+ROWS = 50
+
+
+@pytest.mark.parametrize("codec", AVRO_CODECS)
+def test_backup_and_restore_steps_report_throughput(add_hires, tmp_path, codec):
+    if not codec_available(codec):
+        pytest.skip(f"{codec} isn't installed")
+    add_hires(*range(1, ROWS + 1))
+
+    benchmark = suite.Benchmark(ROWS, seed=0)
+    backup_result = benchmark.run(f"avro_backup_{codec}", lambda: suite.backup(tmp_path, codec), rows=ROWS)
+    restore_result = benchmark.run(
+        f"avro_restore_{codec}", lambda: suite.restore(backup_result["file"]), rows=ROWS)
+
+    assert "rows_per_second" in backup_result, backup_result
+    assert "rows_per_second" in restore_result, restore_result
+    assert restore_result["failed"] == 0
+
+
+def test_every_step_runs_on_sqlite(tables, monkeypatch):
+    monkeypatch.setattr(suite.columnar, "hires_snapshot", suite.columnar.HiresSnapshot())
+    args = SimpleNamespace(rows=500, seed=0, migration_rows=0, repeat=1,
+                           codecs=["null", "deflate"], sync_interval=None, reset=True)
+
+    steps = suite.run_suite(args).results["steps"]
+
+    assert {name: step["error"] for name, step in steps.items() if "error" in step} == {}
+    assert "report_hires_cube_week_sql" in steps and "avro_restore_deflate" in steps
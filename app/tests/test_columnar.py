@@ -0,0 +1,66 @@
+# Library imports
+from datetime import datetime
+
+from sqlalchemy import update
+
+# Local imports
+from src.api import api_utils
+from src.database import SessionLocal, engine
+from src.models import HiredEmployee
+from src.reports import columnar
+
+START, END = datetime(2021, 1, 1), datetime(2022, 1, 1)
+
+
+def hired(db):
+    return {row["department"]: row["Q1"] for row in columnar.get_quarterly_hires(db, START, END)}
+
+
+def test_writes_of_other_processes_are_read(add_hires, monkeypatch):
+    monkeypatch.setattr(columnar, "hires_snapshot", columnar.HiresSnapshot())
+    add_hires(1, 2)
+
+    with SessionLocal() as db:
+        assert hired(db) == {"Department 1": 2}
+
+        # Appended rows are read past the watermark
+        add_hires(3)
+        assert hired(db) == {"Department 1": 3}
+
+        # Deleted rows lower the highest id and reload the snapshot
+        with engine.begin() as connection:
+            connection.execute(HiredEmployee.__table__.delete().where(HiredEmployee.id == 3))
+        assert hired(db) == {"Department 1": 2}
+
+
+def test_other_changes_are_read_after_the_ttl(add_hires, monkeypatch):
+    snapshot = columnar.HiresSnapshot(ttl=60)
+    monkeypatch.setattr(columnar, "hires_snapshot", snapshot)
+    add_hires(1, 2)
+
+    with SessionLocal() as db:
+        assert hired(db) == {"Department 1": 2}
+
+        with engine.begin() as connection:
+            connection.execute(update(HiredEmployee).where(HiredEmployee.id == 1).values(department_id=2))
+        assert hired(db) == {"Department 1": 2}
+
+        snapshot.loaded_at -= 61
+        assert hired(db) == {"Department 1": 1, "Department 2": 1}
+
+
+def test_unreported_generated_ids_are_read_past_the_watermark(add_hires, monkeypatch):
+    snapshot = columnar.HiresSnapshot()
+    monkeypatch.setattr(columnar, "hires_snapshot", snapshot)
+    # With innodb_autoinc_lock_mode=2 the generated ids are unknown
+    monkeypatch.setattr(api_utils, "consecutive_ids", lambda: False)
+    add_hires(1, 2)
+
+    with SessionLocal() as db:
+        assert hired(db) == {"Department 1": 2}
+
+        record = {"name": "New", "datetime": "2021-02-01 00:00:00", "department_id": 1, "job_id": 1}
+        errors, _ = api_utils.ingest_records(db, HiredEmployee, [record])
+        assert not errors
+        assert snapshot.stale and not snapshot.full_reload
+        assert hired(db) == {"Department 1": 3}
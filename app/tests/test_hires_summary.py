@@ -0,0 +1,55 @@
+# Library imports
+from collections import Counter
+from datetime import date
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select
+
+# Local imports
+from conftest import AUTH
+from src.database import SessionLocal, engine
+from src.main import app
+from src.models import DailyHiresSummary, QuarterlyHiresSummary
+from src.reports.hires_summary import apply_hires_delta, check_hires_summary
+
+
+def test_delta_is_upserted_in_key_order(tables):
+    delta = Counter({(2021, 4, 2, 1): 1, (2021, 1, 9, 3): 2, (2021, 1, 2, 7): 1})
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "quarterly_hires_summary" in statement:
+            statements.append(parameters)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        with SessionLocal() as db:
+            apply_hires_delta(db, delta)
+            db.commit()
+            rows = db.execute(select(QuarterlyHiresSummary.year, QuarterlyHiresSummary.quarter,
+                                     QuarterlyHiresSummary.department_id,
+                                     QuarterlyHiresSummary.job_id)).all()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    # Concurrent writers lock the rows in the same order
+    keys = [tuple(statements[0][i:i + 4]) for i in range(0, len(statements[0]), 5)]
+    assert keys == sorted(delta)
+    assert sorted(rows) == sorted(delta)
+
+
+def test_ingest_keeps_both_summaries_in_step(tables):
+    hires = [{"id": id, "name": f"Employee {id}", "datetime": f"2021-0{id % 3 + 1}-0{id % 5 + 1} 10:00:00",
+              "department_id": id % 4 + 1, "job_id": 1} for id in range(1, 21)]
+    moved = [{**hire, "datetime": "2021-08-15 10:00:00", "department_id": 9} for hire in hires[:5]]
+
+    with TestClient(app) as client:
+        client.auth = AUTH
+        assert client.post("/employees/", json=hires).status_code == 200
+        assert client.post("/employees/?mode=upsert", json=moved).status_code == 200
+
+    with SessionLocal() as db:
+        assert check_hires_summary(db) == []
+        daily = db.execute(select(DailyHiresSummary.hires).where(
+            DailyHiresSummary.day == date(2021, 8, 15), DailyHiresSummary.department_id == 9)).scalar()
+    assert daily == 5
@@ -0,0 +1,53 @@
+# Library imports
+from fastapi.testclient import TestClient
+
+# Local imports
+from src.main import app
+from src.api import idempotency
+from conftest import AUTH
+
+client = TestClient(app)
+
+DEPARTMENTS = [{"id": 100, "department": "Research"}]
+
+
+def post(url="/departments/", key="batch-1", body=DEPARTMENTS):
+    return client.post(url, json=body, headers={"Idempotency-Key": key}, auth=AUTH)
+
+
+def test_replay_returns_the_stored_response(tables):
+    first = post()
+    replay = post()
+
+    assert first.status_code == replay.status_code == 200
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json() == first.json()
+
+
+def test_replay_with_other_options_is_rejected(tables):
+    assert post("/departments/?response=summary", key="batch-2").status_code == 200
+
+    response = post("/departments/?response=full", key="batch-2")
+
+    assert response.status_code == 422
+    assert "options" in response.json()["detail"]
+
+
+def test_key_length_is_capped(tables):
+    response = post(key="k" * (idempotency.MAX_IDEMPOTENCY_KEY_LENGTH + 1))
+
+    assert response.status_code == 422
+
+
+def test_persist_failure_keeps_the_response(tables, monkeypatch):
+    def fail(db, key, digest, response):
+        raise RuntimeError("Data too long for column 'response'")
+
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_PERSIST", True)
+    monkeypatch.setattr(idempotency, "save_persisted", fail)
+
+    response = post(key="batch-3")
+
+    assert response.status_code == 200
+    assert response.json()["success"] == DEPARTMENTS
+    assert post(key="batch-3").headers["Idempotent-Replayed"] == "true"
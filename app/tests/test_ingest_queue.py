@@ -0,0 +1,95 @@
+# Library imports
+import time
+
+import pytest
+
+# Local imports
+from src.models import Department, HiredEmployee
+from src.api import api_utils, ingest_queue as queue_module
+from src.api.ingest_queue import IngestJob, IngestQueue
+
+
+def run_jobs(*jobs):
+    """
+    Queue jobs on a single worker before it starts, so they are coalesced,
+    and wait for them.
+    """
+    queue = IngestQueue(workers=1)
+    for job in jobs:
+        queue.jobs[job.id] = job
+        queue.queue.put(job)
+    queue.start()
+
+    deadline = time.monotonic() + 10
+    while any(job.status in ("queued", "running") for job in jobs):
+        assert time.monotonic() < deadline, "the jobs didn't finish"
+        time.sleep(0.01)
+    return queue
+
+
+def hire(id, department_id=1):
+    return {"id": id, "name": f"Employee {id}", "datetime": "2021-03-01 10:00:00",
+            "department_id": department_id, "job_id": 1}
+
+
+def test_referenced_tables_are_processed_first(tables):
+    hires = IngestJob(HiredEmployee, [hire(1, department_id=50)])
+    departments = IngestJob(Department, [{"id": 50, "department": "New"}])
+
+    run_jobs(hires, departments)
+
+    assert departments.to_dict()["inserted"] == 1
+    assert hires.to_dict()["status"] == "done"
+    assert hires.to_dict()["inserted"] == 1
+
+
+def test_worker_survives_unexpected_errors(tables, monkeypatch):
+    def fail(group):
+        raise RuntimeError("unexpected")
+
+    broken = IngestJob(Department, [{"id": 60, "department": "Broken"}])
+    monkeypatch.setattr(queue_module, "table_order", fail)
+    queue = run_jobs(broken)
+    monkeypatch.undo()
+
+    assert broken.to_dict()["status"] == "failed"
+    assert broken.to_dict()["error"] == "unexpected"
+
+    # The same worker keeps serving jobs
+    later = IngestJob(Department, [{"id": 61, "department": "Later"}])
+    queue.jobs[later.id] = later
+    queue.queue.put(later)
+    deadline = time.monotonic() + 10
+    while later.status in ("queued", "running"):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert later.to_dict()["status"] == "done"
+
+
+@pytest.mark.parametrize("mode", ["insert", "upsert"])
+def test_committed_jobs_are_done_when_a_later_batch_fails(tables, monkeypatch, mode):
+    insert_batch = api_utils._insert_batch
+    upsert_batch = api_utils._upsert_batch
+    calls = []
+
+    def fail_second(original):
+        def batch(*args):
+            calls.append(1)
+            if len(calls) > 1:
+                raise RuntimeError("connection lost")
+            return original(*args)
+        return batch
+
+    monkeypatch.setattr(api_utils, "BULK_INSERT_BATCH_SIZE", 2)
+    monkeypatch.setattr(api_utils, "_insert_batch", fail_second(insert_batch))
+    monkeypatch.setattr(api_utils, "_upsert_batch", fail_second(upsert_batch))
+
+    first = IngestJob(HiredEmployee, [hire(1), hire(2)], mode=mode)
+    second = IngestJob(HiredEmployee, [hire(3), hire(4)], mode=mode)
+    run_jobs(first, second)
+
+    assert first.to_dict()["status"] == "done"
+    assert first.to_dict()["inserted"] == 2
+    assert second.to_dict()["status"] == "failed"
+    assert second.to_dict()["inserted"] == 0
+    assert second.to_dict()["error"] == "connection lost"
@@ -0,0 +1,72 @@
+# Library imports
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Local imports
+from conftest import AUTH
+from src.main import app
+
+
+def walk(path, limit, **params):
+    """
+    Read every page of a listing, following next_after to the last page.
+    """
+    client = TestClient(app)
+    client.auth = AUTH
+
+    pages = []
+    after = None
+    while True:
+        query = {**params, "limit": limit}
+        if after is not None:
+            query["after"] = after
+        response = client.get(path, params=query)
+        assert response.status_code == 200
+        page = response.json()
+        pages.append([row["id"] for row in page["data"]])
+        after = page["next_after"]
+        if after is None:
+            return pages
+        assert after == pages[-1][-1]
+        assert len(pages) < 100, "next_after doesn't advance"
+
+
+@pytest.mark.parametrize("path, last_id", [("/departments/", 12), ("/jobs/", 183)])
+def test_lookup_tables_are_walked_to_the_last_page(tables, path, last_id):
+    pages = walk(path, limit=5)
+
+    assert [id for page in pages for id in page] == list(range(1, last_id + 1))
+    assert all(len(page) == 5 for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= 5
+
+
+def test_a_full_last_page_ends_the_walk(tables):
+    assert walk("/departments/", limit=6) == [[1, 2, 3, 4, 5, 6], [7, 8, 9, 10, 11, 12]]
+
+
+def test_employees_are_filtered_on_every_page(add_hires):
+    # Three departments, two jobs and one hire a day from January 1st
+    add_hires(*(
+        {"id": id, "datetime": datetime(2021, 1, id), "department_id": id % 3 + 1, "job_id": id % 2 + 1}
+        for id in range(1, 31)
+    ))
+
+    all_ids = [id for page in walk("/employees/", limit=7) for id in page]
+    assert all_ids == list(range(1, 31))
+
+    pages = walk("/employees/", limit=3, department_id=2)
+    assert [id for page in pages for id in page] == [id for id in range(1, 31) if id % 3 == 1]
+    assert len(pages) == 4
+
+    pages = walk("/employees/", limit=4, department_id=2, job_id=1)
+    assert [id for page in pages for id in page] == [id for id in range(1, 31) if id % 3 == 1 and id % 2 == 0]
+
+    # The upper bound is exclusive: the hire of January 20th is left out
+    pages = walk("/employees/", limit=4, **{"from": "2021-01-05T00:00:00", "to": "2021-01-20T00:00:00"})
+    assert [id for page in pages for id in page] == list(range(5, 20))
+    assert len(pages) == 4
+
+    pages = walk("/employees/", limit=2, job_id=2, **{"from": "2021-01-05T00:00:00", "to": "2021-01-20T00:00:00"})
+    assert [id for page in pages for id in page] == [id for id in range(5, 20) if id % 2 == 1]
@@ -0,0 +1,45 @@
+# Library imports
+from fastapi.testclient import TestClient
+
+import pytest
+
+# Local imports
+from src.main import app
+from conftest import AUTH
+
+client = TestClient(app)
+
+
+def post(body):
+    return client.post("/departments/", content=body,
+                       headers={"content-type": "application/json"}, auth=AUTH)
+
+
+@pytest.mark.parametrize("body", ["5", '"text"', "null", "true"])
+def test_scalar_body_is_rejected(tables, body):
+    response = post(body)
+
+    assert response.status_code == 422
+    assert {error["field"] for error in response.json()["errors"]} == {
+        "body.dict[any,any]", "body.list[dict[any,any]]"}
+
+
+def test_non_object_items_are_rejected(tables):
+    response = post('[{"department": "Research"}, 3, ["Sales"]]')
+
+    assert response.status_code == 422
+    fields = [error["field"] for error in response.json()["errors"]]
+    assert "body.list[dict[any,any]].1" in fields
+    assert "body.list[dict[any,any]].2" in fields
+
+
+def test_invalid_json_is_rejected(tables):
+    response = post("[{")
+
+    assert response.status_code == 422
+    assert response.json()["errors"][0]["field"] == "body"
+
+
+def test_register_and_list_are_accepted(tables):
+    assert post('{"department": "Research"}').status_code == 200
+    assert post('[{"department": "Sales"}]').status_code == 200
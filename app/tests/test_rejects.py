@@ -0,0 +1,44 @@
+# Library imports
+from fastapi.testclient import TestClient
+import os
+import time
+
+# Local imports
+from src.main import app
+from src.api import api_utils
+from conftest import AUTH
+
+client = TestClient(app)
+
+
+def stream_with_rejects():
+    body = "\n".join([
+        '{"id": 1, "name": "Ana", "datetime": "2021-03-01 10:00:00", "department_id": 1, "job_id": 1}',
+        '{"id": 2, "name": "Bob", "datetime": "yesterday", "department_id": 1, "job_id": 1}',
+        'not json',
+    ])
+    response = client.post("/employees/stream", content=body, auth=AUTH)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_reject_file_is_deleted_after_download(tables):
+    summary = stream_with_rejects()
+    assert (summary["inserted"], summary["failed"]) == (1, 2)
+
+    response = client.get(f"/rejects/{summary['rejects']}", auth=AUTH)
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 2
+
+    assert client.get(f"/rejects/{summary['rejects']}", auth=AUTH).status_code == 404
+
+
+def test_old_reject_files_are_pruned(tables):
+    summary = stream_with_rejects()
+    path = os.path.join(api_utils.REJECTS_DIR, f"{summary['rejects']}.ndjson")
+    expired = time.time() - api_utils.REJECTS_RETENTION - 1
+    os.utime(path, (expired, expired))
+
+    api_utils.prune_rejects()
+
+    assert not os.path.exists(path)
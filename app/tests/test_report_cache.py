@@ -0,0 +1,72 @@
+# Library imports
+from fastapi.testclient import TestClient
+
+# Local imports
+from conftest import AUTH
+from src.main import app
+from src.reports import endpoints
+from src.reports.report_cache import invalidate_reports
+
+REPORT = "/report/quarterly_hires"
+PARAMS = {"year": 2021}
+
+
+def hire(id, department_id=1):
+    return {"id": id, "name": f"Employee {id}", "datetime": "2021-05-01 00:00:00",
+            "department_id": department_id, "job_id": 1}
+
+
+def q2(response):
+    return {row["department"]: row["Q2"] for row in response.json()["data"]}
+
+
+def test_unchanged_reports_answer_304(tables, monkeypatch):
+    client = TestClient(app)
+    client.auth = AUTH
+    assert client.post("/employees/", json=[hire(1)]).status_code == 200
+
+    builds = []
+    run_report = endpoints.run_report
+    monkeypatch.setattr(endpoints, "run_report", lambda *args: builds.append(args) or run_report(*args))
+
+    first = client.get(REPORT, params=PARAMS)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    cached = client.get(REPORT, params=PARAMS, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.content == b""
+
+    for header in (f'"other", {etag}', "*"):
+        assert client.get(REPORT, params=PARAMS, headers={"If-None-Match": header}).status_code == 304
+    assert len(builds) == 1
+
+    # Another tag, or other parameters, get the report
+    assert client.get(REPORT, params=PARAMS, headers={"If-None-Match": '"other"'}).status_code == 200
+    other_year = client.get(REPORT, params={"year": 2022}, headers={"If-None-Match": etag})
+    assert other_year.status_code == 200
+    assert other_year.headers["ETag"] != etag
+
+
+def test_ingest_and_upsert_invalidate_the_cached_reports(tables):
+    invalidate_reports()
+    client = TestClient(app)
+    client.auth = AUTH
+
+    first = client.get(REPORT, params=PARAMS)
+    assert q2(first) == {}
+    assert client.get(REPORT, params=PARAMS, headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    # An ingest drops the cached report
+    assert client.post("/employees/", json=[hire(3)]).status_code == 200
+    ingested = client.get(REPORT, params=PARAMS, headers={"If-None-Match": first.headers["ETag"]})
+    assert ingested.status_code == 200
+    assert q2(ingested) == {"Department 1": 1}
+
+    # So does an upsert, moving the hire to another department
+    assert client.post("/employees/?mode=upsert", json=[hire(3, department_id=2)]).status_code == 200
+    upserted = client.get(REPORT, params=PARAMS, headers={"If-None-Match": ingested.headers["ETag"]})
+    assert upserted.status_code == 200
+    assert q2(upserted) == {"Department 2": 1}
@@ -0,0 +1,112 @@
+# Library imports
+from datetime import date, datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+# Local imports
+from conftest import AUTH
+from src.database import SessionLocal, engine
+from src.main import app
+from src.reports import columnar, reports_utils
+from src.reports.hires_summary import rebuild_hires_summary
+from src.reports.reports_utils import get_departments_above_average, get_quarterly_hires, get_report_period
+
+INDEX = "ix_hired_employees_datetime_department_job"
+
+
+def dated(*dates):
+    return [{"id": id, "datetime": value} for id, value in enumerate(dates, start=1)]
+
+
+def query_plans(report, start, end):
+    """
+    Run a report and explain every query it sent to hired_employees.
+    """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "hired_employees" in statement and not statement.startswith("EXPLAIN"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        with SessionLocal() as db:
+            rows = report(db, start, end)
+            connection = db.connection().connection.driver_connection
+            plans = [
+                " ".join(str(step[-1]) for step in connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters))
+                for statement, parameters in statements
+            ]
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert plans, "the report didn't read hired_employees"
+    return rows, plans
+
+
+def test_partial_quarters_are_a_range_scan(add_hires):
+    add_hires(*dated(datetime(2021, 2, 14), datetime(2021, 5, 2), datetime(2021, 5, 20), datetime(2022, 1, 1)))
+
+    rows, plans = query_plans(get_quarterly_hires, datetime(2021, 2, 1), datetime(2021, 5, 15))
+
+    assert rows == [{"department": "Department 1", "job": "Job 1", "Q1": 1, "Q2": 1, "Q3": 0, "Q4": 0}]
+    for plan in plans:
+        assert "SEARCH" in plan and INDEX in plan and "datetime>? AND datetime<?" in plan, plan
+
+
+def test_departments_above_average_is_a_range_scan(add_hires):
+    add_hires(*dated(datetime(2021, 2, 14)))
+
+    _, plans = query_plans(get_departments_above_average, datetime(2021, 1, 1), datetime(2022, 1, 1))
+
+    for plan in plans:
+        assert "SEARCH" in plan and INDEX in plan and "datetime>? AND datetime<?" in plan, plan
+
+
+def test_period_without_end_in_the_calendar_is_rejected(tables):
+    with TestClient(app) as client:
+        client.auth = AUTH
+        response = client.get("/report/quarterly_hires", params={"from": "9999-03-01"})
+
+    assert response.status_code == 422
+    assert "'to' is required" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("granularity", ["year", "quarter", "month", "week"])
+@pytest.mark.parametrize("dimensions", [("department", "job"), ("job", "department"), ("department",), ()])
+def test_sql_cube_matches_the_columnar_cube(add_hires, monkeypatch, granularity, dimensions):
+    monkeypatch.setattr(columnar, "hires_snapshot", columnar.HiresSnapshot())
+    hires = [datetime(2021, 1, 1), datetime(2021, 3, 31, 23), datetime(2021, 5, 2),
+             datetime(2021, 12, 31), datetime(2022, 2, 1)]
+    add_hires(*({"id": id, "datetime": value, "department_id": id % 3 + 1, "job_id": id % 2 + 1}
+                for id, value in enumerate(hires, start=1)))
+
+    with SessionLocal() as db:
+        rebuild_hires_summary(db)
+
+        for period in (get_report_period(2021), get_report_period(start=date(2021, 2, 15), end=date(2022, 3, 1))):
+            expected = columnar.get_hires_cube(db, *period, granularity, dimensions)
+            assert reports_utils.get_hires_cube(db, *period, granularity, dimensions) == expected
+            assert expected[-1] == {"hires": sum(period[0] <= value < period[1] for value in hires)}
+
+
+@pytest.mark.parametrize("granularity", ["year", "quarter", "month", "week"])
+def test_sql_cube_reads_the_summaries_only(add_hires, granularity):
+    add_hires(*dated(datetime(2021, 2, 14), datetime(2021, 5, 2)))
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with SessionLocal() as db:
+        rebuild_hires_summary(db)
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            for period in (get_report_period(2021), get_report_period(start=date(2021, 2, 10), end=date(2021, 5, 3))):
+                assert reports_utils.get_hires_cube(db, *period, granularity)[-1] == {"hires": 2}
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+    assert statements and not any("hired_employees" in statement for statement in statements)
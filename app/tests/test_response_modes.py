@@ -0,0 +1,30 @@
+# Library imports
+from fastapi.testclient import TestClient
+
+# Local imports
+from src.main import app
+from src.api import api_utils
+from conftest import AUTH
+
+client = TestClient(app)
+
+
+def test_ids_of_generated_keys(tables):
+    response = client.post("/departments/?response=ids",
+                           json=[{"department": "Research"}, {"department": "Sales"}], auth=AUTH)
+
+    assert response.status_code == 200
+    assert response.json()["ids"] == [13, 14]
+
+
+def test_ids_refused_without_consecutive_keys(tables, monkeypatch):
+    monkeypatch.setattr(api_utils, "consecutive_ids", lambda: False)
+
+    insert = client.post("/departments/?response=ids",
+                         json=[{"department": "Research"}], auth=AUTH)
+    upsert = client.post("/departments/?response=ids&mode=upsert",
+                         json=[{"id": 1, "department": "Research"}], auth=AUTH)
+
+    assert insert.status_code == 422
+    assert upsert.status_code == 200
+    assert upsert.json()["ids"] == [1]
@@ -0,0 +1,50 @@
+# Library imports
+from fastapi.testclient import TestClient
+
+# Local imports
+from conftest import AUTH
+from src.database import SessionLocal
+from src.main import app
+from src.models import Department, HiredEmployee
+
+
+def test_upsert_counts_every_outcome(add_hires):
+    add_hires(1, 2)
+    client = TestClient(app)
+    client.auth = AUTH
+
+    response = client.post("/employees/?mode=upsert&response=summary", json=[
+        # Unchanged, the same values as stored
+        {"id": 1, "name": "Employee 1", "datetime": "2021-02-01 00:00:00", "department_id": 1, "job_id": 1},
+        # Updated
+        {"id": 2, "name": "Employee 2", "datetime": "2021-02-01 00:00:00", "department_id": 3, "job_id": 1},
+        # Inserted
+        {"id": 10, "name": "Employee 10", "datetime": "2021-05-01 00:00:00", "department_id": 1, "job_id": 2},
+        # Failed, not counted: without a key or invalid
+        {"name": "Keyless", "datetime": "2021-05-01 00:00:00", "department_id": 1, "job_id": 2},
+        {"id": 11, "name": "Employee 11", "datetime": "not a date", "department_id": 1, "job_id": 1},
+    ])
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["inserted"], body["updated"], body["unchanged"]) == (1, 1, 1)
+    assert [failure["record"].get("id") for failure in body["failed"]] == [None, 11]
+    assert body["message"] == "3 employee(s) upserted successfully"
+
+    with SessionLocal() as db:
+        assert db.get(HiredEmployee, 2).department_id == 3
+        assert db.get(HiredEmployee, 10) is not None
+        assert db.get(HiredEmployee, 11) is None
+
+    again = client.post("/departments/?mode=upsert&response=summary", json=[
+        {"id": 1, "department": "Department 1"}, {"id": 2, "department": "Renamed"}])
+    assert again.status_code == 200
+    assert (again.json()["inserted"], again.json()["updated"], again.json()["unchanged"]) == (0, 1, 1)
+
+    # Upserting the same records again changes nothing
+    repeated = client.post("/departments/?mode=upsert&response=summary", json=[
+        {"id": 1, "department": "Department 1"}, {"id": 2, "department": "Renamed"}])
+    assert (repeated.json()["inserted"], repeated.json()["updated"], repeated.json()["unchanged"]) == (0, 0, 2)
+
+    with SessionLocal() as db:
+        assert db.get(Department, 2).department == "Renamed"
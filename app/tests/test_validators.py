@@ -0,0 +1,73 @@
+# Library imports
+from datetime import datetime
+
+# Local imports
+from src.api.validators import COLUMNAR_MIN_ROWS, ModelValidator
+from src.models import HiredEmployee
+
+VALID = {"id": "1", "name": "Employee", "datetime": "2021-02-01 10:00:00", "department_id": 1, "job_id": "2"}
+
+# Each case is the valid record with some fields replaced (None drops the
+# field), or the record itself when it isn't a dict
+CASES = [
+    {},
+    {"id": 7, "extra": "ignored"},
+    {"datetime": datetime(2021, 2, 1, 10)},
+    {"id": None},
+    # Not a dict
+    ["1", "Employee"],
+    None,
+    "record",
+    # Missing required fields
+    {"name": None},
+    {"department_id": None},
+    {"name": None, "datetime": None, "job_id": None},
+    # Bad ints
+    {"id": "-1"},
+    {"id": "1a"},
+    {"department_id": ""},
+    {"job_id": " 2"},
+    {"job_id": "²"},
+    {"job_id": "١٢"},
+    {"department_id": True},
+    # Oversized ints
+    {"id": "9" * 19},
+    {"id": "1" * 30},
+    {"job_id": 10 ** 20},
+    # Ints as floats
+    {"department_id": 1.0},
+    {"job_id": 2.5},
+    {"id": "1.0"},
+    # Malformed datetimes
+    {"datetime": "2021-02-30 10:00:00"},
+    {"datetime": "2021-13-01 10:00:00"},
+    {"datetime": "2021-02-01"},
+    {"datetime": "2021-2-1 1:2:3"},
+    {"datetime": "2021-02-01T10:00:00"},
+    {"datetime": " 2021-02-01 10:00:00"},
+    {"datetime": 1612173600},
+    # Several errors at once
+    {"datetime": "yesterday", "job_id": 1.5, "id": "x"},
+]
+
+
+def record(case):
+    if not isinstance(case, dict):
+        return case
+    data = {**VALID, **case}
+    return {key: value for key, value in data.items() if value is not None}
+
+
+def test_batch_validation_matches_the_row_by_row_results():
+    validator = ModelValidator(HiredEmployee)
+    records = [record(CASES[index % len(CASES)]) for index in range(COLUMNAR_MIN_ROWS * 2)]
+
+    valid_rows, errors = validator.validate_batch(records)
+    expected_rows, expected_errors = validator.validate_rows(records)
+
+    assert valid_rows == expected_rows
+    assert errors == expected_errors
+    assert errors and valid_rows
+    # The rows have the same value types too
+    for (_, data), (_, expected) in zip(valid_rows, expected_rows):
+        assert {key: type(value) for key, value in data.items()} == {key: type(value) for key, value in expected.items()}
@@ -0,0 +1,152 @@
+# Library imports
+from datetime import datetime
+from queue import Queue, Empty, Full
+from threading import Thread, Lock
+import atexit
+import json
+import logging
+import os
+
+# Constants
+ERROR_LOG_MAX_BYTES = int(os.getenv("ERROR_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+ERROR_LOG_BACKUP_COUNT = int(os.getenv("ERROR_LOG_BACKUP_COUNT", "5"))
+ERROR_LOG_QUEUE_SIZE = 10000
+ERROR_LOG_BATCH_SIZE = 500
+ERROR_LOG_FLUSH_INTERVAL = 0.5
+
+# Sentinel used to stop the writer thread
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+
+class ErrorLog:
+    """
+    Non-blocking error log writing JSON lines from a background thread.
+
+    Callers only put the record on a bounded queue. The writer thread
+    serializes the records, writes them in batches and rotates the file
+    when it grows over max_bytes. Records are dropped (and counted) if the
+    queue is full, so logging never blocks a request.
+    """
+
+    def __init__(self, path, max_bytes=ERROR_LOG_MAX_BYTES, backup_count=ERROR_LOG_BACKUP_COUNT):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue = Queue(maxsize=ERROR_LOG_QUEUE_SIZE)
+        self.dropped = 0
+        self.thread = Thread(
+            target=self._run, name=f"error-log:{path}", daemon=True)
+        self.thread.start()
+
+    def write(self, message, **fields):
+        """
+        Queue a structured record.
+
+        Args:
+            message (str): The error message.
+            **fields: Extra fields stored with the record.
+        """
+        record = {"timestamp": datetime.now().isoformat(), "message": message}
+        record.update(fields)
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+    def close(self):
+        """
+        Write the queued records and stop the writer thread.
+        """
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join(timeout=5)
+
+    def _run(self):
+        running = True
+        while running:
+            try:
+                batch = [self.queue.get(timeout=ERROR_LOG_FLUSH_INTERVAL)]
+            except Empty:
+                continue
+
+            # Drain whatever else is queued to write it in one go
+            while len(batch) < ERROR_LOG_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+
+            if _STOP in batch:
+                running = False
+                batch = [record for record in batch if record is not _STOP]
+
+            if self.dropped:
+                batch.append({
+                    "timestamp": datetime.now().isoformat(),
+                    "message": f"{self.dropped} log record(s) dropped, queue full"
+                })
+                self.dropped = 0
+
+            if batch:
+                self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        data = "".join(
+            json.dumps(record, default=str) + "\n" for record in batch).encode("utf-8")
+
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+                self._rotate()
+
+            with open(self.path, "ab") as error_log:
+                error_log.write(data)
+        except OSError as e:
+            logger.error("Error writing to %s: %s", self.path, e)
+
+    def _rotate(self):
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+# Error logs by path
+_error_logs = {}
+_error_logs_lock = Lock()
+
+
+def get_error_log(path):
+    """
+    Get the shared error log of a file, starting its writer on first use.
+
+    Args:
+        path (str): The path to the log file.
+
+    Returns:
+        ErrorLog: The error log of the file.
+    """
+    with _error_logs_lock:
+        error_log = _error_logs.get(path)
+        if error_log is None:
+            error_log = _error_logs[path] = ErrorLog(path)
+        return error_log
+
+
+@atexit.register
+def close_error_logs():
+    """
+    Flush every error log when the process exits.
+    """
+    for error_log in list(_error_logs.values()):
+        error_log.close()
@@ -0,0 +1,54 @@
+# Library imports
+from sqlalchemy import Date, case, extract, func, select
+
+
+def hires_scan(hired_employees):
+    """
+    Build the query counting the hires per quarter, department and job
+    straight from the hired employees table.
+
+    Only portable SQL is used, so it runs on MySQL and SQLite alike.
+
+    Args:
+        hired_employees (Table): The hired employees table.
+
+    Returns:
+        Select: The query returning the year, quarter, department_id, job_id
+        and hires of every summary row.
+    """
+    columns = hired_employees.c
+    month = extract("month", columns.datetime)
+    year = extract("year", columns.datetime)
+    quarter = case((month <= 3, 1), (month <= 6, 2), (month <= 9, 3), else_=4)
+
+    return (
+        select(year.label("year"), quarter.label("quarter"),
+               columns.department_id, columns.job_id,
+               func.count(columns.id).label("hires"))
+        .group_by(year, quarter, columns.department_id, columns.job_id)
+    )
+
+
+def daily_hires_scan(hired_employees):
+    """
+    Build the query counting the hires per day, department and job
+    straight from the hired employees table.
+
+    DATE() exists on MySQL and SQLite alike. The day is typed as a date, so
+    it is read back as one from SQLite too.
+
+    Args:
+        hired_employees (Table): The hired employees table.
+
+    Returns:
+        Select: The query returning the day, department_id, job_id and hires
+        of every summary row.
+    """
+    columns = hired_employees.c
+    day = func.date(columns.datetime, type_=Date)
+
+    return (
+        select(day.label("day"), columns.department_id, columns.job_id,
+               func.count(columns.id).label("hires"))
+        .group_by(day, columns.department_id, columns.job_id)
+    )
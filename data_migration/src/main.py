@@ -2,7 +2,7 @@
 import pandas as pd
 
 # For database connection
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, delete, insert
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import IntegrityError
 
@@ -14,7 +14,15 @@ import time
 from datetime import datetime
 
 # Models
-from models import Base, Department, Job, HiredEmployee
+from models import Base, Department, Job, HiredEmployee, QuarterlyHiresSummary, DailyHiresSummary
+
+# Error log and summary query, shared with the API through the common package
+from error_log import get_error_log
+from hires_scan import daily_hires_scan, hires_scan
+
+# This file will be created if it doesn't exist
+error_log_file = "/data/failed_registers.txt"
+error_log = get_error_log(error_log_file)
 
 # Database connection parameters
 DB_HOST = os.getenv("MYSQL_HOST")
@@ -22,7 +30,9 @@ DB_USER = os.getenv("MYSQL_USER")
 DB_PASSWORD = os.getenv("MYSQL_PASSWORD")
 DB_NAME = os.getenv("MYSQL_DATABASE")
 
-DATABASE_URL = f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+# It can be overridden, e.g. to run the benchmarks against SQLite
+DATABASE_URL = os.getenv(
+  "DATABASE_URL", f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}")
 
 def connect_to_database(retries=5, delay=5):
     """
@@ -72,13 +82,7 @@ def migrate_data(file_path, table_name, model, SessionLocal):
         max_retries (int): Maximum number of retries for database connection.
         retry_delay (int): Delay in seconds between retries.
     """
-    # path to the error log file
-    # This file will be created if it doesn't exist
-    error_log_file = "/data/failed_registers.txt"
-
-    if not os.path.exists(error_log_file):
-        with open(error_log_file, "w") as f:
-            f.write("Data migration started.\n")
+    error_log.write("Data migration started.", table=table_name)
 
     session = SessionLocal()
 
@@ -119,33 +123,60 @@ def migrate_data(file_path, table_name, model, SessionLocal):
                 # Handle duplicate entries
                 session.rollback()
                 print(f"Duplicate entry: {data}")
-                with open(error_log_file, "a") as error_log:
-                    error_log.write(f"DUPLICATE ERROR: {data}\n")
+                error_log.write("DUPLICATE ERROR", table=table_name, record=data)
             except ValueError as e:
                 # Handle invalid data
                 session.rollback()
                 print(f"Invalid data: {data}")
-                with open(error_log_file, "a") as error_log:
-                    error_log.write(f"INVALID ERROR: {data}\n")
+                error_log.write("INVALID ERROR", table=table_name, record=data)
             except Exception as e:
                 # Handle any other exceptions
                 session.rollback()
                 print(f"Error processing row: {data}, error: {e}")
-                with open(error_log_file, "a") as error_log:
-                    error_log.write(f"ERROR: {data}\n")
+                error_log.write(
+                    f"ERROR: {e}", table=table_name, record=data)
     except Exception as e:
         # Handle any exceptions that occur during the migration process
         session.rollback() 
         print(f"Error while migrating {table_name}")
-        with open(error_log_file, "a") as error_log:
-            error_log.write(f"MIGRATION ERROR: {e}\n")
+        error_log.write(f"MIGRATION ERROR: {e}", table=table_name)
     finally:
         # Ensure the session is closed
         session.close() 
 
+def rebuild_hires_summaries(SessionLocal):
+    """
+    Rebuilds the quarterly and daily hires summaries from the migrated hired employees.
+
+    Args:
+        SessionLocal: SQLAlchemy session object.
+    """
+    # Same portable queries as the API, so they also run on SQLite
+    summaries = [
+        (QuarterlyHiresSummary, ["year", "quarter", "department_id", "job_id", "hires"], hires_scan),
+        (DailyHiresSummary, ["day", "department_id", "job_id", "hires"], daily_hires_scan),
+    ]
+
+    for model, columns, scan in summaries:
+        session = SessionLocal()
+        try:
+            summary = model.__table__
+            session.execute(delete(summary))
+            session.execute(insert(summary).from_select(
+                columns, scan(HiredEmployee.__table__),
+            ))
+            session.commit()
+            print(f"{model.__tablename__} rebuilt.")
+        except Exception as e:
+            session.rollback()
+            print(f"Error while rebuilding {model.__tablename__}")
+            error_log.write(f"SUMMARY ERROR: {e}", table=model.__tablename__)
+        finally:
+            session.close()
+
 if __name__ == "__main__":
-  # Set the path to the data files
-  data_path = "data/raw"
+  # Set the path to the data files, e.g. the synthetic files of the benchmarks
+  data_path = os.getenv("DATA_PATH", "data/raw")
 
   # Tables to migrate
   files_to_migrate = [
@@ -178,7 +209,9 @@ if __name__ == "__main__":
       session
     )
     print(f"Table {item['table_name']} migrated successfully.")
+
+  # Count the migrated hires for the reports
+  rebuild_hires_summaries(session)
   
   print("Data migration completed successfully.")
-  with open("/data/failed_registers.txt", "a") as error_log:
-    error_log.write("Data migration completed successfully.\n")
+  error_log.write("Data migration completed successfully.")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -25,6 +25,10 @@ class Job(Base):
 # Define the HiredEmployee model
 class HiredEmployee(Base):
   __tablename__ = 'hired_employees'
+  __table_args__ = (
+    # Range scans by hire date for the reports
+    Index('ix_hired_employees_datetime_department_job', 'datetime', 'department_id', 'job_id'),
+  )
 
   id = Column(Integer, primary_key=True)
   name = Column(String(100), nullable=False)
@@ -33,4 +37,36 @@ class HiredEmployee(Base):
   job_id = Column(Integer, ForeignKey('jobs.id'), nullable=False)
 
   department = relationship('Department', back_populates='employees')
-  job = relationship('Job', back_populates='employees')
\ No newline at end of file
+  job = relationship('Job', back_populates='employees')
+
+# Define the IdempotencyKey model
+# Stores the outcome of ingest requests sent with an Idempotency-Key header
+class IdempotencyKey(Base):
+  __tablename__ = 'idempotency_keys'
+
+  key = Column(String(255), primary_key=True)
+  fingerprint = Column(String(64), nullable=False)
+  # MEDIUMTEXT on MySQL, a full response of 1000 records outgrows TEXT
+  response = Column(Text(length=2**24 - 1), nullable=False)
+  created_at = Column(DateTime, nullable=False, index=True)
+
+# Define the QuarterlyHiresSummary model
+# Hires per quarter, department and job, kept in step by the API ingest path
+class QuarterlyHiresSummary(Base):
+  __tablename__ = 'quarterly_hires_summary'
+
+  year = Column(Integer, primary_key=True, autoincrement=False)
+  quarter = Column(Integer, primary_key=True, autoincrement=False)
+  department_id = Column(Integer, primary_key=True, autoincrement=False)
+  job_id = Column(Integer, primary_key=True, autoincrement=False)
+  hires = Column(Integer, nullable=False, default=0)
+
+# Define the DailyHiresSummary model
+# Hires per day, department and job, the finest grain of the hires cube
+class DailyHiresSummary(Base):
+  __tablename__ = 'daily_hires_summary'
+
+  day = Column(Date, primary_key=True)
+  department_id = Column(Integer, primary_key=True, autoincrement=False)
+  job_id = Column(Integer, primary_key=True, autoincrement=False)
+  hires = Column(Integer, nullable=False, default=0)
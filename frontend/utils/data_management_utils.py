@@ -7,15 +7,21 @@ API_USER = os.getenv("API_USER")
 API_PASS = os.getenv("API_PASS")
 API_HOST = os.getenv("API_HOST")
 
+# Headers of the API connection that don't apply to the relayed response
+HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding"}
+BACKUP_CHUNK_SIZE = 64 * 1024
+
 
 def backup(endpoint):
     url = f"http://{API_USER}:{API_PASS}@{API_HOST}:8000/avro/backup/{endpoint}"
     print(url)
     try:
-        respones = requests.get(url)
+        # Relay the backup as it is streamed by the API
+        respones = requests.get(url, stream=True)
         headers = [(name, value)
-                   for (name, value) in respones.raw.headers.items()]
-        return Response(respones.content, headers=headers, status=respones.status_code)
+                   for (name, value) in respones.raw.headers.items()
+                   if name.lower() not in HOP_BY_HOP_HEADERS]
+        return Response(respones.iter_content(BACKUP_CHUNK_SIZE), headers=headers, status=respones.status_code)
     except Exception as e:
         flash(f"Error: {e}", "error")
         return redirect(url_for('data'))
@@ -6,6 +6,33 @@ import os
 
 API_HOST = os.getenv("API_HOST")
 
+# Last report received from each endpoint, with its ETag
+report_cache = {}
+
+
+def fetch_report(url):
+    """
+    Get the data of a report, revalidating the cached copy with its ETag.
+
+    Args:
+        url (str): The report endpoint.
+
+    Returns:
+        list: The report data.
+    """
+    cached = report_cache.get(url)
+    headers = {"If-None-Match": cached[0]} if cached else {}
+
+    response = requests.get(url, headers=headers)
+    if response.status_code == 304 and cached:
+        return cached[1]
+
+    data = response.json().get("data", [])
+    etag = response.headers.get("ETag")
+    if etag:
+        report_cache[url] = (etag, data)
+    return data
+
 
 def generate_report_data():
 
@@ -14,8 +41,8 @@ def generate_report_data():
 
     try:
         # Llamadas a los endpoints
-        quarterly_data = requests.get(quarterly_url).json().get("data", [])
-        above_avg_data = requests.get(above_avg_url).json().get("data", [])
+        quarterly_data = fetch_report(quarterly_url)
+        above_avg_data = fetch_report(above_avg_url)
 
         # Convertir a DataFrame
         df_quarterly = pd.DataFrame(quarterly_data)